@@ -0,0 +1,4 @@
+# Graph module for Medical Knowledge Graph system
+__version__ = "1.0.0"
+
+# Neo4j ingestion and graph-side utilities
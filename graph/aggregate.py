@@ -0,0 +1,216 @@
+# Vectorized pre-aggregation of extracted triples before they reach Neo4j
+import logging
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from graph.normalize import CanonicalMap
+
+logger = logging.getLogger(__name__)
+
+# predicate -> (subject label, object label, relationship type, base confidence)
+# Base confidences are the per-row values the ingestor used before aggregation.
+RELATION_TYPES: Dict[str, Tuple[str, str, str, float]] = {
+    'treats': ('Drug', 'Disease', 'TREATS', 0.7),
+    'causes': ('Drug', 'Symptom', 'CAUSES', 0.6),
+    'has_symptom': ('Disease', 'Symptom', 'HAS_SYMPTOM', 0.6),
+    'interacts_with': ('Drug', 'Drug', 'INTERACTS_WITH', 0.7),
+}
+GENERIC_RELATION_CONFIDENCE = 0.5
+DEFAULT_SOURCE = 'extracted'
+
+CONFIDENCE_CEILING = 0.99
+# Mentions needed for the repetition term to reach ~63% of its range
+MENTION_SCALE = 10.0
+
+KEY_COLUMNS = ['subject_key', 'predicate', 'object_key']
+
+
+def compute_confidence(predicates: pd.Series, mentions: np.ndarray,
+                       distinct_sources: np.ndarray, total_sources: int) -> np.ndarray:
+    """
+    Confidence from evidence volume and source diversity
+
+    A single mention from a single source keeps the predicate's base
+    confidence. Repeated mentions and agreement across sources move it toward
+    CONFIDENCE_CEILING, with repetition weighted 70% and diversity 30%.
+
+    Args:
+        predicates: Predicate per triple
+        mentions: Number of extractions reporting each triple
+        distinct_sources: Number of distinct sources reporting each triple
+        total_sources: Number of distinct sources in the whole input
+
+    Returns:
+        Confidence per triple
+    """
+    base = predicates.map(lambda p: RELATION_TYPES.get(p, (None, None, None,
+                                                           GENERIC_RELATION_CONFIDENCE))[3])
+    base = base.to_numpy(dtype=float)
+    repetition = 1.0 - np.exp(-(np.asarray(mentions, dtype=float) - 1.0) / MENTION_SCALE)
+    diversity = (np.asarray(distinct_sources, dtype=float) - 1.0) / max(total_sources - 1, 1)
+    evidence = 0.7 * repetition + 0.3 * np.clip(diversity, 0.0, 1.0)
+    return np.round(base + (CONFIDENCE_CEILING - base) * evidence, 4)
+
+
+def _endpoint_labels(predicates: pd.Series, position: int) -> pd.Series:
+    """Node label of one endpoint per row (None for generic predicates)"""
+    labels = {predicate: spec[position] for predicate, spec in RELATION_TYPES.items()}
+    return predicates.map(labels)
+
+
+def _prepare_chunk(df: pd.DataFrame, canonical: CanonicalMap) -> pd.DataFrame:
+    """Resolve one raw chunk to canonical keys and collapse it to (key, source) partial sums"""
+    df = df.dropna(subset=['subject', 'predicate', 'object'])
+    predicates = df['predicate'].astype(str).str.strip().str.lower()
+    out = pd.DataFrame({
+        'subject_key': canonical.resolve_series(df['subject'], _endpoint_labels(predicates, 0)),
+        'predicate': predicates,
+        'object_key': canonical.resolve_series(df['object'], _endpoint_labels(predicates, 1)),
+        'subject': df['subject'].astype(str).str.strip().str.replace(r"\s+", " ", regex=True),
+        'object': df['object'].astype(str).str.strip().str.replace(r"\s+", " ", regex=True),
+        'source': (df['source'].fillna(DEFAULT_SOURCE).astype(str)
+                   if 'source' in df.columns else DEFAULT_SOURCE),
+        'frequency': (pd.to_numeric(df['frequency'], errors='coerce').fillna(1)
+                      if 'frequency' in df.columns else 1),
+        'mentions': (pd.to_numeric(df['mentions'], errors='coerce').fillna(1).astype('int64')
+                     if 'mentions' in df.columns else 1),
+    })
+    return _combine_partials(out)
+
+
+def _combine_partials(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sum partial aggregates that share (subject, predicate, object, source)
+
+    Surface forms stay part of the group, so every spelling that resolved to
+    a key survives until ``finalize`` lists them.
+    """
+    return (df.groupby(KEY_COLUMNS + ['source', 'subject', 'object'], sort=False, as_index=False)
+              .agg(frequency=('frequency', 'sum'), mentions=('mentions', 'sum')))
+
+
+def _surface_forms(partials: pd.DataFrame, column: str) -> List[np.ndarray]:
+    """Distinct surface forms per triple, in the KEY_COLUMNS order ``finalize`` emits triples in"""
+    forms = (partials[KEY_COLUMNS + [column]].drop_duplicates()
+             .sort_values(KEY_COLUMNS + [column], kind='stable').reset_index(drop=True))
+    keys = forms[KEY_COLUMNS]
+    starts = np.flatnonzero((keys != keys.shift()).any(axis=1).to_numpy())
+    return np.split(forms[column].to_numpy(), starts[1:])
+
+
+def finalize(partials: pd.DataFrame, total_sources: int) -> pd.DataFrame:
+    """
+    Collapse per-source partials into one row per triple
+
+    Returns:
+        DataFrame with subject/object keys, the first surface form of each
+        (``subject``/``object``) and all of them (``subjects``/``objects``),
+        predicate, summed frequency, mention count, parallel
+        ``sources``/``source_counts`` lists and evidence-based ``confidence``
+    """
+    partials = _combine_partials(partials)
+    subjects, objects = _surface_forms(partials, 'subject'), _surface_forms(partials, 'object')
+    partials = (partials.groupby(KEY_COLUMNS + ['source'], sort=False, as_index=False)
+                .agg(subject=('subject', 'first'), object=('object', 'first'),
+                     frequency=('frequency', 'sum'), mentions=('mentions', 'sum'))
+                .sort_values(KEY_COLUMNS + ['source'], kind='stable')
+                .reset_index(drop=True))
+    # Rows of one triple are contiguous after sorting; reduce them segment-wise
+    keys = partials[KEY_COLUMNS]
+    starts = np.flatnonzero((keys != keys.shift()).any(axis=1).to_numpy())
+    sources = partials['source'].to_numpy()
+    mentions = partials['mentions'].to_numpy(dtype='int64')
+    result = partials.loc[starts, KEY_COLUMNS + ['subject', 'object']].reset_index(drop=True)
+    result['frequency'] = np.add.reduceat(
+        partials['frequency'].to_numpy(dtype=float), starts).astype('int64')
+    result['mentions'] = np.add.reduceat(mentions, starts)
+    result['subjects'] = [list(forms) for forms in subjects]
+    result['objects'] = [list(forms) for forms in objects]
+    result['sources'] = np.split(sources, starts[1:])
+    result['source_counts'] = np.split(mentions, starts[1:])
+    result['confidence'] = compute_confidence(
+        result['predicate'], result['mentions'].to_numpy(),
+        np.diff(np.append(starts, len(partials))), total_sources
+    )
+    return result
+
+
+def iter_aggregated_triples(triples_file: str, chunksize: int = 1_000_000,
+                            partition_bytes: int = None,
+                            canonical: Optional[CanonicalMap] = None) -> Iterator[pd.DataFrame]:
+    """
+    Stream a triples CSV as aggregated, de-duplicated batches
+
+    Subject and object names are resolved through ``canonical`` (see
+    graph/normalize.py), so spelling variants of an entity collapse onto the
+    same key as its node. Files that fit in one chunk are aggregated in memory. Larger files are
+    pre-reduced chunk by chunk and spilled into hash partitions on disk, so
+    every occurrence of a triple lands in the same partition and each
+    partition is aggregated independently. Memory use is bounded by the chunk
+    size and the partition size, not by the file size.
+
+    Args:
+        triples_file: CSV with subject, predicate, object and optional
+            frequency/source/mentions columns (``mentions`` counts the
+            extractions a pre-counted row stands for; rows without it count once)
+        chunksize: Rows read per chunk
+        partition_bytes: Target raw input bytes per spill partition
+            (defaults to TRIPLE_AGG_PARTITION_MB, 256 MB)
+        canonical: Canonical entity map; without one names are only
+            normalized
+
+    Yields:
+        Aggregated DataFrames (see ``finalize``)
+    """
+    canonical = canonical if canonical is not None else CanonicalMap()
+    partition_bytes = partition_bytes or int(os.getenv("TRIPLE_AGG_PARTITION_MB", "256")) * 2**20
+    reader = pd.read_csv(triples_file, chunksize=chunksize, dtype=str, keep_default_na=False,
+                         na_values=[''])
+    first = next(reader, None)
+    if first is None:
+        return
+    first = _prepare_chunk(first, canonical)
+    second = next(reader, None)
+
+    if second is None:
+        total_sources = first['source'].nunique()
+        yield finalize(first, total_sources)
+        return
+
+    partitions = max(2, math.ceil(Path(triples_file).stat().st_size / partition_bytes))
+    spill_dir = Path(tempfile.mkdtemp(prefix="triple_agg_"))
+    logger.info(f"Aggregating {triples_file} through {partitions} spill partitions")
+    sources = set()
+    try:
+        paths = [spill_dir / f"part{i:04d}.csv" for i in range(partitions)]
+        written = [False] * partitions
+
+        def spill(chunk: pd.DataFrame):
+            sources.update(chunk['source'].unique())
+            bucket = (pd.util.hash_pandas_object(chunk[KEY_COLUMNS], index=False)
+                      .to_numpy() % partitions)
+            for i, part in chunk.groupby(bucket, sort=False):
+                part.to_csv(paths[i], mode='a', header=not written[i], index=False)
+                written[i] = True
+
+        spill(first)
+        spill(_prepare_chunk(second, canonical))
+        for chunk in reader:
+            spill(_prepare_chunk(chunk, canonical))
+
+        for i, path in enumerate(paths):
+            if not written[i]:
+                continue
+            partials = pd.read_csv(path, dtype={'source': str, 'subject': str, 'object': str,
+                                                'subject_key': str, 'object_key': str},
+                                   keep_default_na=False)
+            yield finalize(partials, len(sources))
+    finally:
+        shutil.rmtree(spill_dir, ignore_errors=True)
@@ -0,0 +1,155 @@
+# Crash-safe progress ledger for resumable ingest stages
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Load stages in run order (see graph/ingest.py)
+STAGES = ('drug_nodes', 'entity_nodes', 'relationships')
+FORMAT_VERSION = 1
+
+
+def file_fingerprint(path: str) -> Dict[str, int]:
+    """Size and modification time; a changed input restarts its stage"""
+    stat = os.stat(path)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+class StageProgress:
+    """
+    Committed progress of one stage over one input file
+
+    ``batches`` counts batches already written, ``offset`` is the input byte
+    offset after the last committed record (for stages that stream their
+    input). Call ``commit`` only after Neo4j has committed the batch; a crash
+    in between replays that batch, which the stages' MERGE writes absorb.
+    Without a ledger progress is tracked but not persisted.
+    """
+
+    def __init__(self, ledger: Optional['CheckpointLedger'], stage: str, input_file: str,
+                 depends: Sequence[str], entry: Optional[Dict[str, Any]]):
+        self.ledger = ledger
+        self.stage = stage
+        self.input_file = input_file
+        self.depends = list(depends)
+        entry = entry or {}
+        self.status = entry.get('status', 'pending')
+        self.batches = entry.get('batches', 0)
+        self.offset = entry.get('offset', 0)
+        self.rows = entry.get('rows', 0)
+
+    @property
+    def done(self) -> bool:
+        return self.status == 'done'
+
+    @property
+    def resuming(self) -> bool:
+        return self.status == 'partial'
+
+    def commit(self, batches: int, rows: int, offset: Optional[int] = None):
+        """Record that the first ``batches`` batches (and ``offset`` bytes) are written"""
+        self.status, self.batches, self.rows = 'partial', batches, rows
+        if offset is not None:
+            self.offset = offset
+        if self.ledger is not None:
+            self.ledger._write(self)
+
+    def complete(self):
+        self.status = 'done'
+        if self.ledger is None:
+            return
+        self.ledger._write(self)
+        logger.info(f"Checkpoint: {self.stage} complete for {self.input_file} "
+                    f"({self.batches} batches, {self.rows} rows)")
+
+
+class CheckpointLedger:
+    """
+    JSON ledger of committed ingest progress per (stage, input file)
+
+    The file is rewritten atomically (temp file, fsync, rename) after every
+    committed batch, so a crash leaves either the previous or the new state.
+    Each entry keeps a fingerprint of its input and of the files it depends
+    on (the relationships stage depends on the saved canonical map); if any
+    of them changed the entry is discarded and the stage starts over.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Ledger file, created on the first commit
+        """
+        self.path = Path(path)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            try:
+                data = json.loads(self.path.read_text(encoding='utf-8'))
+                if data.get('format') == FORMAT_VERSION:
+                    self._entries = data['entries']
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable checkpoint ledger {self.path}: {e}")
+
+    @staticmethod
+    def _key(stage: str, input_file: str) -> str:
+        return f"{stage}:{Path(input_file).resolve()}"
+
+    @staticmethod
+    def _fingerprint(input_file: str, depends: Iterable[str]) -> Dict[str, Any]:
+        return {str(Path(path).resolve()): file_fingerprint(path) if os.path.exists(path) else None
+                for path in [input_file, *depends]}
+
+    def stage(self, stage: str, input_file: str, depends: Sequence[str] = ()) -> StageProgress:
+        """
+        Progress for a stage over an input file
+
+        Args:
+            stage: Stage name (see ``STAGES``)
+            input_file: File the stage reads
+            depends: Other files whose contents the stage's batching depends on
+        """
+        entry = self._entries.get(self._key(stage, input_file))
+        if entry is not None and entry['fingerprint'] != self._fingerprint(input_file, depends):
+            logger.warning(f"Checkpoint: inputs of {stage} changed since the last run; "
+                           f"starting it over")
+            entry = None
+        progress = StageProgress(self, stage, input_file, depends, entry)
+        if progress.resuming:
+            logger.info(f"Checkpoint: resuming {stage} after batch {progress.batches} "
+                        f"({progress.rows} rows, offset {progress.offset})")
+        return progress
+
+    def reset(self, stages: Optional[Iterable[str]] = None):
+        """Forget progress for the given stages (all by default)"""
+        stages = set(stages) if stages is not None else None
+        self._entries = {key: entry for key, entry in self._entries.items()
+                         if stages is not None and entry['stage'] not in stages}
+        self._save()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        return {key: dict(entry) for key, entry in self._entries.items()}
+
+    def _write(self, progress: StageProgress):
+        self._entries[self._key(progress.stage, progress.input_file)] = {
+            'stage': progress.stage,
+            'input': str(progress.input_file),
+            'fingerprint': self._fingerprint(progress.input_file, progress.depends),
+            'status': progress.status,
+            'batches': progress.batches,
+            'offset': progress.offset,
+            'rows': progress.rows,
+            'updated_at': time.time(),
+        }
+        self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'format': FORMAT_VERSION, 'entries': self._entries}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
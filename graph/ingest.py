@@ -1,12 +1,28 @@
 # TODO: Batch import data to Neo4j
+import argparse
 import json
-import pandas as pd
 from neo4j import GraphDatabase
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Sequence
 import os
+import sys
 from pathlib import Path
 
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from graph.aggregate import RELATION_TYPES, iter_aggregated_triples
+from graph.centrality import run_centrality
+from graph.checkpoint import STAGES, CheckpointLedger, StageProgress
+from graph.normalize import (ENTITY_LABELS, CanonicalMap, build_canonical_map,
+                             canonical_map_path, fold, fuzzy_candidates_path)
+from graph.migrate import MigrationRunner, await_indexes_online, split_statements
+from graph.query_cache import BUMP_VERSION_QUERY
+from graph.resolver import NAME_QUERY
+from graph.stats import NODE_LABELS, GraphStatsCollector
+from monitoring.profiling import profiled
+from monitoring.tracing import get_tracer
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -15,7 +31,8 @@ class Neo4jIngestor:
     Data ingestion class for loading medical knowledge graph into Neo4j
     """
     
-    def __init__(self, uri="bolt://localhost:7687", username="neo4j", password="password"):
+    def __init__(self, uri="bolt://localhost:7687", username="neo4j", password="password", driver=None,
+                 checkpoint: Optional[CheckpointLedger] = None):
         """
         Initialize Neo4j connection
         
@@ -23,8 +40,14 @@ class Neo4jIngestor:
             uri: Neo4j database URI
             username: Neo4j username  
             password: Neo4j password
+            driver: Existing driver (or compatible stand-in) to use instead of connecting
+            checkpoint: Ledger recording committed batches, so an interrupted
+                run resumes instead of starting over (see graph/checkpoint.py)
         """
-        self.driver = GraphDatabase.driver(uri, auth=(username, password))
+        self.driver = driver or GraphDatabase.driver(uri, auth=(username, password))
+        self.tracer = get_tracer()
+        self.canonical_map = None
+        self.checkpoint = checkpoint
         logger.info(f"Connected to Neo4j at {uri}")
     
     def close(self):
@@ -35,24 +58,42 @@ class Neo4jIngestor:
         """
         Execute Cypher commands from file
         
+        Schema changes belong in graph/migrations/ (see ``migrate``); this is
+        for ad-hoc files such as the sample data in schema.cypher.
+        
         Args:
             cypher_file: Path to .cypher file
         """
         with open(cypher_file, 'r', encoding='utf-8') as f:
-            cypher_content = f.read()
-        
-        # Split by semicolons and execute each statement
-        statements = [stmt.strip() for stmt in cypher_content.split(';') if stmt.strip()]
+            statements = split_statements(f.read())
         
-        with self.driver.session() as session:
+        with self.tracer.span("ingest.cypher_file", statements=len(statements)), \
+                self.driver.session() as session:
             for statement in statements:
-                if statement and not statement.startswith('//'):
-                    try:
-                        result = session.run(statement)
-                        logger.info(f"Executed: {statement[:50]}...")
-                    except Exception as e:
-                        logger.error(f"Error executing statement: {e}")
-                        logger.error(f"Statement: {statement}")
+                try:
+                    session.run(statement).consume()
+                    logger.info(f"Executed: {statement[:50]}...")
+                except Exception as e:
+                    logger.error(f"Error executing statement: {e}")
+                    logger.error(f"Statement: {statement}")
+                    raise
+    
+    def migrate(self, migrations_dir: str = None, index_timeout: float = 600.0):
+        """
+        Apply pending schema migrations and wait until every index is ONLINE
+        
+        Run before any load stage so MERGEs use the indexes instead of label
+        scans while they are still populating.
+        
+        Args:
+            migrations_dir: Migration directory (defaults to graph/migrations)
+            index_timeout: Seconds to wait for indexes before raising
+        """
+        with self.tracer.span("ingest.schema") as span:
+            applied = MigrationRunner(self.driver, migrations_dir).migrate()
+            span.set('migrations', len(applied))
+            with self.tracer.span("ingest.await_indexes"):
+                await_indexes_online(self.driver, timeout=index_timeout)
     
     def clear_database(self):
         """Clear all nodes and relationships"""
@@ -60,22 +101,62 @@ class Neo4jIngestor:
             session.run("MATCH (n) DETACH DELETE n")
             logger.info("Cleared all existing data")
     
-    def create_drug_nodes(self, fda_data_file: str):
+    def _progress(self, stage: str, input_file: str, depends=()) -> StageProgress:
+        """Checkpointed progress for a stage (untracked without a ledger)"""
+        if self.checkpoint is None:
+            return StageProgress(None, stage, input_file, depends, None)
+        return self.checkpoint.stage(stage, input_file, depends)
+    
+    def create_drug_nodes(self, fda_data_file: str, batch_size: int = 1000) -> int:
         """
         Create Drug nodes from FDA data
         
+        The file is streamed in batches of ``batch_size`` records; after each
+        batch the byte offset reached is checkpointed, and a resumed run seeks
+        straight past it.
+        
         Args:
             fda_data_file: Path to processed FDA JSONL file
+            batch_size: Nodes written per UNWIND statement
+            
+        Returns:
+            Drug nodes written by this call
         """
+        progress = self._progress('drug_nodes', fda_data_file)
+        if progress.done:
+            logger.info(f"Skipping Drug nodes: {fda_data_file} already loaded")
+            return 0
         logger.info(f"Creating Drug nodes from {fda_data_file}")
         
-        with open(fda_data_file, 'r', encoding='utf-8') as f:
-            fda_records = [json.loads(line) for line in f]
-        
+        cypher = """
+        UNWIND $rows AS row
+        MERGE (d:Drug {id: row.drug_id})
+        SET d.name = row.name,
+            d.brand_names = row.brand_names,
+            d.generic_names = row.generic_names,
+            d.active_ingredients = row.active_ingredients,
+            d.fda_approved = true,
+            d.created_at = coalesce(d.created_at, datetime())
+        """
         drugs_created = 0
         
-        with self.driver.session() as session:
-            for record in fda_records:
+        with self.tracer.span("ingest.drug_nodes", resumed_at=progress.offset) as span, \
+                self.driver.session() as session, open(fda_data_file, 'rb') as f:
+            f.seek(progress.offset)
+            offset, batch = progress.offset, []
+            
+            def flush():
+                nonlocal drugs_created
+                session.run(cypher, {'rows': batch}).consume()
+                drugs_created += len(batch)
+                progress.commit(progress.batches + 1, progress.rows + len(batch), offset)
+                batch.clear()
+            
+            for line in f:
+                offset += len(line)
+                if not line.strip():
+                    continue
+                record = json.loads(line)
                 # Extract drug information
                 drug_id = record.get('id', '')
                 brand_names = record.get('product_name', [])
@@ -90,263 +171,462 @@ class Neo4jIngestor:
                                generic_names[0] if generic_names else 
                                drug_id)
                 
-                # Create Drug node
-                cypher = """
-                MERGE (d:Drug {id: $drug_id})
-                SET d.name = $name,
-                    d.brand_names = $brand_names,
-                    d.generic_names = $generic_names,
-                    d.active_ingredients = $active_ingredients,
-                    d.fda_approved = true,
-                    d.created_at = datetime()
-                """
-                
-                session.run(cypher, {
+                batch.append({
                     'drug_id': drug_id,
                     'name': primary_name,
                     'brand_names': brand_names,
                     'generic_names': generic_names, 
                     'active_ingredients': active_ingredients
                 })
-                
-                drugs_created += 1
+                if len(batch) >= batch_size:
+                    flush()
+            if batch:
+                flush()
+            
+            span.set('nodes', drugs_created)
         
+        progress.complete()
         logger.info(f"Created {drugs_created} Drug nodes")
+        return drugs_created
     
-    def create_entities_from_ner(self, entities_file: str):
+    def create_entities_from_ner(self, entities_file: str, batch_size: int = 1000) -> int:
         """
         Create Disease, Symptom, and Chemical nodes from NER results
         
+        Entity strings are canonicalized first (see graph/normalize.py), so
+        one node is created per canonical entity with its merged variants in
+        ``aliases``. Near-duplicate spellings are merged only when approved
+        in ENTITY_MERGE_ALLOWLIST; the others are written to
+        ``<entities>_fuzzy_candidates.csv`` for review. The canonical map is kept for
+        triple resolution and saved next to the entities file. Batches are
+        numbered across labels and checkpointed; a resumed run reloads the
+        saved map, so batches line up, and skips the ones already written.
+        
         Args:
             entities_file: Path to NER entities JSONL file
+            batch_size: Nodes written per UNWIND statement
+            
+        Returns:
+            Entity nodes written by this call
         """
+        progress = self._progress('entity_nodes', entities_file)
+        map_file = canonical_map_path(entities_file)
+        if progress.done:
+            logger.info(f"Skipping entity nodes: {entities_file} already loaded")
+            return 0
         logger.info(f"Creating entity nodes from {entities_file}")
         
-        with open(entities_file, 'r', encoding='utf-8') as f:
-            entity_records = [json.loads(line) for line in f]
-        
-        # Collect unique entities by type
-        entities_by_type = {
-            'DISEASE': set(),
-            'SYMPTOM': set(), 
-            'CHEMICAL': set()
-        }
-        
-        for record in entity_records:
-            for entity in record['entities']:
-                entity_type = entity['label']
-                entity_text = entity['text'].lower().strip()
+        with self.tracer.span("ingest.entity_nodes", resumed_at=progress.batches) as span:
+            if progress.resuming and map_file.exists():
+                self.canonical_map = CanonicalMap.load(str(map_file))
+            else:
+                with open(entities_file, 'r', encoding='utf-8') as f:
+                    entity_records = [json.loads(line) for line in f]
                 
-                if entity_type in entities_by_type and len(entity_text) > 2:
-                    entities_by_type[entity_type].add(entity_text)
-        
-        # Create nodes for each entity type
-        with self.driver.session() as session:
-            # Create Disease nodes
-            for disease_name in entities_by_type['DISEASE']:
-                cypher = """
-                MERGE (d:Disease {name: $name})
-                SET d.id = 'disease_' + replace(toLower($name), ' ', '_'),
-                    d.created_at = datetime()
-                """
-                session.run(cypher, {'name': disease_name})
+                mentions = [
+                    (ENTITY_LABELS[entity['label']], entity['text'])
+                    for record in entity_records
+                    for entity in record['entities']
+                    if entity['label'] in ENTITY_LABELS
+                ]
+                span.set('records', len(entity_records))
+                
+                with self.tracer.span("ingest.normalize_entities", mentions=len(mentions)):
+                    self.canonical_map = build_canonical_map(mentions)
+                    self.canonical_map.save(str(map_file))
+                    if self.canonical_map.fuzzy_candidates:
+                        candidates_file = fuzzy_candidates_path(entities_file)
+                        self.canonical_map.save_fuzzy_candidates(str(candidates_file))
+                        logger.info(f"{len(self.canonical_map.fuzzy_candidates)} near-duplicate "
+                                    f"names left unmerged; review them in {candidates_file}")
             
-            # Create Symptom nodes
-            for symptom_name in entities_by_type['SYMPTOM']:
-                cypher = """
-                MERGE (s:Symptom {name: $name})
-                SET s.id = 'symptom_' + replace(toLower($name), ' ', '_'),
-                    s.created_at = datetime()
-                """
-                session.run(cypher, {'name': symptom_name})
+            created = {}
+            written = batch_number = 0
+            with self.driver.session() as session:
+                for label in ENTITY_LABELS.values():
+                    rows = self.canonical_map.nodes(label)
+                    cypher = f"""
+                    UNWIND $rows AS row
+                    MERGE (n:{label} {{name: row.name}})
+                    SET n.id = row.id,
+                        n.aliases = row.aliases,
+                        n.mentions = row.mentions,
+                        n.created_at = coalesce(n.created_at, datetime())
+                    """
+                    for start in range(0, len(rows), batch_size):
+                        batch_number += 1
+                        if batch_number <= progress.batches:
+                            continue
+                        batch = rows[start:start + batch_size]
+                        session.run(cypher, {'rows': batch}).consume()
+                        written += len(batch)
+                        progress.commit(batch_number, progress.rows + len(batch))
+                    created[label] = len(rows)
             
-            # Create Chemical nodes
-            for chemical_name in entities_by_type['CHEMICAL']:
-                cypher = """
-                MERGE (c:Chemical {name: $name})
-                SET c.id = 'chemical_' + replace(toLower($name), ' ', '_'),
-                    c.created_at = datetime()
-                """
-                session.run(cypher, {'name': chemical_name})
-        
-        logger.info(f"Created {len(entities_by_type['DISEASE'])} Disease nodes")
-        logger.info(f"Created {len(entities_by_type['SYMPTOM'])} Symptom nodes") 
-        logger.info(f"Created {len(entities_by_type['CHEMICAL'])} Chemical nodes")
+            span.set('nodes', written)
+        
+        progress.complete()
+        for label, count in created.items():
+            logger.info(f"Created {count} {label} nodes")
+        return written
     
-    def create_relationships_from_triples(self, triples_file: str):
+    def create_relationships_from_triples(self, triples_file: str, batch_size: int = 1000,
+                                          canonical_map_file: str = None) -> int:
         """
         Create relationships from knowledge triples CSV
         
+        Duplicate (subject, predicate, object) rows are collapsed first (see
+        graph/aggregate.py), so each relationship is written once with its
+        summed frequency, per-source mention counts and evidence-based
+        confidence. Entity names resolve through the canonical map built by
+        ``create_entities_from_ner``, or the one saved at ``canonical_map_file``.
+        
+        Drug endpoints are resolved here, to the ids of every Drug whose name,
+        brand name or generic name folds to a surface form of the endpoint
+        (triples usually name the generic, Drug nodes are named by brand), and
+        matched on the indexed id. Triples whose endpoints match no node are
+        counted and logged.
+        
+        Aggregation is deterministic for a given input and canonical map, so
+        batches are numbered in write order and checkpointed; a resumed run
+        re-aggregates but skips the batches already written. A failed batch
+        stops the stage, so the ledger never records past it.
+        
         Args:
             triples_file: Path to triples CSV file
+            batch_size: Relationships written per UNWIND statement
+            canonical_map_file: Saved canonical map used when this ingestor
+                has not built one
+            
+        Returns:
+            Relationships written by this call
         """
         logger.info(f"Creating relationships from {triples_file}")
         
         if not os.path.exists(triples_file):
             logger.warning(f"Triples file {triples_file} not found")
-            return
+            return 0
         
-        df = pd.read_csv(triples_file)
-        logger.info(f"Processing {len(df)} triples")
+        progress = self._progress('relationships', triples_file,
+                                  depends=[canonical_map_file] if canonical_map_file else [])
+        if progress.done:
+            logger.info(f"Skipping relationships: {triples_file} already loaded")
+            return 0
+        
+        canonical = self.canonical_map
+        if canonical is None and canonical_map_file and os.path.exists(canonical_map_file):
+            canonical = CanonicalMap.load(canonical_map_file)
         
         relationships_created = 0
+        triples_read = 0
+        batch_number = 0
+        unmatched = 0
+        unresolved_drugs = []
         
-        with self.driver.session() as session:
-            for _, row in df.iterrows():
-                subject = row['subject'].strip()
-                predicate = row['predicate'].strip()
-                obj = row['object'].strip()
-                frequency = row.get('frequency', 1)
-                
-                # Map relation types to Cypher patterns
-                if predicate == 'treats':
-                    cypher = """
-                    MATCH (d:Drug {name: $subject})
-                    MATCH (disease:Disease {name: $object})
-                    MERGE (d)-[r:TREATS]->(disease)
-                    SET r.confidence = 0.7,
-                        r.frequency = $frequency,
-                        r.source = 'extracted'
-                    """
-                elif predicate == 'causes':
-                    cypher = """
-                    MATCH (d:Drug {name: $subject})
-                    MATCH (s:Symptom {name: $object})
-                    MERGE (d)-[r:CAUSES]->(s)
-                    SET r.confidence = 0.6,
-                        r.frequency = $frequency,
-                        r.source = 'extracted'
-                    """
-                elif predicate == 'has_symptom':
-                    cypher = """
-                    MATCH (disease:Disease {name: $subject})
-                    MATCH (s:Symptom {name: $object})
-                    MERGE (disease)-[r:HAS_SYMPTOM]->(s)
-                    SET r.confidence = 0.6,
-                        r.frequency = $frequency,
-                        r.source = 'extracted'
-                    """
-                elif predicate == 'interacts_with':
-                    cypher = """
-                    MATCH (d1:Drug {name: $subject})
-                    MATCH (d2:Drug {name: $object})
-                    MERGE (d1)-[r:INTERACTS_WITH]->(d2)
-                    SET r.confidence = 0.7,
-                        r.frequency = $frequency,
-                        r.source = 'extracted'
-                    """
-                else:
-                    # Generic relationship
-                    cypher = f"""
-                    MATCH (n1 {{name: $subject}})
-                    MATCH (n2 {{name: $object}})
-                    MERGE (n1)-[r:RELATED_TO]->(n2)
-                    SET r.relation_type = $predicate,
-                        r.confidence = 0.5,
-                        r.frequency = $frequency,
-                        r.source = 'extracted'
-                    """
-                
-                try:
-                    result = session.run(cypher, {
-                        'subject': subject,
-                        'object': obj,
-                        'predicate': predicate,
-                        'frequency': frequency
-                    })
-                    relationships_created += 1
-                except Exception as e:
-                    logger.warning(f"Error creating relationship {subject}-{predicate}->{obj}: {e}")
+        with self.tracer.span("ingest.relationships", resumed_at=progress.batches) as span, \
+                self.driver.session() as session:
+            drug_ids = self._drug_ids(session)
+            
+            def endpoint(label, forms, key):
+                names, ids = self._endpoint_names(label, forms, key, drug_ids)
+                if label == 'Drug' and not ids and len(unresolved_drugs) < 5:
+                    unresolved_drugs.append(forms[0])
+                return names, ids
+            
+            for aggregated in iter_aggregated_triples(triples_file, canonical=canonical):
+                triples_read += int(aggregated['mentions'].sum())
+                for predicate, group in aggregated.groupby('predicate', sort=False):
+                    group_batches = -(-len(group) // batch_size)
+                    if batch_number + group_batches <= progress.batches:
+                        batch_number += group_batches
+                        continue
+                    cypher = self._relationship_cypher(predicate)
+                    subject_label, object_label = RELATION_TYPES.get(predicate, (None, None))[:2]
+                    rows = [
+                        {
+                            'subject': subject_forms[0],
+                            'object': object_forms[0],
+                            **dict(zip(('subject_names', 'subject_ids'),
+                                       endpoint(subject_label, subject_forms, subject_norm))),
+                            **dict(zip(('object_names', 'object_ids'),
+                                       endpoint(object_label, object_forms, object_norm))),
+                            'subject_key': subject_norm,
+                            'object_key': object_norm,
+                            'predicate': predicate,
+                            'frequency': int(frequency),
+                            'mentions': int(mentions),
+                            'sources': list(sources),
+                            'source_counts': [int(c) for c in source_counts],
+                            'confidence': float(confidence)
+                        }
+                        for (subject_forms, object_forms, subject_norm, object_norm, frequency,
+                             mentions, sources, source_counts, confidence)
+                        in zip(group['subjects'], group['objects'],
+                               group['subject_key'], group['object_key'], group['frequency'],
+                               group['mentions'], group['sources'], group['source_counts'],
+                               group['confidence'])
+                    ]
+                    for start in range(0, len(rows), batch_size):
+                        batch_number += 1
+                        if batch_number <= progress.batches:
+                            continue
+                        batch = rows[start:start + batch_size]
+                        try:
+                            record = session.run(cypher, {'rows': batch}).single()
+                        except Exception as e:
+                            logger.error(f"Error creating {len(batch)} '{predicate}' relationships "
+                                         f"(batch {batch_number}): {e}")
+                            raise
+                        written = record['matched'] if record is not None else len(batch)
+                        unmatched += len(batch) - written
+                        relationships_created += written
+                        progress.commit(batch_number, progress.rows + len(batch))
+            
+            span.set('triples', triples_read)
+            span.set('relationships', relationships_created)
+            span.set('unmatched', unmatched)
         
-        logger.info(f"Created {relationships_created} relationships")
+        progress.complete()
+        logger.info(f"Collapsed {triples_read} triples into {progress.rows} relationships")
+        if unmatched:
+            logger.warning(f"{unmatched} of {unmatched + relationships_created} relationships were not "
+                           f"written: an endpoint matched no node"
+                           + (f" (unknown drugs include {', '.join(map(repr, unresolved_drugs))})"
+                              if unresolved_drugs else ""))
+        return relationships_created
     
-    def get_graph_stats(self) -> Dict[str, int]:
+    @staticmethod
+    def _drug_ids(session) -> Dict[str, List[str]]:
+        """Ids of the Drug nodes carrying each folded name, brand name and generic name"""
+        ids: Dict[str, List[str]] = {}
+        for record in session.run(NAME_QUERY.format(label='Drug')):
+            for name in dict.fromkeys(fold(n) for n in [record['name']] + list(record['aliases'] or []) if n):
+                ids.setdefault(name, []).append(record['id'])
+        return ids
+    
+    @staticmethod
+    def _endpoint_names(label: Optional[str], forms: List[str], key: str,
+                        drug_ids: Dict[str, List[str]]) -> tuple:
+        """
+        (node names, Drug ids) one endpoint of a relationship may match
+        
+        Disease/Symptom/Chemical nodes are named by their canonical key, so
+        those endpoints match on the key. A Drug endpoint matches the Drugs
+        any of its surface forms (spellings that differ only by case or
+        plural share one aggregated row) or its key names, by id. Endpoints
+        of generic predicates (no known label) try all of them.
+        """
+        ids = []
+        if label in ('Drug', None):
+            for name in dict.fromkeys(fold(form) for form in list(forms) + [key]):
+                ids.extend(drug_ids.get(name, []))
+            ids = list(dict.fromkeys(ids))
+        if label is None:
+            return list(dict.fromkeys(list(forms) + [key])), ids
+        return ([] if label == 'Drug' else [key]), ids
+    
+    @staticmethod
+    def _relationship_cypher(predicate: str) -> str:
+        """Batched MERGE statement for one predicate"""
+        properties = """
+            SET r.confidence = row.confidence,
+                r.frequency = row.frequency,
+                r.mentions = row.mentions,
+                r.sources = row.sources,
+                r.source_counts = row.source_counts,
+                r.source = 'extracted'
+            WITH DISTINCT row
+            RETURN count(row) AS matched
+        """
+        
+        # Drugs are matched on their resolved ids, other labels on name;
+        # both are indexed
+        def condition(variable: str, label: str, endpoint: str) -> str:
+            if label == 'Drug':
+                return f"{variable}.id IN row.{endpoint}_ids"
+            return f"{variable}.name IN row.{endpoint}_names"
+        
+        if predicate in RELATION_TYPES:
+            subject_label, object_label, rel_type, _ = RELATION_TYPES[predicate]
+            return f"""
+            UNWIND $rows AS row
+            MATCH (a:{subject_label}) WHERE {condition('a', subject_label, 'subject')}
+            MATCH (b:{object_label}) WHERE {condition('b', object_label, 'object')}
+            MERGE (a)-[r:{rel_type}]->(b)
+            {properties}
+            """
+        # Generic relationship: the endpoint label is unknown, so look the
+        # endpoint up per label (each branch uses that label's index)
+        # instead of scanning every node
+        def lookup(variable: str, endpoint: str) -> str:
+            return "\n                UNION\n                ".join(
+                f"WITH row MATCH ({variable}:{label}) WHERE {condition(variable, label, endpoint)} "
+                f"RETURN {variable}"
+                for label in NODE_LABELS)
+        return f"""
+            UNWIND $rows AS row
+            CALL {{
+                {lookup('n1', 'subject')}
+            }}
+            CALL {{
+                {lookup('n2', 'object')}
+            }}
+            MERGE (n1)-[r:RELATED_TO]->(n2)
+            SET r.relation_type = row.predicate
+            {properties}
+            """
+    
+    def bump_graph_version(self) -> Dict[str, Any]:
+        """
+        Mark the graph as changed, invalidating cached reads (graph/query_cache.py)
+        
+        Returns:
+            The new version and its timestamp
+        """
+        with self.driver.session() as session:
+            record = session.run(BUMP_VERSION_QUERY).single()
+        version = {'version': record['version'], 'updated_at': record['updated_at']}
+        logger.info(f"Graph version is now {version['version']}")
+        return version
+    
+    def get_graph_stats(self) -> Dict[str, Any]:
         """
         Get statistics about the knowledge graph
         
+        Counts come from Neo4j's count store (see graph/stats.py), so this
+        stays cheap on large graphs.
+        
         Returns:
             Dictionary with node and relationship counts
         """
-        with self.driver.session() as session:
-            # Count nodes by type
-            node_counts = {}
-            for label in ['Drug', 'Disease', 'Symptom', 'Chemical']:
-                result = session.run(f"MATCH (n:{label}) RETURN count(n) as count")
-                node_counts[label] = result.single()['count']
-            
-            # Count relationships
-            result = session.run("MATCH ()-[r]->() RETURN count(r) as count")
-            relationship_count = result.single()['count']
-            
-            # Count relationship types
-            result = session.run("""
-                MATCH ()-[r]->() 
-                RETURN type(r) as rel_type, count(r) as count 
-                ORDER BY count DESC
-            """)
-            rel_types = {record['rel_type']: record['count'] for record in result}
-            
-            stats = {
-                'nodes': node_counts,
-                'total_relationships': relationship_count,
-                'relationship_types': rel_types
-            }
-            
-            logger.info(f"Graph statistics: {stats}")
-            return stats
+        with self.tracer.span("ingest.graph_stats"):
+            stats = GraphStatsCollector(self.driver).collect()
+        
+        logger.info(f"Graph statistics: {stats}")
+        return stats
 
-def main():
-    """Main ingestion pipeline"""
+def run_ingest(sample_data: bool = False, stages: Optional[Sequence[str]] = None,
+               checkpoint_file: Optional[str] = None, restart: bool = False,
+               centrality: bool = False):
+    """
+    Main ingestion pipeline
+    
+    Progress is checkpointed per stage and input file, so re-running after a
+    failure skips the stages that finished and resumes the interrupted one
+    from its last committed batch.
+    
+    Args:
+        sample_data: Also load the sample nodes in graph/schema.cypher
+        stages: Load stages to run, from ``graph.checkpoint.STAGES`` (all by default)
+        checkpoint_file: Ledger path (defaults to INGEST_CHECKPOINT or
+            data/processed/ingest_checkpoint.json)
+        restart: Discard recorded progress for the selected stages first
+        centrality: Re-score nodes and facts (graph/centrality.py) when
+            anything was written
+    """
     # Configuration
     NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
     NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "password")
     
-    ingestor = Neo4jIngestor(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD)
+    stages = list(stages or STAGES)
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown ingest stages {sorted(unknown)}; choose from {', '.join(STAGES)}")
+    checkpoint = CheckpointLedger(checkpoint_file or os.getenv(
+        "INGEST_CHECKPOINT", "data/processed/ingest_checkpoint.json"))
+    if restart:
+        checkpoint.reset(stages)
+    
+    ingestor = Neo4jIngestor(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, checkpoint=checkpoint)
     
     try:
-        # Initialize schema
-        schema_file = Path("graph/schema.cypher")
-        if schema_file.exists():
-            logger.info("Setting up database schema...")
-            ingestor.execute_cypher_file(str(schema_file))
-        
-        # Data file paths - use unified data if available, fallback to FDA-only
-        fda_file = Path("data/processed/fda_processed.jsonl")
-        
-        # Check for unified data first
-        unified_entities = Path("data/processed/all_entities.jsonl")
-        unified_triples = Path("data/processed/unified_triples.csv")
-        
-        entities_file = unified_entities if unified_entities.exists() else Path("data/processed/fda_processed_entities.jsonl")
-        triples_file = unified_triples if unified_triples.exists() else Path("data/processed/fda_processed_triples.csv")
-        
-        # Clear existing data (optional - comment out for incremental loading)
-        # ingestor.clear_database()
-        
-        # Load FDA drug data
-        if fda_file.exists():
-            ingestor.create_drug_nodes(str(fda_file))
-        else:
-            logger.warning(f"FDA data file {fda_file} not found")
-        
-        # Load extracted entities
-        if entities_file.exists():
-            ingestor.create_entities_from_ner(str(entities_file))
-        else:
-            logger.warning(f"Entities file {entities_file} not found")
-        
-        # Load relationships
-        if triples_file.exists():
-            ingestor.create_relationships_from_triples(str(triples_file))
-        else:
-            logger.warning(f"Triples file {triples_file} not found")
+        # Root span so every stage below is reported as one ingest trace
+        with ingestor.tracer.span("ingest.run", stages=",".join(stages)):
+            # Apply schema migrations; blocks until the indexes are online
+            logger.info("Migrating database schema...")
+            ingestor.migrate(index_timeout=float(os.getenv("GRAPH_INDEX_TIMEOUT", "600")))
+            if sample_data:
+                ingestor.execute_cypher_file(str(Path(__file__).parent / "schema.cypher"))
+        
+            # Data file paths - use unified data if available, fallback to FDA-only
+            fda_file = Path("data/processed/fda_processed.jsonl")
+        
+            # Check for unified data first
+            unified_entities = Path("data/processed/all_entities.jsonl")
+            unified_triples = Path("data/processed/unified_triples.csv")
         
-        # Print final statistics
-        ingestor.get_graph_stats()
+            entities_file = unified_entities if unified_entities.exists() else Path("data/processed/fda_processed_entities.jsonl")
+            triples_file = unified_triples if unified_triples.exists() else Path("data/processed/fda_processed_triples.csv")
+        
+            # Clear existing data (optional - comment out for incremental loading)
+            # ingestor.clear_database()
+            
+            written = 0
+        
+            # Load FDA drug data
+            if 'drug_nodes' in stages:
+                if fda_file.exists():
+                    written += ingestor.create_drug_nodes(str(fda_file))
+                else:
+                    logger.warning(f"FDA data file {fda_file} not found")
+        
+            # Load extracted entities
+            if 'entity_nodes' in stages:
+                if entities_file.exists():
+                    written += ingestor.create_entities_from_ner(str(entities_file))
+                else:
+                    logger.warning(f"Entities file {entities_file} not found")
+        
+            # Load relationships
+            if 'relationships' in stages:
+                if triples_file.exists():
+                    written += ingestor.create_relationships_from_triples(
+                        str(triples_file), canonical_map_file=str(canonical_map_path(entities_file)))
+                else:
+                    logger.warning(f"Triples file {triples_file} not found")
+        
+            # Invalidate cached QA-side reads, then print final statistics
+            if written:
+                if centrality:
+                    logger.info("Scoring nodes and facts by weighted centrality...")
+                    run_centrality(ingestor.driver, snapshot_root=os.getenv("GRAPH_SNAPSHOT_DIR"),
+                                   bump_version=False)
+                ingestor.bump_graph_version()
+            else:
+                logger.info("Nothing new was written; keeping the graph version")
+            ingestor.get_graph_stats()
         
     finally:
+        ingestor.tracer.flush()
         ingestor.close()
 
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Load the medical knowledge graph into Neo4j")
+    parser.add_argument('--profile', action='store_true',
+                        help="Write flame-graph stacks and an allocation report "
+                             "(same as MEDIGRAPH_PROFILE=1)")
+    parser.add_argument('--sample-data', action='store_true',
+                        help="Also load the sample nodes in graph/schema.cypher")
+    parser.add_argument('--stages', default=",".join(STAGES),
+                        help=f"Comma-separated load stages to run (default: {','.join(STAGES)})")
+    parser.add_argument('--checkpoint', default=None,
+                        help="Checkpoint ledger file (default: INGEST_CHECKPOINT or "
+                             "data/processed/ingest_checkpoint.json)")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore recorded progress and reload the selected stages from scratch")
+    parser.add_argument('--centrality', action='store_true',
+                        help="Afterwards score nodes and facts by weighted centrality (graph/centrality.py)")
+    args = parser.parse_args()
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s) {', '.join(unknown)}; choose from {', '.join(STAGES)}")
+    
+    with profiled("ingest", enabled=args.profile or None):
+        run_ingest(sample_data=args.sample_data, stages=stages, checkpoint_file=args.checkpoint,
+                   restart=args.restart, centrality=args.centrality)
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
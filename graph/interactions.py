@@ -0,0 +1,211 @@
+# Polypharmacy interaction checks over INTERACTS_WITH edges
+import logging
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from itertools import combinations
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from graph.normalize import fold
+from graph.resolver import EntityResolver
+from graph.snapshot import SnapshotStore
+
+logger = logging.getLogger(__name__)
+
+ALIAS_QUERY = """
+MATCH (d:Drug)
+RETURN d.name AS name, d.brand_names AS brand_names,
+       d.generic_names AS generic_names, d.active_ingredients AS active_ingredients
+"""
+INTERACTION_QUERY = """
+MATCH (a:Drug)-[r:INTERACTS_WITH]->(b:Drug)
+WHERE a.name IN $names AND b.name IN $names
+RETURN a.name AS source, b.name AS target, r.confidence AS confidence, r.frequency AS frequency
+"""
+
+# Severity is not recorded on INTERACTS_WITH edges; it is graded from the
+# kind of finding and the extraction confidence behind it
+SEVERITY_ORDER = {'major': 0, 'moderate': 1, 'minor': 2}
+MAJOR_CONFIDENCE = 0.8
+MODERATE_CONFIDENCE = 0.6
+
+# Similarity a fuzzy match needs before a misspelled input is taken as that drug
+FUZZY_MIN_SCORE = 0.6
+
+
+@dataclass
+class Interaction:
+    """One interaction between two of the checked drugs"""
+    drug_a: str
+    drug_b: str
+    kind: str  # 'drug', 'ingredient' or 'duplicate_ingredient'
+    severity: str
+    confidence: float
+    frequency: float
+    via: Tuple[str, str]  # graph drugs or shared ingredient behind the finding
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def grade(kind: str, confidence: float) -> str:
+    """Severity of a finding"""
+    if kind == 'duplicate_ingredient' or confidence >= MAJOR_CONFIDENCE:
+        return 'major'
+    return 'moderate' if confidence >= MODERATE_CONFIDENCE else 'minor'
+
+
+class InteractionChecker:
+    """
+    Find every pairwise interaction in a list of drugs
+
+    Input names resolve through Drug names, brand names and generic names,
+    then through the fuzzy resolver when one is given.
+    Each input then stands for its own Drug nodes plus the Drug nodes named
+    after its active ingredients, so "Advil" interacting through "ibuprofen"
+    is reported as an ingredient-level interaction. Two inputs sharing an
+    active ingredient are reported as a duplicate.
+
+    Edges come from the memory-mapped graph snapshot when one is available,
+    and otherwise from a single batched Cypher query over all candidates.
+    """
+
+    def __init__(self, driver, snapshot_store: Optional[SnapshotStore] = None,
+                 resolver: Optional[EntityResolver] = None):
+        """
+        Args:
+            driver: Neo4j driver (or compatible stand-in)
+            snapshot_store: Snapshot to read INTERACTS_WITH adjacency from
+            resolver: Fuzzy resolver for names no alias matches exactly
+        """
+        self.driver = driver
+        self.snapshot_store = snapshot_store
+        self.resolver = resolver
+        self._aliases: Optional[Dict[str, Set[str]]] = None
+        self._ingredients: Dict[str, Set[str]] = {}
+        self._known_ingredients: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Reload the alias index from Neo4j"""
+        aliases, ingredients = defaultdict(set), {}
+        with self.driver.session() as session:
+            for record in session.run(ALIAS_QUERY):
+                name = record['name']
+                if not name:
+                    continue
+                for alias in [name, *(record['brand_names'] or []), *(record['generic_names'] or [])]:
+                    if alias:
+                        aliases[fold(alias)].add(name)
+                ingredients[name] = {fold(i) for i in record['active_ingredients'] or [] if i}
+        with self._lock:
+            self._aliases, self._ingredients = dict(aliases), ingredients
+            self._known_ingredients = set().union(*ingredients.values())
+        logger.info(f"Loaded {len(aliases)} drug aliases for {len(ingredients)} drugs")
+
+    def _index(self) -> Dict[str, Set[str]]:
+        if self._aliases is None:
+            self.refresh()
+        return self._aliases
+
+    def resolve(self, drugs: Sequence[str]) -> Dict[str, Dict[str, Set[str]]]:
+        """
+        Drug nodes and active ingredients behind each input name
+
+        Returns:
+            input -> {'drugs': Drug node names, 'ingredients': folded ingredient names}
+        """
+        aliases = self._index()
+        resolved = {}
+        for drug in drugs:
+            key = fold(drug)
+            nodes = set(aliases.get(key, ()))
+            if not nodes and key and self.resolver is not None:
+                candidates = self.resolver.resolve(drug, labels=['Drug'], limit=1,
+                                                   min_score=FUZZY_MIN_SCORE)
+                nodes = {candidate['name'] for candidate in candidates}
+            ingredients = set().union(*(self._ingredients.get(node, set()) for node in nodes))
+            if not nodes and key:
+                # An ingredient name on its own ("ibuprofen") still counts
+                ingredients.add(key)
+            resolved[drug] = {'drugs': nodes, 'ingredients': ingredients}
+        return resolved
+
+    def _edges(self, names: Set[str]) -> List[Tuple[str, str, float, float]]:
+        snapshot = self.snapshot_store.current() if self.snapshot_store else None
+        if snapshot is not None and 'INTERACTS_WITH' in snapshot.adjacency:
+            ids = [node for node in (snapshot.lookup(name, 'Drug') for name in names) if node is not None]
+            sources, targets, confidence, frequency, _ = snapshot.edges_between(
+                ids, rel_types=['INTERACTS_WITH'])
+            return [(snapshot.name(s), snapshot.name(t), float(c), float(f))
+                    for s, t, c, f in zip(sources, targets, confidence, frequency)]
+
+        with self.driver.session() as session:
+            return [(record['source'], record['target'], record['confidence'] or 0.0,
+                     record['frequency'] or 0)
+                    for record in session.run(INTERACTION_QUERY, names=sorted(names))]
+
+    def check(self, drugs: Sequence[str]) -> Dict[str, Any]:
+        """
+        Check a drug list for interactions
+
+        Args:
+            drugs: Drug names as the user typed them (brand or generic)
+
+        Returns:
+            Dictionary with resolved/unresolved inputs, the number of pairs
+            checked and interactions ranked by severity then confidence
+        """
+        start = time.perf_counter()
+        drugs = list(dict.fromkeys(d for d in drugs if d and d.strip()))
+        resolved = self.resolve(drugs)
+        aliases = self._index()
+
+        # Graph Drug nodes each input stands for, directly or via an ingredient
+        members: Dict[str, Dict[str, str]] = {}
+        for drug, found in resolved.items():
+            members[drug] = {node: 'drug' for node in found['drugs']}
+            for ingredient in found['ingredients']:
+                for node in aliases.get(ingredient, ()):
+                    members[drug].setdefault(node, 'ingredient')
+        owners = defaultdict(list)
+        for drug, nodes in members.items():
+            for node in nodes:
+                owners[node].append(drug)
+
+        best: Dict[Tuple[str, str, str], Interaction] = {}
+
+        def keep(finding: Interaction):
+            key = (finding.drug_a, finding.drug_b, finding.kind)
+            current = best.get(key)
+            if current is None or (finding.confidence, finding.frequency) > (current.confidence,
+                                                                            current.frequency):
+                best[key] = finding
+
+        for source, target, confidence, frequency in self._edges(set(owners)):
+            for a in owners.get(source, ()):
+                for b in owners.get(target, ()):
+                    if a == b:
+                        continue
+                    kind = ('drug' if members[a][source] == 'drug' and members[b][target] == 'drug'
+                            else 'ingredient')
+                    first, second = sorted((a, b), key=drugs.index)
+                    keep(Interaction(first, second, kind, grade(kind, confidence),
+                                     round(confidence, 4), frequency, (source, target)))
+
+        for a, b in combinations(drugs, 2):
+            for ingredient in sorted(resolved[a]['ingredients'] & resolved[b]['ingredients']):
+                keep(Interaction(a, b, 'duplicate_ingredient', 'major', 1.0, 0, (ingredient, ingredient)))
+
+        interactions = sorted(best.values(), key=lambda i: (SEVERITY_ORDER[i.severity],
+                                                            -i.confidence, -i.frequency))
+        return {
+            'drugs': drugs,
+            'resolved': {drug: sorted(found['drugs']) for drug, found in resolved.items()},
+            'unresolved': [drug for drug in drugs
+                           if not members[drug] and fold(drug) not in self._known_ingredients],
+            'pairs_checked': len(drugs) * (len(drugs) - 1) // 2,
+            'interactions': [interaction.to_dict() for interaction in interactions],
+            'elapsed_ms': round((time.perf_counter() - start) * 1000, 2),
+        }
@@ -0,0 +1,469 @@
+# In-memory medical graph and a Neo4j driver stand-in for offline benchmarks
+import csv
+import json
+import logging
+import random
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SYLLABLES = ['met', 'for', 'min', 'ibu', 'pro', 'fen', 'lis', 'ino', 'pril', 'ator', 'va',
+             'sta', 'tin', 'amlo', 'di', 'pine', 'ome', 'pra', 'zole', 'ser', 'tra', 'line',
+             'gaba', 'pen', 'cef', 'alex', 'cyc', 'lo', 'xa', 'ban', 'war', 'far', 'in']
+CONDITION_WORDS = ['chronic', 'acute', 'type 2', 'primary', 'secondary', 'severe', 'mild']
+CONDITION_ROOTS = ['diabetes', 'hypertension', 'arthritis', 'asthma', 'migraine', 'anemia',
+                   'hepatitis', 'neuropathy', 'dermatitis', 'insomnia', 'depression', 'gout']
+SYMPTOM_ROOTS = ['nausea', 'headache', 'dizziness', 'fatigue', 'rash', 'cough', 'fever',
+                 'insomnia', 'vomiting', 'diarrhea', 'pain', 'swelling', 'itching']
+# (source label, target label) of each relationship type the ingestor creates
+ENDPOINT_LABELS = {'TREATS': ('Drug', 'Disease'), 'CAUSES': ('Drug', 'Symptom'),
+                   'HAS_SYMPTOM': ('Disease', 'Symptom'), 'INTERACTS_WITH': ('Drug', 'Drug')}
+
+# Labels covered by each full-text index of graph/migrations/0001_initial_schema.cypher
+FULLTEXT_LABELS = {'drug_names_fulltext': ('Drug',),
+                   'entity_names_fulltext': ('Disease', 'Symptom', 'Chemical')}
+
+
+def _synthetic_name(rng: random.Random, n_syllables: int) -> str:
+    return ''.join(rng.choice(SYLLABLES) for _ in range(n_syllables))
+
+
+class InMemoryGraph:
+    """
+    Small property graph holding Drug/Disease/Symptom/Chemical nodes keyed by
+    name, with the same relationship types the ingestor creates.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, Dict[str, Dict[str, Any]]] = defaultdict(dict)
+        self.edges: Dict[str, List[tuple]] = defaultdict(list)
+        # (:GraphVersion) node; None until the first bump
+        self.version: Optional[Dict[str, int]] = None
+        # (:Migration) records by version
+        self.migrations: Dict[int, Dict[str, Any]] = {}
+
+    def bump_version(self) -> Dict[str, int]:
+        count = (self.version or {}).get('version', 0) + 1
+        self.version = {'version': count, 'updated_at': int(time.time() * 1000)}
+        return self.version
+
+    def add_node(self, label: str, name: str, **properties):
+        self.nodes[label][name] = {'name': name, **properties}
+
+    def add_edge(self, rel_type: str, source: str, target: str, **properties):
+        self.edges[rel_type].append((source, target, properties))
+
+    @classmethod
+    def synthetic(cls, drugs: int = 1000, diseases: int = 300, symptoms: int = 500,
+                  chemicals: int = 200, edges_per_drug: int = 8, seed: int = 0) -> 'InMemoryGraph':
+        """
+        Build a random graph with a skewed (Pareto) degree distribution
+
+        Args:
+            drugs, diseases, symptoms, chemicals: Node counts per label
+            edges_per_drug: Mean TREATS + CAUSES edges per drug
+            seed: Random seed; the same seed always yields the same graph
+
+        Returns:
+            InMemoryGraph instance
+        """
+        rng = random.Random(seed)
+        graph = cls()
+
+        def unique_names(count, make):
+            names = set()
+            while len(names) < count:
+                names.add(make())
+            return sorted(names)
+
+        drug_names = unique_names(drugs, lambda: _synthetic_name(rng, rng.randint(2, 4)))
+        disease_names = unique_names(diseases, lambda: (
+            f"{rng.choice(CONDITION_WORDS)} {rng.choice(CONDITION_ROOTS)} {_synthetic_name(rng, 2)}"))
+        symptom_names = unique_names(symptoms, lambda: (
+            f"{rng.choice(SYMPTOM_ROOTS)} {_synthetic_name(rng, 1)}"))
+        chemical_names = unique_names(chemicals, lambda: (
+            f"{_synthetic_name(rng, 3)} hydrochloride"))
+
+        for i, name in enumerate(drug_names):
+            graph.add_node('Drug', name, id=f"drug_{i:06d}", brand_names=[name.title()],
+                           generic_names=[name], description=f"{name.title()} is a synthetic drug.",
+                           fda_approved=i % 5 != 0)
+        for name in disease_names:
+            graph.add_node('Disease', name, id='disease_' + name.replace(' ', '_'))
+        for name in symptom_names:
+            graph.add_node('Symptom', name, id='symptom_' + name.replace(' ', '_'))
+        for name in chemical_names:
+            graph.add_node('Chemical', name, id='chemical_' + name.replace(' ', '_'))
+
+        def pick(names):
+            # Pareto-distributed rank keeps a few popular targets and a long tail
+            rank = min(int(rng.paretovariate(1.2)) - 1, len(names) - 1)
+            return names[rank]
+
+        for drug in drug_names:
+            degree = max(1, int(rng.expovariate(1.0 / edges_per_drug)))
+            for _ in range(degree):
+                if rng.random() < 0.4:
+                    graph.add_edge('TREATS', drug, pick(disease_names),
+                                   confidence=0.7, frequency=rng.randint(1, 50))
+                else:
+                    graph.add_edge('CAUSES', drug, pick(symptom_names),
+                                   confidence=0.6, frequency=rng.randint(1, 50))
+            if rng.random() < 0.2:
+                graph.add_edge('INTERACTS_WITH', drug, pick(drug_names),
+                               confidence=0.7, frequency=rng.randint(1, 10))
+        for disease in disease_names:
+            for _ in range(rng.randint(1, 6)):
+                graph.add_edge('HAS_SYMPTOM', disease, pick(symptom_names),
+                               confidence=0.6, frequency=rng.randint(1, 20))
+
+        return graph
+
+    @staticmethod
+    def _rank(score: Optional[float], confidence: Optional[float]) -> tuple:
+        # Scored facts first by score, then unscored ones by confidence, as the extraction queries order them
+        return (score is None, -(score or 0), -(confidence or 0))
+
+    def _ranked(self, rel_type: str) -> List[tuple]:
+        return sorted(self.edges.get(rel_type, []),
+                      key=lambda edge: self._rank(edge[2].get('score'), edge[2].get('confidence')))
+
+    def _facts(self, rel_type: str, end: int, max_facts: Optional[int] = None) -> Dict[str, List[tuple]]:
+        """(name, confidence) of each distinct neighbour, ranked on its best edge; end 0 groups by source"""
+        best = defaultdict(dict)
+        for edge in self.edges.get(rel_type, []):
+            props = edge[2]
+            fact = best[edge[end]].setdefault(edge[1 - end], [None, None])
+            for i, key in enumerate(('score', 'confidence')):
+                if props.get(key) is not None:
+                    fact[i] = props[key] if fact[i] is None else max(fact[i], props[key])
+        return {node: [(name, confidence) for name, (_, confidence)
+                       in sorted(facts.items(), key=lambda item: self._rank(*item[1]))][:max_facts]
+                for node, facts in best.items()}
+
+    def _targets(self, rel_type: str) -> Dict[str, List[str]]:
+        targets = defaultdict(list)
+        for source, target, _ in self._ranked(rel_type):
+            if target not in targets[source]:
+                targets[source].append(target)
+        return targets
+
+    def _sources(self, rel_type: str) -> Dict[str, List[str]]:
+        sources = defaultdict(list)
+        for source, target, _ in self._ranked(rel_type):
+            if source not in sources[target]:
+                sources[target].append(source)
+        return sources
+
+    def _confidences(self, rel_types: List[str], end: int) -> Dict[str, List[float]]:
+        # end 0 groups by source node, 1 by target node
+        confidences = defaultdict(list)
+        for rel_type in rel_types:
+            for edge in self.edges.get(rel_type, []):
+                confidences[edge[end]].append(edge[2].get('confidence'))
+        return confidences
+
+    def drug_rows(self, limit: Optional[int] = None, max_facts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows shaped like MedicalQASystem's drug extraction query"""
+        treats, causes = self._facts('TREATS', 0, max_facts), self._facts('CAUSES', 0, max_facts)
+        rows = [{'drug_id': node.get('id'), 'drug_name': name, 'description': node.get('description'),
+                 'fda_approved': node.get('fda_approved'),
+                 'treats': [fact[0] for fact in treats.get(name, [])],
+                 'side_effects': [fact[0] for fact in causes.get(name, [])],
+                 'confidences': [fact[1] for fact in treats.get(name, []) + causes.get(name, [])]}
+                for name, node in self.nodes['Drug'].items()]
+        return rows[:limit] if limit else rows
+
+    def disease_rows(self, limit: Optional[int] = None, max_facts: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows shaped like MedicalQASystem's disease extraction query"""
+        treated_by, symptoms = self._facts('TREATS', 1, max_facts), self._facts('HAS_SYMPTOM', 0, max_facts)
+        rows = [{'disease_id': node.get('id'), 'disease_name': name, 'description': node.get('description'),
+                 'treatments': [fact[0] for fact in treated_by.get(name, [])],
+                 'symptoms': [fact[0] for fact in symptoms.get(name, [])],
+                 'confidences': [fact[1] for fact in treated_by.get(name, []) + symptoms.get(name, [])]}
+                for name, node in self.nodes['Disease'].items()]
+        return rows[:limit] if limit else rows
+
+    def neighbourhood_rows(self, label: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows shaped like rag/answer_store.py's neighbourhood queries, busiest first"""
+        if label == 'Drug':
+            first, second = self._targets('TREATS'), self._targets('CAUSES')
+            keys = ('treats', 'side_effects')
+            confidences = self._confidences(['TREATS', 'CAUSES'], 0)
+        else:
+            first, second = self._sources('TREATS'), self._targets('HAS_SYMPTOM')
+            keys = ('treatments', 'symptoms')
+            confidences = self._confidences(['TREATS'], 1)
+            for source, _, props in self.edges.get('HAS_SYMPTOM', []):
+                confidences[source].append(props.get('confidence'))
+        rows = []
+        for name, node in self.nodes[label].items():
+            facts = {keys[0]: first.get(name, []), keys[1]: second.get(name, [])}
+            rows.append({'id': node.get('id'), 'name': name,
+                         'aliases': (node.get('brand_names') or []) + (node.get('generic_names') or [])
+                         + (node.get('aliases') or []),
+                         'description': node.get('description'), 'facts': facts,
+                         'confidences': confidences.get(name, []),
+                         'degree': sum(len(v) for v in facts.values())})
+        rows.sort(key=lambda row: (-row['degree'], row['name']))
+        return rows[:limit] if limit else rows
+
+    def fulltext_rows(self, index: str, query: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Rows shaped like graph/resolver.py's full-text query
+
+        A stand-in for Lucene: a node matches when every query term (fuzzy
+        markers and escapes stripped) occurs in its name or an alias, and
+        scores higher the more of the matched name the terms cover.
+        """
+        labels = FULLTEXT_LABELS.get(index, ())
+        terms = [term.strip().lower() for term in re.sub(r"\\|~", "", query).split(" AND ") if term.strip()]
+        rows = []
+        for label in labels:
+            for name, node in self.nodes[label].items():
+                surfaces = [name] + [alias for key in ('brand_names', 'generic_names', 'aliases', 'synonyms')
+                                     for alias in node.get(key) or []]
+                scores = [sum(len(term) for term in terms) / max(len(surface), 1)
+                          for surface in (s.lower() for s in surfaces) if all(term in surface for term in terms)]
+                if terms and scores:
+                    rows.append({'id': node.get('id'), 'name': name, 'label': label, 'score': max(scores)})
+        rows.sort(key=lambda row: (-row['score'], row['name']))
+        return rows[:limit] if limit else rows
+
+    def write_input_files(self, directory: str) -> Dict[str, Path]:
+        """
+        Write the graph as ingest inputs (fda_processed.jsonl, all_entities.jsonl,
+        unified_triples.csv)
+
+        Args:
+            directory: Output directory
+
+        Returns:
+            Mapping of input kind to written path
+        """
+        out = Path(directory)
+        out.mkdir(parents=True, exist_ok=True)
+        paths = {
+            'fda': out / "fda_processed.jsonl",
+            'entities': out / "all_entities.jsonl",
+            'triples': out / "unified_triples.csv",
+        }
+
+        with open(paths['fda'], 'w', encoding='utf-8') as f:
+            for name, node in self.nodes['Drug'].items():
+                f.write(json.dumps({
+                    'id': node['id'],
+                    'product_name': node.get('brand_names', []),
+                    'generic_name': node.get('generic_names', []),
+                    'active_ingredient': []
+                }) + "\n")
+
+        with open(paths['entities'], 'w', encoding='utf-8') as f:
+            for label in ('Disease', 'Symptom', 'Chemical'):
+                names = list(self.nodes[label])
+                for start in range(0, len(names), 20):
+                    f.write(json.dumps({'entities': [
+                        {'text': name, 'label': label.upper()} for name in names[start:start + 20]
+                    ]}) + "\n")
+
+        with open(paths['triples'], 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['subject', 'predicate', 'object', 'frequency'])
+            for rel_type, edges in self.edges.items():
+                for source, target, props in edges:
+                    writer.writerow([source, rel_type.lower(), target, props.get('frequency', 1)])
+
+        return paths
+
+
+class InMemoryResult:
+    """Minimal stand-in for neo4j.Result"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def data(self):
+        return list(self._records)
+
+    def consume(self):
+        return None
+
+
+class InMemorySession:
+    """
+    Session answering the read queries issued by MedicalQASystem and the
+    stats collector from an InMemoryGraph. Write statements are accepted and
+    counted but not applied (except the score writes of graph/centrality.py),
+    so ingest numbers against this stand-in measure client-side throughput only.
+    A read query it does not recognise raises NotImplementedError rather than
+    returning no rows.
+    """
+
+    LIMIT_PATTERN = re.compile(r"LIMIT\s+(\d+)")
+    LABEL_COUNT_PATTERN = re.compile(r"MATCH \(n:`?(\w+)`?\) RETURN count\(n\)")
+    TYPE_COUNT_PATTERN = re.compile(r"MATCH \(\)-\[r:`?(\w+)`?\]->\(\) RETURN count\(r\)")
+    NODE_EXPORT_PATTERN = re.compile(r"MATCH \(n:`?(\w+)`?\) RETURN n\.name AS name")
+    NAME_EXPORT_PATTERN = re.compile(r"MATCH \(n:`?(\w+)`?\)\s+RETURN n\.id AS id, n\.name AS name")
+    EDGE_EXPORT_PATTERN = re.compile(r"MATCH \(a\)-\[r:`?(\w+)`?\]->\(b\)\s+RETURN labels\(a\)")
+    DUPLICATES_PATTERN = re.compile(r"MATCH \(n:`(\w+)`\) WHERE n\.`(\w+)` IS NOT NULL\s+WITH n\.`\w+` AS value")
+    WRITE_PATTERN = re.compile(r"\b(MERGE|CREATE|SET|DELETE|REMOVE|DROP)\b")
+    NODE_SCORE_PATTERN = re.compile(r"MATCH \(n:`(\w+)` \{(\w+): row\.node\}\).*SET n\.centrality", re.DOTALL)
+    EDGE_SCORE_PATTERN = re.compile(r"MATCH \(a:`(\w+)` \{(\w+): row\.source\}\)-\[r:`(\w+)`\]->"
+                                    r"\(b:`(\w+)` \{(\w+): row\.target\}\).*SET r\.score", re.DOTALL)
+
+    def __init__(self, driver: 'InMemoryDriver'):
+        self.driver = driver
+        self.graph = driver.graph
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def close(self):
+        pass
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwargs) -> InMemoryResult:
+        parameters = dict(parameters or {}, **kwargs)
+        self.driver.statements += 1
+        if 'UNWIND' in query and parameters:
+            self.driver.rows_written += max(
+                (len(v) for v in parameters.values() if isinstance(v, list)), default=1)
+        elif any(keyword in query for keyword in ('MERGE', 'CREATE', 'SET ', 'DELETE')):
+            self.driver.rows_written += 1
+
+        return InMemoryResult(self._read(query, parameters))
+
+    def _read(self, query: str, parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        limit_match = self.LIMIT_PATTERN.search(query)
+        limit = int(limit_match.group(1)) if limit_match else None
+
+        if 'MERGE (m:Migration' in query:
+            self.graph.migrations[parameters['version']] = {
+                'version': parameters['version'], 'name': parameters['name'],
+                'checksum': parameters['checksum']}
+            return []
+        match = self.DUPLICATES_PATTERN.search(query)
+        if match:
+            counts = defaultdict(int)
+            for node in self.graph.nodes.get(match.group(1), {}).values():
+                if node.get(match.group(2)) is not None:
+                    counts[node[match.group(2)]] += 1
+            duplicates = sorted(((v, n) for v, n in counts.items() if n > 1), key=lambda d: (-d[1], d[0]))
+            return [{'value': value, 'nodes': nodes} for value, nodes in duplicates[:parameters.get('limit')]]
+        if 'MATCH (m:Migration)' in query:
+            return [dict(record) for _, record in sorted(self.graph.migrations.items())]
+        if 'GraphVersion' in query:
+            if 'SET ' in query:
+                return [self.graph.bump_version()]
+            return [dict(self.graph.version)] if self.graph.version else []
+        match = self.NODE_SCORE_PATTERN.search(query)
+        if match:
+            key = match.group(2)
+            scores = {row['node']: row['score'] for row in parameters['rows']}
+            for name, node in self.graph.nodes[match.group(1)].items():
+                if node.get(key) in scores:
+                    node['centrality'] = scores[node[key]]
+            return []
+        match = self.EDGE_SCORE_PATTERN.search(query)
+        if match:
+            source_label, source_key, rel_type, target_label, target_key = match.groups()
+            scores = {(row['source'], row['target']): row['score'] for row in parameters['rows']}
+            sources, targets = self.graph.nodes[source_label], self.graph.nodes[target_label]
+            for source, target, props in self.graph.edges.get(rel_type, []):
+                pair = ((sources.get(source) or {}).get(source_key), (targets.get(target) or {}).get(target_key))
+                if pair in scores:
+                    props['score'] = scores[pair]
+            return []
+        if 'AS degree' in query:
+            return self.graph.neighbourhood_rows(
+                'Disease' if 'MATCH (disease:Disease)' in query else 'Drug', parameters.get('limit'))
+        if 'as drug_name' in query:
+            return self.graph.drug_rows(limit, parameters.get('max_facts'))
+        if 'as disease_name' in query:
+            return self.graph.disease_rows(limit, parameters.get('max_facts'))
+        if 'd.brand_names AS brand_names' in query:
+            return [{'name': name, 'brand_names': node.get('brand_names'),
+                     'generic_names': node.get('generic_names'),
+                     'active_ingredients': node.get('active_ingredients')}
+                    for name, node in self.graph.nodes['Drug'].items()]
+        if 'a.name IN $names AND b.name IN $names' in query:
+            names = set(parameters.get('names', []))
+            return [{'source': source, 'target': target, 'confidence': props.get('confidence'),
+                     'frequency': props.get('frequency')}
+                    for source, target, props in self.graph.edges.get('INTERACTS_WITH', [])
+                    if source in names and target in names]
+        if 'db.index.fulltext.queryNodes' in query:
+            return self.graph.fulltext_rows(parameters['index'], parameters['query'], parameters.get('limit'))
+        if 'db.relationshipTypes' in query:
+            return [{'relationshipType': t} for t, edges in self.graph.edges.items() if edges]
+        if 'db.labels' in query:
+            return [{'label': label} for label, nodes in self.graph.nodes.items() if nodes]
+
+        match = self.NAME_EXPORT_PATTERN.search(query)
+        if match:
+            return [{'id': node.get('id'), 'name': name,
+                     'aliases': [alias for key in ('brand_names', 'generic_names', 'aliases', 'synonyms')
+                                 for alias in node.get(key) or []]}
+                    for name, node in self.graph.nodes.get(match.group(1), {}).items()]
+        match = self.NODE_EXPORT_PATTERN.search(query)
+        if match:
+            return [{'name': name, 'id': node.get('id')}
+                    for name, node in self.graph.nodes.get(match.group(1), {}).items()]
+        match = self.EDGE_EXPORT_PATTERN.search(query)
+        if match:
+            rel_type = match.group(1)
+            source_label, target_label = ENDPOINT_LABELS.get(rel_type, (None, None))
+            sources, targets = self.graph.nodes.get(source_label, {}), self.graph.nodes.get(target_label, {})
+            return [{'source_labels': [source_label], 'source': source,
+                     'source_id': (sources.get(source) or {}).get('id'),
+                     'target_labels': [target_label], 'target': target,
+                     'target_id': (targets.get(target) or {}).get('id'),
+                     'confidence': props.get('confidence'), 'frequency': props.get('frequency')}
+                    for source, target, props in self.graph.edges.get(rel_type, [])]
+
+        match = self.LABEL_COUNT_PATTERN.search(query)
+        if match:
+            return [{'count': len(self.graph.nodes.get(match.group(1), {}))}]
+        match = self.TYPE_COUNT_PATTERN.search(query)
+        if match:
+            return [{'count': len(self.graph.edges.get(match.group(1), []))}]
+        if 'MATCH (n) RETURN count(n)' in query:
+            return [{'count': sum(len(nodes) for nodes in self.graph.nodes.values())}]
+        if 'MATCH ()-[r]->() RETURN count(r)' in query:
+            return [{'count': sum(len(edges) for edges in self.graph.edges.values())}]
+        if 'SHOW INDEXES' in query:
+            # No indexes to wait for
+            return []
+        if self.WRITE_PATTERN.search(query):
+            return []
+        raise NotImplementedError(f"InMemorySession cannot answer: {' '.join(query.split())[:200]}")
+
+
+class InMemoryDriver:
+    """Neo4j driver stand-in serving an InMemoryGraph"""
+
+    def __init__(self, graph: Optional[InMemoryGraph] = None):
+        self.graph = graph or InMemoryGraph()
+        self.statements = 0
+        self.rows_written = 0
+
+    def session(self, **kwargs) -> InMemorySession:
+        return InMemorySession(self)
+
+    def verify_connectivity(self):
+        return None
+
+    def close(self):
+        pass
@@ -0,0 +1,280 @@
+# Versioned Cypher schema migrations and index readiness
+import argparse
+import hashlib
+import logging
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_FILE = re.compile(r"^(\d+)_([\w-]+)\.cypher$")
+
+APPLIED_QUERY = """
+MATCH (m:Migration)
+RETURN m.version AS version, m.name AS name, m.checksum AS checksum
+ORDER BY m.version
+"""
+RECORD_QUERY = """
+MERGE (m:Migration {version: $version})
+SET m.name = $name, m.checksum = $checksum, m.statements = $statements,
+    m.applied_at = datetime()
+"""
+# Uniqueness constraints fail on existing duplicates; find them first
+UNIQUE_CONSTRAINT = re.compile(
+    r"CREATE\s+CONSTRAINT\b.*?\bFOR\s*\(\s*(\w+)\s*:\s*`?(\w+)`?\s*\)\s*"
+    r"REQUIRE\s+\1\.`?(\w+)`?\s+IS\s+UNIQUE", re.IGNORECASE | re.DOTALL)
+DUPLICATES_QUERY = """
+MATCH (n:`{label}`) WHERE n.`{key}` IS NOT NULL
+WITH n.`{key}` AS value, count(*) AS nodes WHERE nodes > 1
+RETURN value, nodes ORDER BY nodes DESC, value LIMIT $limit
+"""
+INDEX_STATE_QUERY = """
+SHOW INDEXES YIELD name, type, state, populationPercent
+RETURN name, type, state, populationPercent
+"""
+
+
+class MigrationError(RuntimeError):
+    """A migration failed, was edited after being applied, or indexes never came online"""
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    path: Path
+    checksum: str
+    statements: List[str]
+
+
+def split_statements(text: str) -> List[str]:
+    """
+    Split Cypher text into statements on top-level semicolons
+
+    Semicolons inside 'single'/"double" quoted strings (with backslash
+    escapes), `backtick` identifiers, // line comments and /* block
+    comments */ do not end a statement. Comments are dropped.
+
+    Returns:
+        Non-empty statements without their trailing semicolon
+    """
+    statements, current = [], []
+    i, n = 0, len(text)
+    while i < n:
+        char = text[i]
+        if char in ("'", '"', '`'):
+            end = i + 1
+            while end < n and text[end] != char:
+                end += 2 if text[end] == '\\' and char != '`' else 1
+            current.append(text[i:end + 1])
+            i = end + 1
+        elif text.startswith('//', i):
+            newline = text.find('\n', i)
+            i = n if newline == -1 else newline
+        elif text.startswith('/*', i):
+            close = text.find('*/', i + 2)
+            if close == -1:
+                raise MigrationError("Unterminated /* comment")
+            current.append(' ')
+            i = close + 2
+        elif char == ';':
+            statements.append(''.join(current).strip())
+            current = []
+            i += 1
+        else:
+            current.append(char)
+            i += 1
+    statements.append(''.join(current).strip())
+    return [statement for statement in statements if statement]
+
+
+def discover(directory: Optional[str] = None) -> List[Migration]:
+    """Migrations in a directory (``NNNN_name.cypher``), by version"""
+    migrations = []
+    for path in sorted(Path(directory or MIGRATIONS_DIR).glob("*.cypher")):
+        match = MIGRATION_FILE.match(path.name)
+        if not match:
+            logger.warning(f"Skipping {path.name}: not named NNNN_name.cypher")
+            continue
+        text = path.read_text(encoding='utf-8')
+        migrations.append(Migration(int(match.group(1)), match.group(2), path,
+                                    hashlib.sha256(text.encode('utf-8')).hexdigest(),
+                                    split_statements(text)))
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f"Duplicate migration versions in {directory or MIGRATIONS_DIR}")
+    return sorted(migrations)
+
+
+class MigrationRunner:
+    """
+    Apply pending schema migrations in version order
+
+    Each applied migration is recorded as a ``(:Migration)`` node with its
+    checksum; an applied file that has since changed is an error rather than
+    being silently re-run. Statements run one at a time (Neo4j does not mix
+    schema and data changes in one transaction) and the first failure stops
+    the run before the migration is recorded, so fixing the statement and
+    re-running picks up where it stopped. Uniqueness constraints are checked
+    against existing duplicates before a migration starts, so data that would
+    violate one fails the run with the offending values listed instead of
+    half-way through the migration.
+    """
+
+    def __init__(self, driver, directory: Optional[str] = None):
+        """
+        Args:
+            driver: Neo4j driver (or compatible stand-in)
+            directory: Migration directory (defaults to graph/migrations)
+        """
+        self.driver = driver
+        self.directory = directory
+
+    def applied(self) -> Dict[int, Dict[str, Any]]:
+        with self.driver.session() as session:
+            return {record['version']: {'name': record['name'], 'checksum': record['checksum']}
+                    for record in session.run(APPLIED_QUERY)}
+
+    def pending(self) -> List[Migration]:
+        """Migrations not yet applied; raises if an applied one was edited"""
+        applied = self.applied()
+        pending = []
+        for migration in discover(self.directory):
+            record = applied.get(migration.version)
+            if record is None:
+                pending.append(migration)
+            elif record['checksum'] != migration.checksum:
+                raise MigrationError(
+                    f"Migration {migration.path.name} changed after it was applied; "
+                    f"add a new migration instead of editing it")
+        return pending
+
+    def check_unique_constraints(self, migration: Migration, limit: int = 10):
+        """
+        Raise before any statement of ``migration`` runs if one of its
+        uniqueness constraints would fail on values that are already duplicated
+
+        Args:
+            migration: Migration about to be applied
+            limit: Duplicated values listed per constraint
+        """
+        problems = []
+        with self.driver.session() as session:
+            for statement in migration.statements:
+                match = UNIQUE_CONSTRAINT.search(statement)
+                if not match:
+                    continue
+                _, label, key = match.groups()
+                duplicates = [(record['value'], record['nodes']) for record in
+                              session.run(DUPLICATES_QUERY.format(label=label, key=key), limit=limit)]
+                if duplicates:
+                    listed = ', '.join(f"{value!r} x{nodes}" for value, nodes in duplicates)
+                    problems.append(f":{label}({key}) has duplicates: {listed}"
+                                    + (" ..." if len(duplicates) >= limit else ""))
+        if problems:
+            raise MigrationError(
+                f"Migration {migration.path.name} adds uniqueness constraints that existing data "
+                f"violates; " + "; ".join(problems) + ". Merge or delete the duplicate nodes "
+                f"(e.g. with apoc.refactor.mergeNodes, keeping their relationships) and re-run; "
+                f"nothing from this migration was applied")
+
+    def migrate(self) -> List[int]:
+        """
+        Apply every pending migration
+
+        Returns:
+            Versions applied by this call
+        """
+        done = []
+        for migration in self.pending():
+            start = time.perf_counter()
+            self.check_unique_constraints(migration)
+            with self.driver.session() as session:
+                for statement in migration.statements:
+                    try:
+                        session.run(statement).consume()
+                    except Exception as e:
+                        raise MigrationError(
+                            f"Migration {migration.path.name} failed at: "
+                            f"{' '.join(statement.split())[:120]}: {e}") from e
+                session.run(RECORD_QUERY, version=migration.version, name=migration.name,
+                            checksum=migration.checksum,
+                            statements=len(migration.statements)).consume()
+            done.append(migration.version)
+            logger.info(f"Applied migration {migration.path.name} "
+                        f"({len(migration.statements)} statements, {time.perf_counter() - start:.2f}s)")
+        if not done:
+            logger.info("Schema is up to date")
+        return done
+
+
+def await_indexes_online(driver, timeout: float = 600.0, interval: float = 1.0) -> List[Dict[str, Any]]:
+    """
+    Block until every index is ONLINE
+
+    Bulk loads MERGE on indexed keys; starting one while an index is still
+    POPULATING makes every MERGE a label scan.
+
+    Args:
+        driver: Neo4j driver
+        timeout: Seconds to wait before raising
+        interval: Seconds between polls
+
+    Returns:
+        Final index states
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        with driver.session() as session:
+            indexes = [{'name': r['name'], 'type': r['type'], 'state': r['state'],
+                        'populationPercent': r['populationPercent']}
+                       for r in session.run(INDEX_STATE_QUERY)]
+        failed = [ix['name'] for ix in indexes if ix['state'] == 'FAILED']
+        if failed:
+            raise MigrationError(f"Indexes failed to populate: {', '.join(failed)}")
+        waiting = [ix for ix in indexes if ix['state'] != 'ONLINE']
+        if not waiting:
+            logger.info(f"All {len(indexes)} indexes online")
+            return indexes
+        if time.monotonic() >= deadline:
+            raise MigrationError(f"Indexes not online after {timeout:.0f}s: "
+                                 f"{', '.join(ix['name'] for ix in waiting)}")
+        logger.info("Waiting for indexes: " + ", ".join(
+            f"{ix['name']} {ix['state']} {ix['populationPercent'] or 0:.0f}%" for ix in waiting))
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply Neo4j schema migrations")
+    parser.add_argument('--status', action='store_true', help="List pending migrations and exit")
+    parser.add_argument('--dir', default=None, help="Migration directory")
+    parser.add_argument('--timeout', type=float,
+                        default=float(os.getenv("GRAPH_INDEX_TIMEOUT", "600")),
+                        help="Seconds to wait for indexes to come online")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from neo4j import GraphDatabase
+    driver = GraphDatabase.driver(os.getenv("NEO4J_URI", "bolt://localhost:7687"), auth=(
+        os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")))
+    try:
+        runner = MigrationRunner(driver, args.dir)
+        if args.status:
+            for migration in runner.pending():
+                print(f"pending  {migration.path.name} ({len(migration.statements)} statements)")
+            return
+        runner.migrate()
+        await_indexes_online(driver, timeout=args.timeout)
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
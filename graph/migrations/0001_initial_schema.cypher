@@ -0,0 +1,33 @@
+// Initial constraints and indexes (previously applied from graph/schema.cypher).
+// Every statement is idempotent, so databases set up from schema.cypher take
+// this migration as a no-op.
+
+// Drug nodes
+CREATE CONSTRAINT drug_id_unique IF NOT EXISTS FOR (d:Drug) REQUIRE d.id IS UNIQUE;
+CREATE INDEX drug_name_index IF NOT EXISTS FOR (d:Drug) ON (d.name);
+// The ingestor writes generic_names (a list); generic names are searched
+// through drug_names_fulltext below
+DROP INDEX drug_generic_index IF EXISTS;
+
+// Disease nodes
+CREATE CONSTRAINT disease_id_unique IF NOT EXISTS FOR (d:Disease) REQUIRE d.id IS UNIQUE;
+CREATE INDEX disease_name_index IF NOT EXISTS FOR (d:Disease) ON (d.name);
+
+// Symptom nodes
+CREATE CONSTRAINT symptom_id_unique IF NOT EXISTS FOR (s:Symptom) REQUIRE s.id IS UNIQUE;
+CREATE INDEX symptom_name_index IF NOT EXISTS FOR (s:Symptom) ON (s.name);
+
+// Chemical/Compound nodes (for active ingredients)
+CREATE CONSTRAINT chemical_id_unique IF NOT EXISTS FOR (c:Chemical) REQUIRE c.id IS UNIQUE;
+CREATE INDEX chemical_name_index IF NOT EXISTS FOR (c:Chemical) ON (c.name);
+
+// Graph version, bumped after every ingest run; cached reads are keyed by it
+// (see graph/query_cache.py)
+CREATE CONSTRAINT graph_version_id_unique IF NOT EXISTS FOR (v:GraphVersion) REQUIRE v.id IS UNIQUE;
+
+// Full-text indexes for entity resolution (misspellings, brand names, aliases);
+// see graph/resolver.py
+CREATE FULLTEXT INDEX drug_names_fulltext IF NOT EXISTS
+FOR (d:Drug) ON EACH [d.name, d.brand_names, d.generic_names, d.active_ingredients];
+CREATE FULLTEXT INDEX entity_names_fulltext IF NOT EXISTS
+FOR (n:Disease|Symptom|Chemical) ON EACH [n.name, n.aliases, n.synonyms];
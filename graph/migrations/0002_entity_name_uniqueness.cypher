@@ -0,0 +1,17 @@
+// Disease, Symptom and Chemical nodes are MERGEd on name (their canonical key,
+// see create_entities_from_ner) and relationships MATCH them on name, so name
+// is the key that must be unique. A uniqueness constraint brings its own
+// index, which replaces the plain name index from 0001 (Neo4j refuses to
+// create a constraint over an existing index on the same property).
+
+DROP INDEX disease_name_index IF EXISTS;
+CREATE CONSTRAINT disease_name_unique IF NOT EXISTS FOR (d:Disease) REQUIRE d.name IS UNIQUE;
+
+DROP INDEX symptom_name_index IF EXISTS;
+CREATE CONSTRAINT symptom_name_unique IF NOT EXISTS FOR (s:Symptom) REQUIRE s.name IS UNIQUE;
+
+DROP INDEX chemical_name_index IF EXISTS;
+CREATE CONSTRAINT chemical_name_unique IF NOT EXISTS FOR (c:Chemical) REQUIRE c.name IS UNIQUE;
+
+// Applied-migration records written by graph/migrate.py
+CREATE CONSTRAINT migration_version_unique IF NOT EXISTS FOR (m:Migration) REQUIRE m.version IS UNIQUE;
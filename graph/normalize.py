@@ -0,0 +1,525 @@
+# Entity name canonicalization and near-duplicate merging for NER output
+import csv
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# NER label -> graph node label
+ENTITY_LABELS = {'DISEASE': 'Disease', 'SYMPTOM': 'Symptom', 'CHEMICAL': 'Chemical'}
+
+# Whole-name clinical abbreviations, matched after folding. Only Disease and
+# Symptom names are expanded: as a Chemical, "MS" is morphine sulfate, not
+# multiple sclerosis (likewise "PE", "RA", "MI").
+CLINICAL_ABBREVIATIONS = {
+    't1dm': 'type 1 diabetes mellitus',
+    't2dm': 'type 2 diabetes mellitus',
+    'dm': 'diabetes mellitus',
+    'htn': 'hypertension',
+    'mi': 'myocardial infarction',
+    'chf': 'congestive heart failure',
+    'cad': 'coronary artery disease',
+    'copd': 'chronic obstructive pulmonary disease',
+    'ckd': 'chronic kidney disease',
+    'gerd': 'gastroesophageal reflux disease',
+    'ra': 'rheumatoid arthritis',
+    'oa': 'osteoarthritis',
+    'ms': 'multiple sclerosis',
+    'uti': 'urinary tract infection',
+    'afib': 'atrial fibrillation',
+    'af': 'atrial fibrillation',
+    'dvt': 'deep vein thrombosis',
+    'pe': 'pulmonary embolism',
+    'adhd': 'attention deficit hyperactivity disorder',
+    'mdd': 'major depressive disorder',
+    'ibs': 'irritable bowel syndrome',
+    'sob': 'shortness of breath',
+    'nv': 'nausea and vomiting',
+}
+# Graph label -> abbreviation table; labels without one are never expanded
+ABBREVIATIONS = {'Disease': CLINICAL_ABBREVIATIONS, 'Symptom': CLINICAL_ABBREVIATIONS}
+
+# Folded variant -> preferred folded name
+SYNONYMS = {
+    'type 2 diabetes': 'type 2 diabetes mellitus',
+    'diabetes mellitus type 2': 'type 2 diabetes mellitus',
+    'diabetes type 2': 'type 2 diabetes mellitus',
+    'non insulin dependent diabetes': 'type 2 diabetes mellitus',
+    'type 1 diabetes': 'type 1 diabetes mellitus',
+    'diabetes mellitus type 1': 'type 1 diabetes mellitus',
+    'diabetes type 1': 'type 1 diabetes mellitus',
+    'insulin dependent diabetes': 'type 1 diabetes mellitus',
+    'high blood pressure': 'hypertension',
+    'heart attack': 'myocardial infarction',
+    'heartburn': 'gastroesophageal reflux disease',
+    'acid reflux': 'gastroesophageal reflux disease',
+    'stomach ache': 'abdominal pain',
+    'stomach pain': 'abdominal pain',
+    'belly pain': 'abdominal pain',
+    'head ache': 'headache',
+    'sleeplessness': 'insomnia',
+    'tiredness': 'fatigue',
+    'pyrexia': 'fever',
+    'emesis': 'vomiting',
+    'pruritus': 'itching',
+    'itchiness': 'itching',
+    'anaemia': 'anemia',
+    'oedema': 'edema',
+    'diarrhoea': 'diarrhea',
+}
+
+# Roman numerals inside names ("type II diabetes")
+NUMERALS = {'i': '1', 'ii': '2', 'iii': '3', 'iv': '4'}
+
+# Plurals the suffix rules in ``singularize`` get wrong
+IRREGULAR_PLURALS = {
+    'varices': 'varix', 'appendices': 'appendix', 'cervices': 'cervix', 'apices': 'apex',
+    'cortices': 'cortex', 'vertices': 'vertex', 'matrices': 'matrix', 'indices': 'index',
+    'calyces': 'calyx', 'diagnoses': 'diagnosis', 'prognoses': 'prognosis',
+    'metastases': 'metastasis', 'stenoses': 'stenosis', 'thromboses': 'thrombosis',
+    'psychoses': 'psychosis', 'neuroses': 'neurosis', 'fibroses': 'fibrosis',
+    'anastomoses': 'anastomosis', 'ganglia': 'ganglion', 'bacteria': 'bacterium',
+}
+
+# Words ending in "s" that are not plurals; "-ss", "-us" and "-is" endings are
+# already left alone by ``singularize``
+INVARIANT_NOUNS = {
+    'diabetes', 'herpes', 'rabies', 'measles', 'mumps', 'scabies', 'rickets', 'shingles',
+    'hives', 'ascites', 'caries', 'feces', 'facies', 'series', 'species', 'gas', 'aids',
+}
+
+_COMBINING = re.compile(r"[\u0300-\u036f]")
+_APOSTROPHES = re.compile(r"['’‘`]s\b|['’‘`]")
+_PUNCTUATION = re.compile(r"[^\w\s]|_")
+_WHITESPACE = re.compile(r"\s+")
+_DIGITS = re.compile(r"\d+")
+
+# Near-duplicate pass: only keys of this length that share this prefix are
+# compared, and single-edit differences are reported as merge candidates.
+# One edit is not a safe equivalence for clinical terms ("dysphagia" vs
+# "dysphasia", "hypertonia" vs "hypertonic"), so candidates are merged only
+# when a reviewed allow-list approves them (see load_merge_allowlist).
+FUZZY_MIN_LENGTH = 8
+FUZZY_PREFIX = 4
+FUZZY_CANDIDATE_JACCARD = 0.5
+MAX_BLOCK_SIZE = 2000
+MERGE_COLUMNS = ['label', 'key_a', 'key_b', 'mentions_a', 'mentions_b', 'approved']
+
+
+def fold(text: str) -> str:
+    """Unicode-fold, case-fold and strip punctuation from a name"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = _COMBINING.sub('', text).casefold()
+    text = _APOSTROPHES.sub('', text)
+    text = _PUNCTUATION.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def singularize(word: str) -> str:
+    """Strip a regular English plural from a word"""
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if len(word) <= 3 or word in INVARIANT_NOUNS or not word.endswith('s'):
+        return word
+    if word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('sses'):
+        return word[:-2]
+    if word.endswith('ies') and len(word) > 4:
+        return word[:-3] + 'y'
+    if word.endswith(('shes', 'xes', 'zes')) or (word.endswith('ches')
+                                                  and not word.endswith('aches')):
+        return word[:-2]
+    return word[:-1]
+
+
+class EntityNormalizer:
+    """
+    Canonicalizes entity strings
+
+    Names are Unicode- and case-folded, punctuation is dropped, Roman numerals
+    become digits, abbreviations are expanded for labels that have a table,
+    the head noun is singularized and synonyms are mapped to a preferred name.
+    """
+
+    def __init__(self, abbreviations: Optional[Dict[str, Dict[str, str]]] = None,
+                 synonyms: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            abbreviations: Graph label -> {folded abbreviation: expansion}
+                (defaults to ABBREVIATIONS)
+            synonyms: Folded variant -> preferred name (defaults to SYNONYMS)
+        """
+        self.abbreviations = {label: {fold(k): fold(v) for k, v in table.items()}
+                              for label, table in
+                              (ABBREVIATIONS if abbreviations is None else abbreviations).items()}
+        self.synonyms = {fold(k): fold(v) for k, v in
+                         (SYNONYMS if synonyms is None else synonyms).items()}
+
+    def normalize(self, text: str, label: Optional[str] = None) -> str:
+        """
+        Canonical key for a single name
+
+        Args:
+            text: Raw entity text
+            label: Graph label of the entity; abbreviations are only expanded
+                for labels in the abbreviation table
+
+        Returns:
+            Normalized key (empty string for blank input)
+        """
+        key = fold(text)
+        if not key:
+            return key
+        abbreviations = self.abbreviations.get(label, {}) if label else {}
+        key = abbreviations.get(key.replace(' ', ''), abbreviations.get(key, key))
+        tokens = [NUMERALS.get(token, token) for token in key.split(' ')]
+        tokens[-1] = singularize(tokens[-1])
+        key = ' '.join(tokens)
+        return self.synonyms.get(key, key)
+
+    def normalize_series(self, names: pd.Series, labels: Optional[pd.Series] = None) -> pd.Series:
+        """
+        Vectorized ``normalize``
+
+        (label, name) pairs are factorized first, so each distinct one is
+        normalized once no matter how often it repeats.
+
+        Args:
+            names: Raw names
+            labels: Graph label per name (None entries get no abbreviation expansion)
+        """
+        names = names.astype(str)
+        if labels is None:
+            codes, uniques = pd.factorize(names, sort=False)
+            normalized = np.array([self.normalize(name) for name in uniques], dtype=object)
+        else:
+            labels = labels.where(labels.notna(), '').astype(str)
+            codes, uniques = pd.factorize(labels + "\x1f" + names, sort=False)
+            normalized = np.array([self.normalize(name, label or None) for label, name in
+                                   (unique.split("\x1f", 1) for unique in uniques)], dtype=object)
+        return pd.Series(normalized[codes] if len(codes) else [], index=names.index, dtype=object)
+
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def within_one_edit(a: str, b: str) -> bool:
+    """Whether ``b`` is ``a`` with one substitution, insertion, deletion or adjacent swap"""
+    if abs(len(a) - len(b)) > 1 or a == b:
+        return a == b
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i:i + 2] == b[i:i + 2][::-1] and a[i + 2:] == b[i + 2:])
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return longer[i + 1:] == shorter[i:]
+
+
+def _match_block(keys: List[str]) -> List[Tuple[int, int]]:
+    """
+    Near-duplicate pairs within one block
+
+    Candidates come from a trigram Jaccard matrix computed with NumPy and are
+    confirmed when they are one edit apart. Names whose numbers differ
+    ("type 1" vs "type 2") never match.
+    """
+    if len(keys) < 2:
+        return []
+    grams = [_trigrams(key) for key in keys]
+    vocabulary = {gram: i for i, gram in enumerate(set().union(*grams))}
+    matrix = np.zeros((len(keys), len(vocabulary)), dtype=np.float32)
+    for row, key_grams in enumerate(grams):
+        matrix[row, [vocabulary[g] for g in key_grams]] = 1.0
+    sizes = matrix.sum(axis=1)
+    intersection = matrix @ matrix.T
+    jaccard = intersection / (sizes[:, None] + sizes[None, :] - intersection)
+
+    pairs = []
+    rows, cols = np.nonzero(np.triu(jaccard >= FUZZY_CANDIDATE_JACCARD, k=1))
+    for i, j in zip(rows.tolist(), cols.tolist()):
+        if _DIGITS.findall(keys[i]) != _DIGITS.findall(keys[j]):
+            continue
+        if within_one_edit(keys[i], keys[j]):
+            pairs.append((i, j))
+    return pairs
+
+
+def _blocks(keys: List[str]) -> List[List[int]]:
+    """
+    Group key indexes into candidate blocks
+
+    Keys are blocked on their first FUZZY_PREFIX characters plus their digits; blocks
+    above MAX_BLOCK_SIZE are split into length bands so the dense matrix stays
+    small.
+    """
+    blocks = defaultdict(list)
+    for i, key in enumerate(keys):
+        if len(key) >= FUZZY_MIN_LENGTH:
+            blocks[(key[:FUZZY_PREFIX], tuple(_DIGITS.findall(key)))].append(i)
+
+    result = []
+    for members in blocks.values():
+        if len(members) <= MAX_BLOCK_SIZE:
+            result.append(members)
+            continue
+        members = sorted(members, key=lambda i: len(keys[i]))
+        # Overlapping windows keep neighbours across band edges comparable
+        step = MAX_BLOCK_SIZE // 2
+        for start in range(0, len(members) - step, step):
+            result.append(members[start:start + MAX_BLOCK_SIZE])
+    return [block for block in result if len(block) > 1]
+
+
+class CanonicalMap:
+    """
+    Mapping from (label, normalized key) to a canonical entity
+
+    Canonical ids follow the ingestor's ``<label>_<name_with_underscores>``
+    scheme, so nodes created before normalization keep compatible ids.
+    """
+
+    COLUMNS = ['label', 'key', 'canonical_id', 'canonical_name', 'mentions']
+
+    def __init__(self, normalizer: Optional[EntityNormalizer] = None):
+        self.normalizer = normalizer or EntityNormalizer()
+        self.entries: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        self.mentions: Counter = Counter()
+        # Near-duplicate pairs found but not merged, for review
+        self.fuzzy_candidates: List[Tuple[str, str, str, int, int]] = []
+        self._any_label: Optional[Dict[str, str]] = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def canonical_id(label: str, name: str) -> str:
+        return f"{label.lower()}_{name.replace(' ', '_')}"
+
+    def add(self, label: str, key: str, canonical_name: str, mentions: int = 0):
+        self.entries[(label, key)] = (self.canonical_id(label, canonical_name), canonical_name)
+        self.mentions[(label, key)] += mentions
+        self._any_label = None
+
+    def canonical_name(self, label: Optional[str], text: str) -> str:
+        """Canonical node name for raw text, or its normalized key if unmapped"""
+        key = self.normalizer.normalize(text, label)
+        if label is None:
+            return self._label_free().get(key, key)
+        return self.entries.get((label, key), (None, key))[1]
+
+    def _label_free(self) -> Dict[str, str]:
+        if self._any_label is None:
+            self._any_label = {}
+            for (_, key), (_, name) in self.entries.items():
+                self._any_label.setdefault(key, name)
+        return self._any_label
+
+    def resolve_series(self, names: pd.Series, labels: Optional[pd.Series] = None) -> pd.Series:
+        """
+        Vectorized canonical names for raw entity strings
+
+        Args:
+            names: Raw names
+            labels: Node label per name; ``None`` entries (or no labels at all)
+                fall back to a label-free lookup
+
+        Returns:
+            Canonical names, or normalized keys for names not in the map
+        """
+        keys = self.normalizer.normalize_series(names, labels)
+        if not self.entries:
+            return keys
+        by_key = keys.map(self._label_free())
+        if labels is not None:
+            flat = {f"{label}\x1f{key}": name for (label, key), (_, name) in self.entries.items()}
+            by_label = (labels.astype(str) + "\x1f" + keys).map(flat)
+            by_key = by_label.where(labels.notna(), by_key)
+        return by_key.fillna(keys)
+
+    def nodes(self, label: str) -> List[Dict[str, object]]:
+        """
+        Node rows for one label: canonical id, name and merged aliases
+
+        Returns:
+            List of dicts with ``id``, ``name``, ``aliases`` and ``mentions``
+        """
+        grouped: Dict[str, Dict[str, object]] = {}
+        for (entry_label, key), (canonical_id, name) in self.entries.items():
+            if entry_label != label:
+                continue
+            row = grouped.setdefault(canonical_id, {'id': canonical_id, 'name': name,
+                                                    'aliases': [], 'mentions': 0})
+            if key != name:
+                row['aliases'].append(key)
+            row['mentions'] += self.mentions[(entry_label, key)]
+        return sorted(grouped.values(), key=lambda row: row['id'])
+
+    def save(self, path: str):
+        """Write the map as CSV"""
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(self.COLUMNS)
+            for (label, key), (canonical_id, name) in sorted(self.entries.items()):
+                writer.writerow([label, key, canonical_id, name, self.mentions[(label, key)]])
+
+    def save_fuzzy_candidates(self, path: str):
+        """
+        Write the unmerged near-duplicate pairs as CSV for review
+
+        Set ``approved`` to 1 on the pairs that really are the same entity
+        and pass the file as ENTITY_MERGE_ALLOWLIST to merge them.
+        """
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(MERGE_COLUMNS)
+            for label, key_a, key_b, mentions_a, mentions_b in sorted(self.fuzzy_candidates):
+                writer.writerow([label, key_a, key_b, mentions_a, mentions_b, ''])
+
+    @classmethod
+    def load(cls, path: str, normalizer: Optional[EntityNormalizer] = None) -> 'CanonicalMap':
+        """Read a map written by ``save``"""
+        canonical = cls(normalizer)
+        frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+        for label, key, name, mentions in zip(frame['label'], frame['key'],
+                                              frame['canonical_name'], frame['mentions']):
+            canonical.add(label, key, name, int(mentions or 0))
+        return canonical
+
+
+def load_merge_allowlist(path: Optional[str]) -> set:
+    """
+    Approved near-duplicate merges from a reviewed candidates file
+
+    Args:
+        path: CSV written by ``CanonicalMap.save_fuzzy_candidates`` (e.g.
+            ENTITY_MERGE_ALLOWLIST); rows with ``approved`` set to 1/yes/true
+            are approved
+
+    Returns:
+        Set of (label, key, key) tuples, keys in sorted order
+    """
+    if not path:
+        return set()
+    if not Path(path).exists():
+        logger.warning(f"Merge allow-list {path} not found; no near-duplicates will be merged")
+        return set()
+    frame = pd.read_csv(path, dtype=str, keep_default_na=False)
+    approved = frame[frame['approved'].str.strip().str.lower().isin(['1', 'yes', 'true'])]
+    return {(label, *sorted((key_a, key_b)))
+            for label, key_a, key_b in zip(approved['label'], approved['key_a'], approved['key_b'])}
+
+
+def build_canonical_map(mentions: Iterable[Tuple[str, str]], workers: Optional[int] = None,
+                        normalizer: Optional[EntityNormalizer] = None,
+                        min_length: int = 3, approved_merges: Optional[set] = None) -> CanonicalMap:
+    """
+    Canonicalize and deduplicate entity mentions
+
+    Every mention is normalized, so names that fold, singularize or expand
+    (abbreviations, synonyms) to the same key become one entity. Keys of the
+    same label are then blocked and compared for near-duplicates (single
+    edits). Those pairs are only merged when ``approved_merges`` lists them;
+    the rest are kept on the map as ``fuzzy_candidates`` for review. Each
+    merged cluster takes its most frequently mentioned key as the canonical
+    name. Blocks are matched across processes when ``workers`` > 1.
+
+    Args:
+        mentions: (graph label, raw text) pairs
+        workers: Processes for the similarity pass (defaults to
+            ENTITY_NORMALIZE_WORKERS or the CPU count)
+        normalizer: EntityNormalizer to use
+        min_length: Keys shorter than this are dropped
+        approved_merges: (label, key, key) pairs allowed to merge (defaults
+            to the allow-list at ENTITY_MERGE_ALLOWLIST, see
+            ``load_merge_allowlist``)
+
+    Returns:
+        CanonicalMap covering every kept key
+    """
+    normalizer = normalizer or EntityNormalizer()
+    if approved_merges is None:
+        approved_merges = load_merge_allowlist(os.getenv("ENTITY_MERGE_ALLOWLIST"))
+    workers = workers or int(os.getenv("ENTITY_NORMALIZE_WORKERS", "0")) or os.cpu_count() or 1
+
+    frame = pd.DataFrame(list(mentions), columns=['label', 'text'])
+    canonical = CanonicalMap(normalizer)
+    if frame.empty:
+        return canonical
+    frame['key'] = normalizer.normalize_series(frame['text'], frame['label'])
+    frame = frame[frame['key'].str.len() >= min_length]
+    counts = frame.groupby(['label', 'key'], sort=True).size()
+
+    jobs, job_keys = [], []
+    for label, label_counts in counts.groupby(level=0, sort=True):
+        keys = label_counts.index.get_level_values(1).tolist()
+        for block in _blocks(keys):
+            jobs.append([keys[i] for i in block])
+            job_keys.append(label)
+
+    if workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_match_block, jobs, chunksize=max(1, len(jobs) // (workers * 4))))
+    else:
+        results = [_match_block(block) for block in jobs]
+
+    # Union-find over keys, per label
+    parent: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    def find(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    merged = 0
+    for label, block, pairs in zip(job_keys, jobs, results):
+        for i, j in pairs:
+            key_a, key_b = sorted((block[i], block[j]))
+            if (label, key_a, key_b) not in approved_merges:
+                canonical.fuzzy_candidates.append((label, key_a, key_b, int(counts[(label, key_a)]),
+                                                   int(counts[(label, key_b)])))
+                continue
+            a, b = find((label, block[i])), find((label, block[j]))
+            if a != b:
+                parent[b] = a
+                merged += 1
+
+    clusters = defaultdict(list)
+    for (label, key), count in counts.items():
+        clusters[find((label, key))].append((key, int(count)))
+    for (label, _), members in clusters.items():
+        # Most mentioned key wins; shorter then alphabetical on ties
+        canonical_name = min(members, key=lambda m: (-m[1], len(m[0]), m[0]))[0]
+        for key, count in members:
+            canonical.add(label, key, canonical_name, count)
+
+    logger.info(f"Normalized {len(frame)} mentions into {len(counts)} keys and "
+                f"{len(clusters)} canonical entities ({merged} approved near-duplicate merges, "
+                f"{len(canonical.fuzzy_candidates)} candidates left for review)")
+    return canonical
+
+
+def canonical_map_path(entities_file: str) -> Path:
+    """Where the ingestor keeps the canonical map for an entities file"""
+    path = Path(entities_file)
+    return path.with_name(f"{path.stem}_canonical.csv")
+
+
+def fuzzy_candidates_path(entities_file: str) -> Path:
+    """Where the ingestor writes unmerged near-duplicate pairs for an entities file"""
+    path = Path(entities_file)
+    return path.with_name(f"{path.stem}_fuzzy_candidates.csv")
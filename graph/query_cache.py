@@ -0,0 +1,257 @@
+# Read-through cache for Cypher reads, invalidated by the graph version
+import atexit
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A single (:GraphVersion) node; Neo4jIngestor bumps it after every ingest run.
+# updated_at tells a re-created node (after clear_database) from the old one.
+GRAPH_VERSION_QUERY = """
+MATCH (v:GraphVersion {id: 'graph'})
+RETURN v.version AS version, v.updated_at AS updated_at
+"""
+BUMP_VERSION_QUERY = """
+MERGE (v:GraphVersion {id: 'graph'})
+SET v.version = coalesce(v.version, 0) + 1, v.updated_at = timestamp()
+RETURN v.version AS version, v.updated_at AS updated_at
+"""
+WRITE_PATTERN = re.compile(r"\b(CREATE|MERGE|SET|DELETE|REMOVE|DROP|LOAD\s+CSV)\b", re.IGNORECASE)
+FORMAT_VERSION = 1
+
+
+def _version_key(record) -> Optional[str]:
+    if record is None or record['version'] is None:
+        return None
+    return f"{record['version']}@{record['updated_at']}"
+
+
+def _rows(result) -> List[Dict[str, Any]]:
+    return [dict(record.items()) for record in result]
+
+
+class CachedResult:
+    """Cached rows behind the parts of neo4j.Result the QA side uses"""
+
+    def __init__(self, records: List[Dict[str, Any]]):
+        self._records = records
+
+    def __iter__(self):
+        return iter(self._records)
+
+    def single(self):
+        return self._records[0] if self._records else None
+
+    def data(self):
+        return list(self._records)
+
+    def consume(self):
+        return None
+
+
+class GraphQueryCache:
+    """
+    LRU cache of Cypher read results keyed by (query, parameters, graph version)
+
+    The graph only changes at ingest, so a result stays valid until the
+    version node moves. The version is read at most once per
+    ``version_ttl`` seconds; when it changes every entry is dropped. Entries
+    can be persisted to a JSON file and are reused after a restart only if
+    the graph version still matches.
+    """
+
+    def __init__(self, driver, max_entries: int = 1024, path: Optional[str] = None,
+                 version_ttl: float = 5.0):
+        """
+        Args:
+            driver: Neo4j driver (or compatible stand-in)
+            max_entries: Results kept before evicting the least recently used
+                (0 disables caching)
+            path: JSON file to load entries from and save them to on exit
+            version_ttl: Seconds a graph version read is trusted
+        """
+        self.driver = driver
+        self.max_entries = max_entries
+        self.path = Path(path) if path else None
+        self.version_ttl = version_ttl
+        self._entries: "OrderedDict[str, Tuple[str, List[Dict[str, Any]]]]" = OrderedDict()
+        self._version: Optional[str] = None
+        self._version_checked: Optional[float] = None
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0,
+                         'version_checks': 0, 'writes_bypassed': 0}
+        if self.path is not None:
+            self._load()
+            atexit.register(self.save)
+
+    @staticmethod
+    def fingerprint(query: str, parameters: Dict[str, Any]) -> str:
+        text = " ".join(query.split()) + "\x00" + json.dumps(parameters, sort_keys=True, default=str)
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def version(self, force: bool = False) -> Optional[str]:
+        """Current graph version, re-read from Neo4j once ``version_ttl`` has passed"""
+        now = time.monotonic()
+        if (not force and self._version_checked is not None
+                and now - self._version_checked < self.version_ttl):
+            return self._version
+        with self.driver.session() as session:
+            version = _version_key(session.run(GRAPH_VERSION_QUERY).single())
+        with self._lock:
+            self.counters['version_checks'] += 1
+            if version != self._version and self._version_checked is not None:
+                self.counters['invalidations'] += 1
+                logger.info(f"Graph version changed ({self._version} -> {version}); "
+                            f"dropping {len(self._entries)} cached results")
+                self._entries.clear()
+            self._version, self._version_checked = version, now
+        return version
+
+    def run(self, session_factory, query: str, parameters: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Rows for a read query, from the cache or from Neo4j
+
+        Args:
+            session_factory: Returns the session to use on a miss
+            query: Cypher read query
+            parameters: Query parameters
+        """
+        if self.max_entries <= 0:
+            return _rows(session_factory().run(query, parameters))
+        version = self.version()
+        key = self.fingerprint(query, parameters)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return entry[1]
+            self.counters['misses'] += 1
+
+        rows = _rows(session_factory().run(query, parameters))
+        with self._lock:
+            # Do not cache a result read across a version change
+            if version == self._version:
+                self._entries[key] = (version, rows)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.counters['evictions'] += 1
+        return rows
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, hit rate and size"""
+        with self._lock:
+            stats = dict(self.counters, entries=len(self._entries), max_entries=self.max_entries,
+                         version=self._version)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self):
+        """Write the current version's entries to ``path`` (atomically)"""
+        if self.path is None:
+            return
+        with self._lock:
+            entries = [(key, rows) for key, (version, rows) in self._entries.items()
+                       if version == self._version]
+            version = self._version
+        serializable = []
+        for key, rows in entries:
+            try:
+                serializable.append([key, json.loads(json.dumps(rows))])
+            except (TypeError, ValueError):
+                continue  # Neo4j temporal/graph values are not persisted
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({'format': FORMAT_VERSION, 'version': version,
+                                   'entries': serializable}), encoding='utf-8')
+        os.replace(tmp, self.path)
+        logger.info(f"Saved {len(serializable)} cached graph query results to {self.path}")
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding='utf-8'))
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable graph query cache {self.path}: {e}")
+            return
+        if data.get('format') != FORMAT_VERSION:
+            return
+        # Entries keep their saved version and only hit if the graph still has it
+        for key, rows in data['entries'][-self.max_entries:] if self.max_entries > 0 else []:
+            self._entries[key] = (data['version'], rows)
+        logger.info(f"Loaded {len(self._entries)} cached graph query results from {self.path}")
+
+
+class CachedSession:
+    """Session whose reads go through a GraphQueryCache; writes pass straight through"""
+
+    def __init__(self, driver: 'CachedDriver', **kwargs):
+        self.driver = driver
+        self._kwargs = kwargs
+        self._session = None
+
+    def _inner(self):
+        if self._session is None:
+            self._session = self.driver.driver.session(**self._kwargs)
+        return self._session
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+            self._session = None
+
+    def run(self, query: str, parameters: Optional[Dict[str, Any]] = None, **kwargs):
+        parameters = dict(parameters or {}, **kwargs)
+        if WRITE_PATTERN.search(query):
+            with self.driver.cache._lock:
+                self.driver.cache.counters['writes_bypassed'] += 1
+            return self._inner().run(query, parameters)
+        return CachedResult(self.driver.cache.run(self._inner, query, parameters))
+
+
+class CachedDriver:
+    """
+    Neo4j driver wrapper answering repeated reads from a GraphQueryCache
+
+    Code written against the driver (stats collector, resolver, interaction
+    checker, document extraction) uses it unchanged; a session only opens a
+    real Neo4j session when one of its reads misses.
+    """
+
+    def __init__(self, driver, cache: GraphQueryCache):
+        self.driver = driver
+        self.cache = cache
+
+    def session(self, **kwargs) -> CachedSession:
+        return CachedSession(self, **kwargs)
+
+    def verify_connectivity(self):
+        return self.driver.verify_connectivity()
+
+    def close(self):
+        self.cache.save()
+        self.driver.close()
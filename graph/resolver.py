@@ -0,0 +1,201 @@
+# Fuzzy entity resolution: local trigram index with a Neo4j full-text fallback
+import logging
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from graph.normalize import fold, within_one_edit
+from graph.stats import NODE_LABELS
+
+logger = logging.getLogger(__name__)
+
+NAME_QUERY = """
+MATCH (n:`{label}`)
+RETURN n.id AS id, n.name AS name,
+       coalesce(n.brand_names, []) + coalesce(n.generic_names, []) +
+       coalesce(n.aliases, []) + coalesce(n.synonyms, []) AS aliases
+"""
+FULLTEXT_INDEXES = {'Drug': 'drug_names_fulltext', 'Disease': 'entity_names_fulltext',
+                    'Symptom': 'entity_names_fulltext', 'Chemical': 'entity_names_fulltext'}
+FULLTEXT_QUERY = """
+CALL db.index.fulltext.queryNodes($index, $query, {limit: $limit})
+YIELD node, score
+RETURN node.id AS id, node.name AS name, labels(node)[0] AS label, score
+"""
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+# Candidate surfaces kept after trigram counting, before exact scoring
+MAX_CANDIDATES = 200
+# Score given to a candidate one typo (edit or transposition) from the query
+ONE_EDIT_SCORE = 0.9
+
+
+def trigrams(text: str) -> List[str]:
+    """Character trigrams of a folded, space-padded string"""
+    padded = f"  {text} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+class EntityResolver:
+    """
+    Rank graph nodes for a typed, possibly misspelled name
+
+    Every node name, brand name, generic name, alias and synonym is folded
+    (see graph/normalize.py) and indexed by character trigram in CSR form:
+    sorted trigram ids with postings of surface ids. A lookup counts shared
+    trigrams over the postings of the query's trigrams, scores the best
+    candidates by Dice coefficient (single typos score ONE_EDIT_SCORE) and
+    keeps the best surface per node, so a resolution costs a few posting-list
+    reads rather than a graph query.
+
+    When the local index has not been built, ``resolve`` falls back to the
+    Neo4j full-text indexes created by graph/migrations/0001_initial_schema.cypher.
+    """
+
+    def __init__(self, driver, labels: Optional[Sequence[str]] = None):
+        """
+        Args:
+            driver: Neo4j driver (or compatible stand-in)
+            labels: Node labels to index (defaults to NODE_LABELS)
+        """
+        self.driver = driver
+        self.labels = list(labels or NODE_LABELS)
+        self._index = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._index is not None
+
+    def refresh(self):
+        """(Re)build the local trigram index from the graph"""
+        start = time.perf_counter()
+        node_ids, node_names, node_labels = [], [], []
+        surfaces, owners = [], []
+        with self.driver.session() as session:
+            for label in self.labels:
+                for record in session.run(NAME_QUERY.format(label=label)):
+                    if not record['name']:
+                        continue
+                    node = len(node_names)
+                    node_ids.append(record['id'])
+                    node_names.append(record['name'])
+                    node_labels.append(label)
+                    for surface in {fold(s) for s in [record['name'], *(record['aliases'] or [])] if s}:
+                        if surface:
+                            surfaces.append(surface)
+                            owners.append(node)
+
+        vocabulary: Dict[str, int] = {}
+        pairs = []
+        for surface_id, surface in enumerate(surfaces):
+            for gram in set(trigrams(surface)):
+                pairs.append((vocabulary.setdefault(gram, len(vocabulary)), surface_id))
+        pairs = np.asarray(pairs, dtype=np.int64).reshape(-1, 2)
+        order = np.lexsort((pairs[:, 1], pairs[:, 0]))
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs[:, 0], minlength=len(vocabulary)), out=indptr[1:])
+
+        index = {
+            'vocabulary': vocabulary,
+            'indptr': indptr,
+            'postings': pairs[order, 1].astype(np.int32),
+            'surfaces': surfaces,
+            'surface_lengths': np.array([len(set(trigrams(s))) for s in surfaces], dtype=np.int32),
+            'surface_labels': np.array([self.labels.index(node_labels[o]) for o in owners],
+                                       dtype=np.int8),
+            'owners': np.asarray(owners, dtype=np.int32),
+            'exact': {},
+            'node_ids': node_ids,
+            'node_names': node_names,
+            'node_labels': node_labels,
+        }
+        for surface_id, surface in enumerate(surfaces):
+            index['exact'].setdefault(surface, []).append(surface_id)
+        with self._lock:
+            self._index = index
+        logger.info(f"Indexed {len(surfaces)} names for {len(node_names)} nodes "
+                    f"({len(vocabulary)} trigrams) in {time.perf_counter() - start:.2f}s")
+
+    def resolve(self, text: str, labels: Optional[Sequence[str]] = None, limit: int = 10,
+                min_score: float = 0.3) -> List[Dict[str, Any]]:
+        """
+        Candidate nodes for a name
+
+        Args:
+            text: Name as typed
+            labels: Restrict to these labels
+            limit: Maximum candidates
+            min_score: Minimum similarity (exact matches score 1.0)
+
+        Returns:
+            [{'id', 'name', 'label', 'score', 'matched'}], best first
+        """
+        index = self._index
+        if index is None:
+            return self.resolve_fulltext(text, labels, limit)
+        query = fold(text)
+        if not query:
+            return []
+
+        query_grams = set(trigrams(query))
+        grams = [index['vocabulary'][g] for g in query_grams if g in index['vocabulary']]
+        indptr, postings = index['indptr'], index['postings']
+        hits = [postings[indptr[g]:indptr[g + 1]] for g in grams]
+        scores = {}
+        if hits:
+            surface_ids, shared = np.unique(np.concatenate(hits), return_counts=True)
+            if labels is not None:
+                codes = [self.labels.index(label) for label in labels if label in self.labels]
+                keep = np.isin(index['surface_labels'][surface_ids], codes)
+                surface_ids, shared = surface_ids[keep], shared[keep]
+            dice = 2.0 * shared / (len(query_grams) + index['surface_lengths'][surface_ids])
+            top = np.argsort(-dice, kind='stable')[:MAX_CANDIDATES]
+            scores = dict(zip(surface_ids[top].tolist(), dice[top].tolist()))
+        for surface_id in index['exact'].get(query, []):
+            scores[surface_id] = 1.0
+
+        best: Dict[int, tuple] = {}
+        for surface_id, score in scores.items():
+            node = int(index['owners'][surface_id])
+            if labels is not None and index['node_labels'][node] not in labels:
+                continue
+            if score < ONE_EDIT_SCORE and within_one_edit(query, index['surfaces'][surface_id]):
+                score = ONE_EDIT_SCORE
+            if score >= min_score and score > best.get(node, (0.0,))[0]:
+                best[node] = (score, index['surfaces'][surface_id])
+        ranked = sorted(best.items(), key=lambda item: (-item[1][0], index['node_names'][item[0]]))
+        return [{'id': index['node_ids'][node], 'name': index['node_names'][node],
+                 'label': index['node_labels'][node], 'score': round(score, 4), 'matched': matched}
+                for node, (score, matched) in ranked[:limit]]
+
+    def resolve_fulltext(self, text: str, labels: Optional[Sequence[str]] = None,
+                         limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Candidate nodes from the Neo4j full-text indexes (fuzzy term match)
+
+        Scores are Lucene scores normalized so the best candidate is 1.0.
+        """
+        terms = [_LUCENE_SPECIAL.sub(r'\\\1', term) for term in fold(text).split()]
+        if not terms:
+            return []
+        query = " AND ".join(f"{term}~" for term in terms)
+        indexes = sorted({FULLTEXT_INDEXES[label] for label in (labels or self.labels)
+                          if label in FULLTEXT_INDEXES})
+        candidates = []
+        with self.driver.session() as session:
+            for index_name in indexes:
+                for record in session.run(FULLTEXT_QUERY, {'index': index_name, 'query': query,
+                                                            'limit': limit}):
+                    if labels is None or record['label'] in labels:
+                        candidates.append({'id': record['id'], 'name': record['name'],
+                                           'label': record['label'], 'score': record['score'],
+                                           'matched': record['name']})
+        candidates.sort(key=lambda c: -c['score'])
+        top = candidates[0]['score'] if candidates else 1.0
+        for candidate in candidates:
+            candidate['score'] = round(candidate['score'] / top, 4) if top else 0.0
+        return candidates[:limit]
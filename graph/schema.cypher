@@ -1,26 +1,10 @@
 // TODO: Define Drug, Disease, Symptom nodes and relationships
 // Medical Knowledge Graph Schema for Neo4j
 
-// ========================================
-// NODE CONSTRAINTS AND INDEXES
-// ========================================
-
-// Drug nodes
-CREATE CONSTRAINT drug_id_unique IF NOT EXISTS FOR (d:Drug) REQUIRE d.id IS UNIQUE;
-CREATE INDEX drug_name_index IF NOT EXISTS FOR (d:Drug) ON (d.name);
-CREATE INDEX drug_generic_index IF NOT EXISTS FOR (d:Drug) ON (d.generic_name);
-
-// Disease nodes  
-CREATE CONSTRAINT disease_id_unique IF NOT EXISTS FOR (d:Disease) REQUIRE d.id IS UNIQUE;
-CREATE INDEX disease_name_index IF NOT EXISTS FOR (d:Disease) ON (d.name);
-
-// Symptom nodes
-CREATE CONSTRAINT symptom_id_unique IF NOT EXISTS FOR (s:Symptom) REQUIRE s.id IS UNIQUE;
-CREATE INDEX symptom_name_index IF NOT EXISTS FOR (s:Symptom) ON (s.name);
-
-// Chemical/Compound nodes (for active ingredients)
-CREATE CONSTRAINT chemical_id_unique IF NOT EXISTS FOR (c:Chemical) REQUIRE c.id IS UNIQUE;
-CREATE INDEX chemical_name_index IF NOT EXISTS FOR (c:Chemical) ON (c.name);
+// Constraints and indexes are versioned migrations in graph/migrations/,
+// applied by graph/migrate.py (and at the start of every ingest run). This
+// file documents the model and holds sample data for testing; load it with
+// `python graph/ingest.py --sample-data`.
 
 // ========================================
 // NODE PROPERTIES SCHEMA
@@ -29,7 +13,8 @@ CREATE INDEX chemical_name_index IF NOT EXISTS FOR (c:Chemical) ON (c.name);
 // Drug node properties:
 // - id: unique identifier
 // - name: brand/trade name
-// - generic_name: generic drug name
+// - brand_names: list of brand/trade names
+// - generic_names: list of generic drug names
 // - active_ingredients: list of active compounds
 // - drug_class: therapeutic class
 // - dosage_forms: available forms (tablet, injection, etc.)
@@ -38,7 +23,8 @@ CREATE INDEX chemical_name_index IF NOT EXISTS FOR (c:Chemical) ON (c.name);
 
 // Disease node properties:
 // - id: unique identifier  
-// - name: disease name
+// - name: disease name (canonical)
+// - aliases: merged name variants (see graph/normalize.py)
 // - synonyms: alternative names
 // - category: disease category
 // - icd_codes: ICD classification codes
@@ -102,7 +88,8 @@ CREATE INDEX chemical_name_index IF NOT EXISTS FOR (c:Chemical) ON (c.name);
 MERGE (metformin:Drug {
     id: "drug_001",
     name: "Metformin",
-    generic_name: "metformin hydrochloride", 
+    brand_names: ["Glucophage"],
+    generic_names: ["metformin hydrochloride"],
     drug_class: "Antidiabetic",
     fda_approved: true,
     description: "Oral antidiabetic medication used to treat type 2 diabetes"
@@ -111,7 +98,8 @@ MERGE (metformin:Drug {
 MERGE (ibuprofen:Drug {
     id: "drug_002", 
     name: "Ibuprofen",
-    generic_name: "ibuprofen",
+    brand_names: ["Advil", "Motrin"],
+    generic_names: ["ibuprofen"],
     drug_class: "NSAID",
     fda_approved: true,
     description: "Nonsteroidal anti-inflammatory drug used for pain relief"
@@ -149,13 +137,16 @@ MERGE (headache:Symptom {
     description: "Pain in head or neck region"
 });
 
-// Create sample relationships
+// Create sample relationships (each statement runs on its own, so it
+// matches its endpoints first)
+MATCH (metformin:Drug {id: "drug_001"}), (diabetes:Disease {id: "disease_001"})
 MERGE (metformin)-[:TREATS {
     efficacy: "high",
     confidence: 0.95,
     source: "FDA_label"
 }]->(diabetes);
 
+MATCH (metformin:Drug {id: "drug_001"}), (nausea:Symptom {id: "symptom_001"})
 MERGE (metformin)-[:CAUSES {
     frequency: "common",
     severity: "mild",
@@ -163,12 +154,14 @@ MERGE (metformin)-[:CAUSES {
     source: "clinical_trials"
 }]->(nausea);
 
+MATCH (diabetes:Disease {id: "disease_001"}), (headache:Symptom {id: "symptom_002"})
 MERGE (diabetes)-[:HAS_SYMPTOM {
     frequency: "common",
     stage: "early",
     confidence: 0.9
 }]->(headache);
 
+MATCH (ibuprofen:Drug {id: "drug_002"}), (headache:Symptom {id: "symptom_002"})
 MERGE (ibuprofen)-[:ALLEVIATES {
     effectiveness: "high",
     time_to_relief: "30-60 minutes",
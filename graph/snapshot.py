@@ -0,0 +1,587 @@
+# Read-only CSR snapshot of the knowledge graph for in-process traversal
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from graph.centrality import fact_weight
+from graph.stats import NODE_LABELS
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+DIRECTIONS = ('out', 'in')
+DEFAULT_CONFIDENCE = 0.5
+
+NODE_QUERY = "MATCH (n:`{label}`) RETURN n.name AS name, n.id AS id"
+EDGE_QUERY = """
+MATCH (a)-[r:`{rel_type}`]->(b)
+RETURN labels(a) AS source_labels, a.name AS source, a.id AS source_id,
+       labels(b) AS target_labels, b.name AS target, b.id AS target_id,
+       r.confidence AS confidence, r.frequency AS frequency
+"""
+
+NodeRef = Union[int, str]
+
+
+class Neighbors(NamedTuple):
+    """Neighbour lookup result as parallel arrays"""
+    ids: np.ndarray
+    confidence: np.ndarray
+    frequency: np.ndarray
+    rel_types: np.ndarray  # index into GraphSnapshot.rel_types
+
+
+class _CSR(NamedTuple):
+    indptr: np.ndarray
+    indices: np.ndarray
+    confidence: np.ndarray
+    frequency: np.ndarray
+
+
+def _as_number(value, default: float) -> float:
+    try:
+        return float(value) if value is not None else default
+    except (TypeError, ValueError):
+        return default
+
+
+def _encode(strings: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """UTF-8 blob and offsets for a list of strings"""
+    encoded = [string.encode('utf-8') for string in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(string) for string in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+
+def _csr(num_nodes: int, sources: np.ndarray, targets: np.ndarray,
+         confidence: np.ndarray, frequency: np.ndarray) -> _CSR:
+    order = np.argsort(sources, kind='stable')
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=num_nodes), out=indptr[1:])
+    return _CSR(indptr, targets[order].astype(np.int32), confidence[order].astype(np.float32),
+                frequency[order].astype(np.float32))
+
+
+def _edge_ranges(indptr: np.ndarray, nodes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Edge positions of every node in ``nodes`` without a Python loop
+
+    Returns:
+        (edge positions, index into ``nodes`` owning each edge)
+    """
+    starts = indptr[nodes]
+    counts = indptr[nodes + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    owners = np.repeat(np.arange(len(nodes)), counts)
+    # Position within each node's run, offset by that node's first edge
+    positions = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + starts[owners]
+    return positions, owners
+
+
+class GraphSnapshot:
+    """
+    Immutable in-process copy of the medical graph
+
+    Nodes are interned to dense integer ids. Each relationship type has an
+    outgoing and an incoming compressed-sparse-row adjacency held in NumPy
+    arrays, with confidence and frequency in arrays parallel to the neighbour
+    indices. Snapshots saved with ``save`` are plain ``.npy`` files that
+    ``load`` memory-maps, so worker processes opening the same snapshot share
+    one copy through the page cache. ``centrality`` holds per-node scores
+    from graph/centrality.py when the snapshot was published by that job.
+
+    Nodes are identified by their ``id`` property where they have one, so
+    two drugs sharing a name stay two nodes; ``node_id`` returns it.
+    """
+
+    def __init__(self, labels: List[str], node_labels: np.ndarray, names_blob: np.ndarray,
+                 name_offsets: np.ndarray, adjacency: Dict[str, Dict[str, _CSR]],
+                 meta: Optional[Dict[str, Any]] = None, centrality: Optional[np.ndarray] = None,
+                 node_ids: Optional[Tuple[np.ndarray, np.ndarray]] = None):
+        self.labels = labels
+        self.node_labels = node_labels
+        self._names_blob = names_blob
+        self._name_offsets = name_offsets
+        self.adjacency = adjacency
+        self.rel_types = sorted(adjacency)
+        self.meta = meta or {}
+        self.centrality = centrality
+        # (blob, offsets) of node ids, '' for nodes without one
+        self._node_ids = node_ids
+        self._index: Optional[Dict[str, List[int]]] = None
+        self._index_lock = threading.Lock()
+
+    # -- construction ------------------------------------------------------
+
+    @classmethod
+    def from_records(cls, nodes: Iterable[Tuple],
+                     edges: Iterable[Tuple],
+                     labels: Optional[List[str]] = None) -> 'GraphSnapshot':
+        """
+        Build a snapshot from exported rows
+
+        Args:
+            nodes: (label, name) or (label, name, node id) rows; nodes with
+                an id are told apart by it, others by name
+            edges: (rel_type, source label, source name, target label, target
+                name, confidence, frequency[, source node id, target node id])
+                rows; edges whose endpoints are not among ``nodes`` are dropped
+            labels: Node labels, in code order (defaults to NODE_LABELS)
+
+        Returns:
+            GraphSnapshot instance
+        """
+        labels = list(labels or NODE_LABELS)
+        label_codes = {label: code for code, label in enumerate(labels)}
+        ids: Dict[Tuple[str, str, str], int] = {}
+        by_name: Dict[Tuple[str, str], int] = {}
+        node_labels, names, node_ids = [], [], []
+        for label, name, *rest in nodes:
+            node_id = rest[0] if rest and rest[0] is not None else None
+            key = (label, 'id', str(node_id)) if node_id is not None else (label, 'name', name)
+            if label in label_codes and name is not None and key not in ids:
+                ids[key] = len(names)
+                by_name.setdefault((label, name), len(names))
+                node_labels.append(label_codes[label])
+                names.append(str(name))
+                node_ids.append('' if node_id is None else str(node_id))
+
+        def endpoint(label, name, node_id):
+            if node_id is not None:
+                return ids.get((label, 'id', str(node_id)))
+            return ids.get((label, 'name', name), by_name.get((label, name)))
+
+        columns = defaultdict(lambda: ([], [], [], []))
+        dropped = 0
+        for rel_type, source_label, source, target_label, target, confidence, frequency, *rest in edges:
+            source_id = endpoint(source_label, source, rest[0] if rest else None)
+            target_id = endpoint(target_label, target, rest[1] if len(rest) > 1 else None)
+            if source_id is None or target_id is None:
+                dropped += 1
+                continue
+            sources, targets, confidences, frequencies = columns[rel_type]
+            sources.append(source_id)
+            targets.append(target_id)
+            confidences.append(_as_number(confidence, DEFAULT_CONFIDENCE))
+            frequencies.append(_as_number(frequency, 1.0))
+        if dropped:
+            logger.warning(f"Dropped {dropped} edges with endpoints outside the snapshot")
+
+        names_blob, name_offsets = _encode(names)
+
+        adjacency = {}
+        for rel_type, (sources, targets, confidences, frequencies) in columns.items():
+            sources, targets = np.asarray(sources, np.int64), np.asarray(targets, np.int64)
+            confidences, frequencies = np.asarray(confidences), np.asarray(frequencies)
+            adjacency[rel_type] = {
+                'out': _csr(len(names), sources, targets, confidences, frequencies),
+                'in': _csr(len(names), targets, sources, confidences, frequencies),
+            }
+
+        meta = {
+            'format': FORMAT_VERSION,
+            'created_at': time.time(),
+            'labels': labels,
+            'nodes': len(names),
+            'relationships': {rel_type: len(cols[0]) for rel_type, cols in columns.items()},
+        }
+        return cls(labels, np.asarray(node_labels, dtype=np.int8), names_blob, name_offsets,
+                   adjacency, meta, node_ids=_encode(node_ids) if any(node_ids) else None)
+
+    @classmethod
+    def from_driver(cls, driver, labels: Optional[List[str]] = None,
+                    rel_types: Optional[List[str]] = None) -> 'GraphSnapshot':
+        """
+        Export the graph from Neo4j
+
+        Args:
+            driver: Neo4j driver (or compatible stand-in)
+            labels: Node labels to include (defaults to NODE_LABELS)
+            rel_types: Relationship types to include (defaults to all)
+
+        Returns:
+            GraphSnapshot instance
+        """
+        labels = list(labels or NODE_LABELS)
+        start = time.perf_counter()
+        with driver.session() as session:
+            nodes = [(label, record['name'], record.get('id'))
+                     for label in labels
+                     for record in session.run(NODE_QUERY.format(label=label))]
+            if rel_types is None:
+                rel_types = [record['relationshipType']
+                             for record in session.run("CALL db.relationshipTypes()")]
+
+            def first_label(node_labels):
+                return next((label for label in node_labels or [] if label in labels), None)
+
+            edges = [
+                (rel_type, first_label(record['source_labels']), record['source'],
+                 first_label(record['target_labels']), record['target'],
+                 record['confidence'], record['frequency'],
+                 record.get('source_id'), record.get('target_id'))
+                for rel_type in rel_types
+                for record in session.run(EDGE_QUERY.format(rel_type=rel_type))
+            ]
+        snapshot = cls.from_records(nodes, edges, labels)
+        logger.info(f"Exported snapshot with {snapshot.num_nodes} nodes and "
+                    f"{sum(snapshot.meta['relationships'].values())} relationships "
+                    f"in {time.perf_counter() - start:.2f}s")
+        return snapshot
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, directory: str):
+        """Write the snapshot as ``.npy`` arrays plus ``meta.json``"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "node_labels.npy", self.node_labels)
+        np.save(path / "names.npy", self._names_blob)
+        np.save(path / "name_offsets.npy", self._name_offsets)
+        for rel_type, directions in self.adjacency.items():
+            for direction, csr in directions.items():
+                for field, array in csr._asdict().items():
+                    np.save(path / f"{rel_type}.{direction}.{field}.npy", array)
+        if self.centrality is not None:
+            np.save(path / "centrality.npy", self.centrality)
+        if self._node_ids is not None:
+            np.save(path / "ids.npy", self._node_ids[0])
+            np.save(path / "id_offsets.npy", self._node_ids[1])
+        (path / "meta.json").write_text(json.dumps(dict(self.meta, rel_types=self.rel_types)),
+                                        encoding='utf-8')
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'GraphSnapshot':
+        """
+        Open a saved snapshot
+
+        Args:
+            directory: Directory written by ``save``
+            mmap: Memory-map the arrays instead of reading them into memory
+
+        Returns:
+            GraphSnapshot instance
+        """
+        path = Path(directory)
+        meta = json.loads((path / "meta.json").read_text(encoding='utf-8'))
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format {meta.get('format')} in {directory}")
+        mode = 'r' if mmap else None
+
+        def array(name):
+            return np.load(path / name, mmap_mode=mode)
+
+        adjacency = {
+            rel_type: {
+                direction: _CSR(*(array(f"{rel_type}.{direction}.{field}.npy")
+                                  for field in _CSR._fields))
+                for direction in DIRECTIONS
+            }
+            for rel_type in meta['rel_types']
+        }
+        centrality = array("centrality.npy") if (path / "centrality.npy").exists() else None
+        node_ids = ((array("ids.npy"), array("id_offsets.npy"))
+                    if (path / "ids.npy").exists() else None)
+        return cls(meta['labels'], array("node_labels.npy"), array("names.npy"),
+                   array("name_offsets.npy"), adjacency, meta, centrality, node_ids)
+
+    # -- node lookup -------------------------------------------------------
+
+    @property
+    def num_nodes(self) -> int:
+        return len(self.node_labels)
+
+    def name(self, node: int) -> str:
+        start, end = self._name_offsets[node], self._name_offsets[node + 1]
+        return bytes(self._names_blob[start:end]).decode('utf-8')
+
+    def node_id(self, node: int) -> Optional[str]:
+        """The node's ``id`` property, or None if it has none"""
+        if self._node_ids is None:
+            return None
+        blob, offsets = self._node_ids
+        start, end = offsets[node], offsets[node + 1]
+        return bytes(blob[start:end]).decode('utf-8') or None
+
+    def label(self, node: int) -> str:
+        return self.labels[self.node_labels[node]]
+
+    def _name_index(self) -> Dict[str, List[int]]:
+        # Built on first lookup so traversal-only workers never decode names
+        with self._index_lock:
+            if self._index is None:
+                index = defaultdict(list)
+                blob = bytes(self._names_blob)
+                offsets = self._name_offsets.tolist()
+                for node in range(self.num_nodes):
+                    index[blob[offsets[node]:offsets[node + 1]].decode('utf-8').casefold()].append(node)
+                self._index = dict(index)
+        return self._index
+
+    def lookup(self, name: str, label: Optional[str] = None) -> Optional[int]:
+        """
+        Node id for a name (case-insensitive)
+
+        Args:
+            name: Node name
+            label: Restrict to one label
+
+        Returns:
+            Node id, or None if no node matches
+        """
+        for node in self._name_index().get(name.strip().casefold(), []):
+            if label is None or self.label(node) == label:
+                return node
+        return None
+
+    def _resolve(self, nodes: Union[NodeRef, Sequence[NodeRef]]) -> np.ndarray:
+        if isinstance(nodes, (int, np.integer, str)):
+            nodes = [nodes]
+        ids = [self.lookup(node) if isinstance(node, str) else int(node) for node in nodes]
+        return np.asarray([node for node in ids if node is not None], dtype=np.int64)
+
+    # -- traversal ---------------------------------------------------------
+
+    def _selected(self, rel_types: Optional[Sequence[str]], direction: str):
+        directions = DIRECTIONS if direction == 'both' else (direction,)
+        for rel_type in rel_types or self.rel_types:
+            if rel_type in self.adjacency:
+                for d in directions:
+                    yield self.rel_types.index(rel_type), self.adjacency[rel_type][d]
+
+    def _expand(self, frontier: np.ndarray, rel_types, direction: str, min_confidence: float):
+        """(owner index, neighbour id, confidence, frequency, rel type) over all selected CSRs"""
+        parts = []
+        for type_code, csr in self._selected(rel_types, direction):
+            positions, owners = _edge_ranges(csr.indptr, frontier)
+            if not len(positions):
+                continue
+            confidence = np.asarray(csr.confidence[positions])
+            keep = confidence >= min_confidence if min_confidence > 0 else slice(None)
+            parts.append((owners[keep], np.asarray(csr.indices[positions])[keep], confidence[keep],
+                          np.asarray(csr.frequency[positions])[keep],
+                          np.full(len(confidence[keep]), type_code, dtype=np.int16)))
+        if not parts:
+            empty = np.empty(0)
+            return (empty.astype(np.int64), empty.astype(np.int32), empty.astype(np.float32),
+                    empty.astype(np.float32), empty.astype(np.int16))
+        return tuple(np.concatenate(column) for column in zip(*parts))
+
+    def neighbors(self, node: NodeRef, rel_types: Optional[Sequence[str]] = None,
+                  direction: str = 'out', min_confidence: float = 0.0,
+                  labels: Optional[Sequence[str]] = None, top_k: Optional[int] = None) -> Neighbors:
+        """
+        Neighbours of one node
+
+        Args:
+            node: Node id or name
+            rel_types: Relationship types to follow (defaults to all)
+            direction: 'out', 'in' or 'both'
+            min_confidence: Drop edges below this confidence
+            labels: Keep only neighbours with these labels
+            top_k: Keep only the best scored edges, best first; the score is
+                the edge's ``fact_weight`` times the neighbour's centrality
+                (when the snapshot has it)
+
+        Returns:
+            Neighbors arrays, one entry per edge
+        """
+        frontier = self._resolve(node)
+        _, ids, confidence, frequency, types = self._expand(frontier, rel_types, direction,
+                                                            min_confidence)
+        if labels is not None:
+            keep = np.isin(self.node_labels[ids], [self.labels.index(l) for l in labels])
+            ids, confidence, frequency, types = ids[keep], confidence[keep], frequency[keep], types[keep]
+        if top_k is not None:
+            scores = fact_weight(confidence, frequency)
+            if self.centrality is not None:
+                scores = scores * self.centrality[ids]
+            top = np.argsort(-scores, kind='stable')[:top_k]
+            ids, confidence, frequency, types = ids[top], confidence[top], frequency[top], types[top]
+        return Neighbors(ids, confidence, frequency, types)
+
+    def edges_between(self, nodes: Union[NodeRef, Sequence[NodeRef]],
+                      rel_types: Optional[Sequence[str]] = None,
+                      min_confidence: float = 0.0) -> Tuple[np.ndarray, ...]:
+        """
+        Edges with both endpoints in ``nodes``
+
+        Returns:
+            (source ids, target ids, confidence, frequency, rel type index) arrays
+        """
+        frontier = np.unique(self._resolve(nodes))
+        owners, targets, confidence, frequency, types = self._expand(frontier, rel_types, 'out',
+                                                                     min_confidence)
+        keep = np.isin(targets, frontier)
+        return frontier[owners[keep]], targets[keep], confidence[keep], frequency[keep], types[keep]
+
+    def k_hop(self, seeds: Union[NodeRef, Sequence[NodeRef]], k: int = 2,
+              rel_types: Optional[Sequence[str]] = None, direction: str = 'both',
+              min_confidence: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Breadth-first expansion up to ``k`` hops
+
+        Returns:
+            (node ids, hop distance) for every reached node, seeds included at 0
+        """
+        frontier = np.unique(self._resolve(seeds))
+        distance = np.full(self.num_nodes, -1, dtype=np.int16)
+        distance[frontier] = 0
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            _, reached, _, _, _ = self._expand(frontier, rel_types, direction, min_confidence)
+            reached = np.unique(reached)
+            frontier = reached[distance[reached] < 0]
+            distance[frontier] = hop
+        nodes = np.flatnonzero(distance >= 0)
+        return nodes, distance[nodes]
+
+    def score(self, seeds: Union[NodeRef, Sequence[NodeRef]],
+              rel_types: Optional[Sequence[str]] = None, direction: str = 'both',
+              hops: int = 2, decay: float = 0.5, min_confidence: float = 0.0,
+              labels: Optional[Sequence[str]] = None, top_k: int = 20) -> List[Tuple[int, float]]:
+        """
+        Rank nodes related to the seeds by confidence-weighted spreading activation
+
+        Each seed starts with activation 1. Every hop pushes activation along
+        edges, multiplied by edge confidence and ``decay``; a node's score is
+        the activation it receives over all hops.
+
+        Returns:
+            Up to ``top_k`` (node id, score) pairs, best first, seeds excluded
+        """
+        seed_ids = np.unique(self._resolve(seeds))
+        frontier, activation = seed_ids, np.ones(len(seed_ids))
+        collected_ids, collected_scores = [], []
+        for _ in range(hops):
+            if not len(frontier):
+                break
+            owners, reached, confidence, _, _ = self._expand(frontier, rel_types, direction,
+                                                             min_confidence)
+            if not len(reached):
+                break
+            frontier, inverse = np.unique(reached, return_inverse=True)
+            activation = np.bincount(inverse, weights=activation[owners] * confidence * decay,
+                                     minlength=len(frontier))
+            collected_ids.append(frontier)
+            collected_scores.append(activation)
+        if not collected_ids:
+            return []
+
+        ids, inverse = np.unique(np.concatenate(collected_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(collected_scores), minlength=len(ids))
+        keep = ~np.isin(ids, seed_ids)
+        if labels is not None:
+            keep &= np.isin(self.node_labels[ids], [self.labels.index(l) for l in labels])
+        ids, scores = ids[keep], scores[keep]
+        top = np.argsort(-scores, kind='stable')[:top_k]
+        return [(int(ids[i]), float(scores[i])) for i in top]
+
+
+class SnapshotStore:
+    """
+    Versioned snapshots under one directory
+
+    ``refresh`` exports a new version next to the old ones and then atomically
+    repoints ``CURRENT`` at it, so readers never see a half-written snapshot.
+    ``current`` reopens the snapshot only when ``CURRENT`` has changed.
+    """
+
+    def __init__(self, root: str, keep: int = 2):
+        """
+        Args:
+            root: Snapshot directory
+            keep: Versions kept on disk after a refresh
+        """
+        self.root = Path(root)
+        self.keep = keep
+        self._loaded: Optional[Tuple[str, GraphSnapshot]] = None
+        self._lock = threading.Lock()
+
+    def _current_version(self) -> Optional[str]:
+        pointer = self.root / "CURRENT"
+        return pointer.read_text(encoding='utf-8').strip() if pointer.exists() else None
+
+    def refresh(self, driver, **export_kwargs) -> GraphSnapshot:
+        """
+        Export a new version from Neo4j and make it current
+
+        Args:
+            driver: Neo4j driver
+            **export_kwargs: Passed to ``GraphSnapshot.from_driver``
+
+        Returns:
+            The new snapshot, memory-mapped from disk
+        """
+        return self.publish(GraphSnapshot.from_driver(driver, **export_kwargs))
+
+    def publish(self, snapshot: GraphSnapshot) -> GraphSnapshot:
+        """
+        Save an already exported snapshot as a new version and make it current
+
+        Returns:
+            The snapshot, memory-mapped from disk
+        """
+        version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+        self.root.mkdir(parents=True, exist_ok=True)
+        snapshot.save(str(self.root / version))
+        pointer = self.root / f"CURRENT.{os.getpid()}.tmp"
+        pointer.write_text(version, encoding='utf-8')
+        os.replace(pointer, self.root / "CURRENT")
+
+        versions = sorted((p for p in self.root.glob("v*") if p.is_dir()),
+                          key=lambda p: p.stat().st_mtime)
+        for stale in versions[:-self.keep]:
+            # Processes that still map an old version keep their pages
+            shutil.rmtree(stale, ignore_errors=True)
+        logger.info(f"Graph snapshot {version} is current")
+        return self.current()
+
+    def current(self, mmap: bool = True) -> Optional[GraphSnapshot]:
+        """The current snapshot, or None if none has been exported"""
+        version = self._current_version()
+        if version is None:
+            return None
+        with self._lock:
+            if self._loaded is None or self._loaded[0] != version:
+                self._loaded = (version, GraphSnapshot.load(str(self.root / version), mmap=mmap))
+            return self._loaded[1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a CSR snapshot of the Neo4j graph")
+    parser.add_argument('--root', default=os.getenv("GRAPH_SNAPSHOT_DIR", "data/graph_snapshot"))
+    parser.add_argument('--keep', type=int, default=2, help="Versions kept on disk")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from neo4j import GraphDatabase
+    driver = GraphDatabase.driver(
+        os.getenv("NEO4J_URI", "bolt://localhost:7687"),
+        auth=(os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password"))
+    )
+    try:
+        snapshot = SnapshotStore(args.root, keep=args.keep).refresh(driver)
+        print(json.dumps(snapshot.meta, indent=2))
+    finally:
+        driver.close()
+
+
+if __name__ == "__main__":
+    main()
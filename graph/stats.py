@@ -0,0 +1,153 @@
+# Cached knowledge graph statistics served from Neo4j's count store
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+NODE_LABELS = ['Drug', 'Disease', 'Symptom', 'Chemical']
+
+
+class GraphStatsCollector:
+    """
+    Collects node and relationship counts with count-store friendly queries.
+
+    Neo4j answers ``count(n)`` for a single label and ``count(r)`` for a single
+    relationship type straight from its count store metadata, without touching
+    the graph itself. Grouping by ``type(r)`` or filtering on properties forces a
+    full scan, so those forms are avoided here.
+    """
+
+    def __init__(self, driver, labels: Optional[List[str]] = None):
+        """
+        Args:
+            driver: Neo4j driver instance
+            labels: Node labels to report individually
+        """
+        self.driver = driver
+        self.labels = labels or NODE_LABELS
+
+    def collect(self) -> Dict[str, Any]:
+        """
+        Read the current counts from Neo4j
+
+        Returns:
+            Dictionary with per-label node counts, totals and per-type
+            relationship counts
+        """
+        with self.driver.session() as session:
+            total_nodes = session.run("MATCH (n) RETURN count(n) as count").single()['count']
+
+            node_counts = {}
+            for label in self.labels:
+                result = session.run(f"MATCH (n:`{label}`) RETURN count(n) as count")
+                node_counts[label] = result.single()['count']
+
+            total_relationships = session.run(
+                "MATCH ()-[r]->() RETURN count(r) as count"
+            ).single()['count']
+
+            rel_types = {}
+            type_names = [record['relationshipType']
+                          for record in session.run("CALL db.relationshipTypes()")]
+            for rel_type in type_names:
+                result = session.run(f"MATCH ()-[r:`{rel_type}`]->() RETURN count(r) as count")
+                count = result.single()['count']
+                if count:
+                    rel_types[rel_type] = count
+
+        return {
+            'nodes': node_counts,
+            'total_nodes': total_nodes,
+            'total_relationships': total_relationships,
+            'relationship_types': dict(sorted(rel_types.items(), key=lambda item: -item[1]))
+        }
+
+
+class CachedGraphStats:
+    """
+    TTL cache around a GraphStatsCollector.
+
+    Readers always get the last snapshot immediately. When the snapshot is
+    older than the TTL a single background thread refreshes it, so a slow or
+    unavailable database never blocks the caller.
+    """
+
+    def __init__(self, collector: GraphStatsCollector, ttl: float = 60.0):
+        """
+        Args:
+            collector: Collector used to read fresh counts
+            ttl: Seconds before a snapshot is considered stale
+        """
+        self.collector = collector
+        self.ttl = ttl
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._refreshed_at: Optional[float] = None
+        self._last_error: Optional[str] = None
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def is_stale(self) -> bool:
+        """Whether the snapshot is missing or older than the TTL"""
+        return self._refreshed_at is None or time.monotonic() - self._refreshed_at > self.ttl
+
+    def refresh(self) -> Optional[Dict[str, Any]]:
+        """
+        Refresh the snapshot synchronously
+
+        Returns:
+            The new snapshot, or the previous one if collection failed
+        """
+        try:
+            snapshot = self.collector.collect()
+        except Exception as e:
+            logger.warning(f"Failed to refresh graph stats: {e}")
+            with self._lock:
+                self._last_error = str(e)
+                # Back off for a full TTL instead of retrying on every read
+                self._refreshed_at = time.monotonic()
+                return self._snapshot
+
+        with self._lock:
+            self._snapshot = snapshot
+            self._refreshed_at = time.monotonic()
+            self._last_error = None
+        return snapshot
+
+    def refresh_async(self):
+        """Start a background refresh unless one is already running"""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(
+                target=self.refresh, name="graph-stats-refresh", daemon=True
+            )
+            self._refresh_thread.start()
+
+    def get(self, block: bool = False) -> Dict[str, Any]:
+        """
+        Get the cached statistics
+
+        Args:
+            block: Wait for a fresh snapshot when none has been collected yet
+
+        Returns:
+            Snapshot dictionary plus ``connected``, ``age_seconds`` and
+            ``stale`` fields describing the cache state
+        """
+        if self._snapshot is None and block:
+            self.refresh()
+        elif self.is_stale():
+            self.refresh_async()
+
+        with self._lock:
+            snapshot = dict(self._snapshot or {})
+            age = (time.monotonic() - self._refreshed_at
+                   if self._refreshed_at is not None else None)
+            snapshot['connected'] = self._snapshot is not None and self._last_error is None
+            snapshot['age_seconds'] = round(age, 1) if age is not None else None
+            snapshot['stale'] = self._refreshed_at is None or age > self.ttl
+            if self._last_error:
+                snapshot['error'] = self._last_error
+        return snapshot
@@ -0,0 +1,7 @@
+# Monitoring module for Medical Knowledge Graph system
+__version__ = "1.0.0"
+
+from .profiling import profiled, profile_entry
+from .tracing import Tracer, get_tracer
+
+__all__ = ['Tracer', 'get_tracer', 'profiled', 'profile_entry']
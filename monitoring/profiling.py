@@ -0,0 +1,171 @@
+# Opt-in sampling profiler and allocation tracker for long-running entry points
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+_active = threading.local()
+
+
+def profiling_enabled() -> bool:
+    """Whether MEDIGRAPH_PROFILE asks for profiling"""
+    return os.getenv("MEDIGRAPH_PROFILE", "0").lower() in ("1", "true", "yes")
+
+
+def _frame_label(code) -> str:
+    path = Path(code.co_filename)
+    location = f"{path.parent.name}/{path.name}" if path.parent.name else path.name
+    return f"{code.co_name} ({location}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """
+    Samples the Python stacks of every thread at a fixed interval.
+
+    Stacks are aggregated in the collapsed format used by flamegraph.pl,
+    speedscope and inferno: one ``root;child;leaf count`` line per unique stack.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        """
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        names = {}
+        while not self._stop.wait(self.interval):
+            if len(names) != threading.active_count():
+                names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+
+    def write_collapsed(self, path: Path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _write_allocation_report(path: Path, snapshot: tracemalloc.Snapshot, limit: int):
+    snapshot = snapshot.filter_traces([
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+    ])
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(f"Top {limit} allocation sites by retained size\n\n")
+        for i, stat in enumerate(snapshot.statistics('lineno')[:limit], 1):
+            frame = stat.traceback[0]
+            f.write(f"#{i:<3} {stat.size / 1024:10.1f} KiB {stat.count:8d} blocks  "
+                    f"{frame.filename}:{frame.lineno}\n")
+
+        f.write(f"\nTop {min(limit, 10)} allocation tracebacks\n")
+        for i, stat in enumerate(snapshot.statistics('traceback')[:min(limit, 10)], 1):
+            f.write(f"\n#{i} {stat.size / 1024:.1f} KiB in {stat.count} blocks\n")
+            for line in stat.traceback.format(most_recent_first=True):
+                f.write(f"    {line}\n")
+
+
+@contextmanager
+def profiled(name: str, enabled: Optional[bool] = None, output_dir: Optional[str] = None):
+    """
+    Profile the enclosed block when enabled
+
+    Writes ``stacks.collapsed``, ``allocations.txt`` and ``summary.json`` into
+    ``<output_dir>/<name>-<timestamp>/``. Nested profiled blocks in the same
+    thread are folded into the outermost one.
+
+    Args:
+        name: Entry point name used in the run directory
+        enabled: Force profiling on/off (defaults to MEDIGRAPH_PROFILE)
+        output_dir: Base directory (defaults to MEDIGRAPH_PROFILE_DIR or ``profiles``)
+    """
+    if enabled is None:
+        enabled = profiling_enabled()
+    if not enabled or getattr(_active, 'name', None):
+        yield
+        return
+
+    run_dir = Path(output_dir or os.getenv("MEDIGRAPH_PROFILE_DIR", "profiles")) / (
+        f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+    run_dir.mkdir(parents=True, exist_ok=True)
+    interval = float(os.getenv("MEDIGRAPH_PROFILE_INTERVAL_MS", "5")) / 1000
+    top = int(os.getenv("MEDIGRAPH_PROFILE_TOP", "25"))
+
+    was_tracing = tracemalloc.is_tracing()
+    if not was_tracing:
+        tracemalloc.start(int(os.getenv("MEDIGRAPH_PROFILE_FRAMES", "8")))
+    sampler = StackSampler(interval)
+    _active.name = name
+    logger.info(f"Profiling '{name}' into {run_dir}")
+    start = time.perf_counter()
+    sampler.start()
+    try:
+        yield
+    finally:
+        sampler.stop()
+        elapsed = time.perf_counter() - start
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if not was_tracing:
+            tracemalloc.stop()
+        _active.name = None
+
+        sampler.write_collapsed(run_dir / "stacks.collapsed")
+        _write_allocation_report(run_dir / "allocations.txt", snapshot, top)
+        summary = {
+            'name': name,
+            'seconds': round(elapsed, 3),
+            'samples': sampler.samples,
+            'sample_interval_ms': interval * 1000,
+            'traced_current_mb': round(current / 2**20, 2),
+            'traced_peak_mb': round(peak / 2**20, 2),
+        }
+        (run_dir / "summary.json").write_text(json.dumps(summary, indent=2), encoding='utf-8')
+        logger.info(f"Profile for '{name}' written to {run_dir} "
+                    f"({elapsed:.2f}s, peak {summary['traced_peak_mb']} MB traced)")
+
+
+def profile_entry(name: str):
+    """Decorator form of ``profiled`` controlled by MEDIGRAPH_PROFILE"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with profiled(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,343 @@
+# Per-stage latency tracing with in-process histograms and pluggable sinks
+import atexit
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Span:
+    """A timed stage of work with attributes (token counts, chunk counts, cache hits)"""
+
+    __slots__ = ('tracer', 'name', 'trace_id', 'span_id', 'parent_id',
+                 'attributes', 'start_ns', 'end_ns')
+
+    def __init__(self, tracer: 'Tracer', name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.trace_id = None
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = None
+        self.start_ns = 0
+        self.end_ns = 0
+
+    @property
+    def duration(self) -> float:
+        """Duration in seconds"""
+        return (self.end_ns - self.start_ns) / 1e9
+
+    def set(self, key: str, value: Any):
+        """Attach an attribute to the span"""
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.tracer._start(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+        self.tracer._end(self)
+        return False
+
+
+class _NoopSpan:
+    """Shared span returned when tracing is disabled"""
+
+    __slots__ = ()
+
+    def set(self, key: str, value: Any):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Histogram:
+    """
+    Sliding-window latency histogram.
+
+    Keeps the most recent ``window`` samples for percentiles plus lifetime
+    count and sum, which is what the Prometheus summary type expects.
+    """
+
+    def __init__(self, window: int = 2048):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.samples.append(value)
+        self.count += 1
+        self.total += value
+
+    def summary(self) -> Dict[str, float]:
+        ordered = sorted(self.samples)
+        result = {'count': self.count, 'sum': self.total,
+                  'mean': self.total / self.count if self.count else 0.0}
+        for q in QUANTILES:
+            key = f"p{int(q * 100)}"
+            result[key] = ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+        return result
+
+
+class LogSink:
+    """Logs one line per finished trace with the duration of every stage"""
+
+    def export_trace(self, spans: List[Span]):
+        root = spans[-1]
+        stages = " ".join(f"{span.name}={span.duration * 1000:.1f}ms" for span in spans[:-1])
+        attrs = {k: v for span in spans for k, v in span.attributes.items()}
+        logger.info(f"trace {root.name} {root.duration * 1000:.1f}ms [{stages}] {attrs}")
+
+    def export_metrics(self, summaries: Dict[str, Dict[str, float]]):
+        for name, s in summaries.items():
+            logger.info(f"latency {name}: n={s['count']} p50={s['p50'] * 1000:.1f}ms "
+                        f"p95={s['p95'] * 1000:.1f}ms p99={s['p99'] * 1000:.1f}ms")
+
+
+class PrometheusTextfileSink:
+    """
+    Writes span latency summaries in Prometheus text exposition format.
+
+    The file is replaced atomically so it can be picked up by the
+    node_exporter textfile collector.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def export_trace(self, spans: List[Span]):
+        pass
+
+    def export_metrics(self, summaries: Dict[str, Dict[str, float]]):
+        lines = [
+            "# HELP medigraph_span_duration_seconds Duration of traced pipeline stages",
+            "# TYPE medigraph_span_duration_seconds summary",
+        ]
+        for name, s in sorted(summaries.items()):
+            for q in QUANTILES:
+                lines.append(f'medigraph_span_duration_seconds{{span="{name}",quantile="{q}"}} '
+                             f'{s[f"p{int(q * 100)}"]:.6f}')
+            lines.append(f'medigraph_span_duration_seconds_sum{{span="{name}"}} {s["sum"]:.6f}')
+            lines.append(f'medigraph_span_duration_seconds_count{{span="{name}"}} {s["count"]}')
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp_path.write_text("\n".join(lines) + "\n", encoding='utf-8')
+        os.replace(tmp_path, self.path)
+
+
+class OTLPJsonSink:
+    """
+    Appends finished traces as OpenTelemetry OTLP/JSON lines.
+
+    Each line is a complete ``ExportTraceServiceRequest`` body, so the file can
+    be replayed into an OpenTelemetry collector with the otlpjsonfile receiver.
+    """
+
+    def __init__(self, path: str, service_name: str = "medigraph"):
+        self.path = Path(path)
+        self.service_name = service_name
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            return {'key': key, 'value': {'boolValue': value}}
+        if isinstance(value, int):
+            return {'key': key, 'value': {'intValue': str(value)}}
+        if isinstance(value, float):
+            return {'key': key, 'value': {'doubleValue': value}}
+        return {'key': key, 'value': {'stringValue': str(value)}}
+
+    def export_trace(self, spans: List[Span]):
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                'traceId': span.trace_id,
+                'spanId': span.span_id,
+                'name': span.name,
+                'kind': 1,
+                'startTimeUnixNano': str(span.start_ns),
+                'endTimeUnixNano': str(span.end_ns),
+                'attributes': [self._attribute(k, v) for k, v in span.attributes.items()],
+            }
+            if span.parent_id:
+                otlp_span['parentSpanId'] = span.parent_id
+            if 'error' in span.attributes:
+                otlp_span['status'] = {'code': 2}
+            otlp_spans.append(otlp_span)
+
+        payload = {'resourceSpans': [{
+            'resource': {'attributes': [self._attribute('service.name', self.service_name)]},
+            'scopeSpans': [{'scope': {'name': 'medigraph.tracing'}, 'spans': otlp_spans}],
+        }]}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(payload) + "\n")
+
+    def export_metrics(self, summaries: Dict[str, Dict[str, float]]):
+        pass
+
+
+class Tracer:
+    """
+    Records nested spans per thread and aggregates their durations.
+
+    When disabled, ``span()`` returns a shared no-op object so instrumented
+    code pays only for one attribute check.
+    """
+
+    def __init__(self, enabled: bool = False, sinks: Optional[List[Any]] = None,
+                 flush_interval: float = 15.0):
+        """
+        Args:
+            enabled: Whether spans are recorded
+            sinks: Exporters receiving finished traces and metric summaries
+            flush_interval: Seconds between metric exports to the sinks
+        """
+        self.enabled = enabled
+        self.sinks = sinks if sinks is not None else [LogSink()]
+        self.flush_interval = flush_interval
+        self.histograms: Dict[str, Histogram] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+
+    def span(self, name: str, **attributes):
+        """
+        Start a span as a context manager
+
+        Args:
+            name: Stage name, e.g. ``qa.vector_search``
+            **attributes: Initial span attributes
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        return Span(self, name, attributes)
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._local.finished = []
+        return stack
+
+    def _start(self, span: Span):
+        stack = self._stack()
+        if stack:
+            span.trace_id = stack[-1].trace_id
+            span.parent_id = stack[-1].span_id
+        else:
+            span.trace_id = f"{random.getrandbits(128):032x}"
+        stack.append(span)
+        span.start_ns = time.time_ns()
+
+    def _end(self, span: Span):
+        span.end_ns = time.time_ns()
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        self._local.finished.append(span)
+
+        with self._lock:
+            histogram = self.histograms.get(span.name)
+            if histogram is None:
+                histogram = self.histograms[span.name] = Histogram()
+            histogram.observe(span.duration)
+
+        if not stack:
+            finished, self._local.finished = self._local.finished, []
+            for sink in self.sinks:
+                try:
+                    sink.export_trace(finished)
+                except Exception as e:
+                    logger.warning(f"Trace sink {type(sink).__name__} failed: {e}")
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self.flush()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Latency percentiles per span name
+
+        Returns:
+            Mapping of span name to count, sum, mean, p50, p95 and p99 (seconds)
+        """
+        with self._lock:
+            return {name: histogram.summary() for name, histogram in self.histograms.items()}
+
+    def flush(self):
+        """Export current metric summaries to every sink"""
+        self._last_flush = time.monotonic()
+        summaries = self.summary()
+        if not summaries:
+            return
+        for sink in self.sinks:
+            try:
+                sink.export_metrics(summaries)
+            except Exception as e:
+                logger.warning(f"Metrics sink {type(sink).__name__} failed: {e}")
+
+
+def sinks_from_spec(spec: str) -> List[Any]:
+    """
+    Build sinks from a comma-separated spec
+
+    Args:
+        spec: e.g. ``log,prometheus:/var/lib/node_exporter/medigraph.prom,otlp:traces.jsonl``
+
+    Returns:
+        List of sink instances
+    """
+    sinks = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        kind, _, target = item.partition(':')
+        if kind == 'log':
+            sinks.append(LogSink())
+        elif kind == 'prometheus':
+            sinks.append(PrometheusTextfileSink(target or "metrics/medigraph.prom"))
+        elif kind == 'otlp':
+            sinks.append(OTLPJsonSink(target or "metrics/traces.jsonl"))
+        else:
+            logger.warning(f"Unknown trace sink: {kind}")
+    return sinks
+
+
+_default_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """
+    Process-wide tracer configured from the environment
+
+    MEDIGRAPH_TRACE=1 enables tracing and MEDIGRAPH_TRACE_SINKS selects the
+    exporters (default ``log``).
+    """
+    global _default_tracer
+    if _default_tracer is None:
+        enabled = os.getenv("MEDIGRAPH_TRACE", "0").lower() in ("1", "true", "yes")
+        _default_tracer = Tracer(
+            enabled=enabled,
+            sinks=sinks_from_spec(os.getenv("MEDIGRAPH_TRACE_SINKS", "log"))
+        )
+        if enabled:
+            atexit.register(_default_tracer.flush)
+    return _default_tracer
@@ -3,7 +3,8 @@ __version__ = "1.0.0"
 
 # Import main classes when available
 # from .simcse_trainer import SimCSETrainer
-# from .ner_model import MedicalNERModel
-# from .re_model import RelationExtractionModel
+from .ner_model import MedicalNERModel
+from .re_model import RelationExtractionModel
+from .pipeline import ExtractionPipeline
 
-__all__ = []  # Will be populated as modules are added 
\ No newline at end of file
+__all__ = ['MedicalNERModel', 'RelationExtractionModel', 'ExtractionPipeline']
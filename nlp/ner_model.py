@@ -0,0 +1,199 @@
+# Rule- and dictionary-based biomedical named entity recognition
+import json
+import logging
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ENTITY_TYPES = ['DRUG', 'DISEASE', 'SYMPTOM', 'CHEMICAL']
+
+# Word-final stems of common drug classes (-olol beta blockers, -pril ACE inhibitors, ...)
+DRUG_STEMS = ('olol', 'azole', 'idine', 'afil', 'oxacin', 'ipine', 'artan', 'umab', 'ximab',
+              'zumab', 'pril', 'statin', 'cillin', 'mycin', 'cycline', 'prazole', 'tidine',
+              'vir', 'parin', 'triptan', 'setron', 'dronate', 'gliptin', 'gliflozin', 'lukast',
+              'semide', 'thiazide', 'formin', 'profen', 'coxib', 'barbital', 'azepam', 'oxetine',
+              'aline', 'tinib', 'platin', 'sone', 'olone')
+DISEASE_SUFFIXES = ('itis', 'osis', 'emia', 'aemia', 'opathy', 'oma', 'plasia', 'iasis')
+DISEASE_HEADS = {'disease', 'disorder', 'syndrome', 'infection', 'cancer', 'failure',
+                 'deficiency', 'insufficiency', 'carcinoma', 'tumor', 'tumour', 'diabetes'}
+DISEASE_TERMS = {
+    'hypertension', 'migraine', 'asthma', 'depression', 'epilepsy', 'gout', 'angina',
+    'obesity', 'schizophrenia', 'pneumonia', 'influenza', 'eczema', 'acne', 'arrhythmia',
+    'atrial fibrillation', 'heart failure', 'osteoporosis', 'hyperlipidemia', 'anemia',
+    'type 1 diabetes', 'type 2 diabetes', 'diabetes mellitus', 'myocardial infarction',
+    'stroke', 'bipolar disorder', 'parkinson disease', "parkinson's disease",
+    "alzheimer's disease", 'multiple sclerosis', 'rheumatoid arthritis', 'copd',
+}
+SYMPTOM_SUFFIXES = ('algia', 'itus', 'odynia', 'orrhea', 'orrhoea', 'uria', 'pnea', 'pnoea')
+SYMPTOM_TERMS = {
+    'nausea', 'vomiting', 'headache', 'dizziness', 'fatigue', 'rash', 'cough', 'fever',
+    'insomnia', 'diarrhea', 'diarrhoea', 'constipation', 'pain', 'swelling', 'itching',
+    'pruritus', 'somnolence', 'drowsiness', 'edema', 'oedema', 'dyspepsia', 'anorexia',
+    'tremor', 'seizure', 'seizures', 'palpitations', 'hypotension', 'syncope', 'weakness',
+    'bleeding', 'bruising', 'alopecia', 'urticaria', 'malaise', 'chills', 'anxiety',
+    'agitation', 'confusion', 'blurred vision', 'dry mouth', 'weight gain', 'weight loss',
+    'abdominal pain', 'back pain', 'chest pain', 'shortness of breath', 'muscle cramps',
+}
+SYMPTOM_HEADS = {'pain', 'swelling', 'ache', 'cramps', 'cramp', 'discomfort', 'bleeding'}
+CHEMICAL_SALTS = {'hydrochloride', 'sodium', 'sulfate', 'sulphate', 'acetate', 'potassium',
+                  'maleate', 'citrate', 'tartrate', 'mesylate', 'besylate', 'succinate',
+                  'fumarate', 'phosphate', 'bromide', 'calcium', 'hydrobromide'}
+# Longest gazetteer name kept, in tokens
+MAX_TERM_TOKENS = 8
+
+# Words that extend a disease/symptom span to the left ("chronic", "type 2")
+MODIFIERS = {'acute', 'chronic', 'severe', 'mild', 'moderate', 'primary', 'secondary',
+             'idiopathic', 'atypical', 'early-onset', 'late-onset', 'recurrent', 'congenital',
+             'metastatic', 'refractory', 'persistent', 'type'}
+STOPWORDS = {'the', 'a', 'an', 'of', 'and', 'or', 'to', 'in', 'for', 'with', 'is', 'are',
+             'was', 'were', 'be', 'by', 'on', 'as', 'at', 'this', 'that', 'these', 'those',
+             'include', 'includes', 'including', 'treatment', 'patients', 'may', 'not'}
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9\-']*")
+SENTENCE_PATTERN = re.compile(r"(?<=[.!?;])\s+(?=[A-Z0-9(\"'])")
+
+
+@dataclass
+class Entity:
+    """Entity mention with character offsets into its sentence"""
+    text: str
+    label: str
+    start: int
+    end: int
+
+    def to_dict(self) -> Dict[str, object]:
+        return {'text': self.text, 'label': self.label, 'start': self.start, 'end': self.end}
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences on terminal punctuation"""
+    return [s for s in SENTENCE_PATTERN.split(text.strip()) if s]
+
+
+class MedicalNERModel:
+    """
+    Biomedical NER from a gazetteer plus morphological rules
+
+    Known names (drug brands and generics, active ingredients, any extra
+    lexicon) are matched longest-first over token n-grams. Remaining tokens are
+    typed by suffix rules: drug-class stems, disease suffixes and head nouns,
+    symptom terms and chemical salt forms. This is the dictionary/rule stage
+    of the paper's NER; it needs no model download and runs on CPU only.
+    """
+
+    def __init__(self, gazetteer: Optional[Dict[str, str]] = None, max_ngram: int = 6):
+        """
+        Args:
+            gazetteer: Lower-cased name -> entity type
+            max_ngram: Longest gazetteer name, in tokens
+        """
+        self.gazetteer: Dict[str, str] = {}
+        self.max_ngram = max_ngram
+        for term in DISEASE_TERMS:
+            self.add_term(term, 'DISEASE')
+        for term in SYMPTOM_TERMS:
+            self.add_term(term, 'SYMPTOM')
+        for name, label in (gazetteer or {}).items():
+            self.add_term(name, label)
+
+    def add_term(self, name: str, label: str):
+        """Add one name to the gazetteer"""
+        tokens = [token.lower() for token in TOKEN_PATTERN.findall(name)]
+        key = ' '.join(tokens)
+        if len(key) > 2 and len(tokens) <= MAX_TERM_TOKENS and label in ENTITY_TYPES:
+            self.gazetteer[key] = label
+            self.max_ngram = max(self.max_ngram, len(tokens))
+
+    @classmethod
+    def from_fda_files(cls, paths: Iterable[str], **kwargs) -> 'MedicalNERModel':
+        """
+        Build a model whose gazetteer holds the drug and ingredient names of
+        processed FDA label files
+
+        Args:
+            paths: fda_processed.jsonl-style files
+
+        Returns:
+            MedicalNERModel instance
+        """
+        model = cls(**kwargs)
+        for path in paths:
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    for name in record.get('product_name', []) + record.get('generic_name', []):
+                        model.add_term(name, 'DRUG')
+                    for name in record.get('active_ingredient', []):
+                        model.add_term(name, 'CHEMICAL')
+        logger.info(f"Gazetteer holds {len(model.gazetteer)} names")
+        return model
+
+    def _rule_label(self, word: str) -> Optional[str]:
+        if len(word) <= 3 or word in STOPWORDS:
+            return None
+        if word in CHEMICAL_SALTS:
+            return 'CHEMICAL'
+        if word in DISEASE_HEADS:
+            return 'DISEASE'
+        if word in SYMPTOM_HEADS:
+            return 'SYMPTOM'
+        if word.endswith(SYMPTOM_SUFFIXES):
+            return 'SYMPTOM'
+        if word.endswith(DISEASE_SUFFIXES):
+            return 'DISEASE'
+        if word.endswith(DRUG_STEMS):
+            return 'DRUG'
+        return None
+
+    def extract(self, sentence: str) -> List[Entity]:
+        """
+        Find entities in one sentence
+
+        Args:
+            sentence: Sentence text
+
+        Returns:
+            Non-overlapping entities in order of appearance
+        """
+        tokens = [(m.group(0).lower(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(sentence)]
+        words = [token[0] for token in tokens]
+        spans = []  # (label, first token, last token + 1)
+        i = 0
+        while i < len(tokens):
+            match = None
+            for n in range(min(self.max_ngram, len(tokens) - i), 0, -1):
+                label = self.gazetteer.get(' '.join(words[i:i + n]))
+                if label:
+                    match = (label, i, i + n)
+                    break
+            if match is None:
+                label = self._rule_label(words[i])
+                match = (label, i, i + 1) if label else None
+            if match is None:
+                i += 1
+                continue
+
+            label, first, last = match
+            free = spans[-1][2] if spans else 0
+
+            def extendable(index):
+                return index >= free and words[index] not in STOPWORDS
+
+            if last - first == 1 and first > 0 and extendable(first - 1) and (
+                    (label == 'CHEMICAL' and words[first] in CHEMICAL_SALTS) or
+                    (label in ('DISEASE', 'SYMPTOM') and words[first] in DISEASE_HEADS | SYMPTOM_HEADS)):
+                # "<base> hydrochloride", "<name> disease", "<site> pain"
+                first -= 1
+            if label in ('DISEASE', 'SYMPTOM'):
+                while first > 0 and extendable(first - 1) and (
+                        words[first - 1] in MODIFIERS or
+                        (words[first - 1].isdigit() and first > 1 and words[first - 2] == 'type')):
+                    first -= 1
+            spans.append((label, first, last))
+            i = last
+
+        return [Entity(sentence[tokens[first][1]:tokens[last - 1][2]], label,
+                       tokens[first][1], tokens[last - 1][2])
+                for label, first, last in spans]
@@ -0,0 +1,134 @@
+# Relation pattern compilation and batched matching over masked sentences
+import bisect
+import re
+from typing import Dict, List, Sequence, Tuple
+
+MASK_PATTERN = re.compile(r"⟨([A-Z]+):(\d+)⟩")
+_SLOT_PATTERN = re.compile(r"\{([SO]):([A-Z|]+)\}")
+
+# Joins a batch of sentences; no pattern can match across it
+SENTENCE_SEPARATOR = "\x00"
+
+Relation = Tuple[int, str, int]
+
+
+def expand_pattern(template: str) -> str:
+    """
+    Expand a relation pattern template into a regular expression
+
+    Args:
+        template: Pattern with ``{S:TYPES}``/``{O:TYPES}`` slots
+
+    Returns:
+        Regular expression source with ``s`` and ``o`` groups
+    """
+    def slot(match):
+        entity = f"⟨(?:{match.group(2)}):\\d+⟩"
+        item = f"{entity}(?:\\s*\\(\\s*⟨[A-Z]+:\\d+⟩\\s*\\))?"
+        return f"(?P<{match.group(1).lower()}>{item}(?:\\s*,?\\s*(?:and|or)?\\s*{item})*)"
+
+    return _SLOT_PATTERN.sub(slot, template.replace(' ', r'\s+'))
+
+
+def slot_entities(slot_text: str, types: Sequence[str]) -> List[int]:
+    """Indexes of the entities of the given types inside a matched slot"""
+    return [int(index) for label, index in MASK_PATTERN.findall(slot_text) if label in types]
+
+
+def slot_types(template: str) -> Dict[str, Tuple[str, ...]]:
+    """Allowed entity types per slot of a template"""
+    return {slot: tuple(types.split('|')) for slot, types in _SLOT_PATTERN.findall(template)}
+
+
+def _relations(subject_text: str, object_text: str, predicate: str,
+               types: Dict[str, Tuple[str, ...]]) -> List[Relation]:
+    return [(subject, predicate, obj)
+            for subject in slot_entities(subject_text, types['S'])
+            for obj in slot_entities(object_text, types['O'])
+            if subject != obj]
+
+
+class NaivePatternMatcher:
+    """
+    Reference matcher: every pattern regex is run separately over every sentence
+
+    Kept as the correctness and throughput baseline for CompiledPatternMatcher.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self.patterns = [
+            (predicate, re.compile(expand_pattern(template), re.IGNORECASE), slot_types(template))
+            for predicate, templates in patterns.items()
+            for template in templates
+        ]
+
+    def match(self, masked: str) -> List[Relation]:
+        relations = []
+        for predicate, regex, types in self.patterns:
+            for match in regex.finditer(masked):
+                relations.extend(_relations(match.group('s'), match.group('o'), predicate, types))
+        return relations
+
+    def match_batch(self, masked_sentences: Sequence[str]) -> List[List[Relation]]:
+        return [self.match(masked) for masked in masked_sentences]
+
+
+class CompiledPatternMatcher:
+    """
+    Relation patterns compiled once and run over whole batches of sentences
+
+    Entity-type constraints are compiled into every pattern, so a match is
+    already type-correct. A batch of masked sentences is joined with
+    SENTENCE_SEPARATOR, and each pattern scans the joined text in a single
+    ``finditer`` call. Patterns whose entity types do not occur anywhere in
+    the batch are skipped. Match offsets map back to sentences by bisection.
+    Results are the same as NaivePatternMatcher's.
+
+    A single alternation of all patterns was measured slower on CPython's
+    backtracking ``re``: every branch is tried at every position, and the
+    literal-prefix scan each pattern gets on its own is lost. Per-pattern
+    scans over batches keep that fast path and move the loop over sentences
+    into C.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]]):
+        self.patterns = []
+        for predicate, templates in patterns.items():
+            for template in templates:
+                types = slot_types(template)
+                gates = [tuple(f"⟨{label}:" for label in types[slot]) for slot in ('S', 'O')]
+                self.patterns.append((predicate, re.compile(expand_pattern(template), re.IGNORECASE),
+                                      types, gates))
+
+    def match(self, masked: str) -> List[Relation]:
+        """(subject index, predicate, object index) for each match in one sentence"""
+        return self.match_batch([masked])[0]
+
+    def match_batch(self, masked_sentences: Sequence[str]) -> List[List[Relation]]:
+        """
+        Match many sentences at once
+
+        Args:
+            masked_sentences: Sentences with entities masked as ``⟨TYPE:index⟩``
+
+        Returns:
+            Relations per sentence, with entity indexes local to that sentence
+        """
+        results: List[List[Relation]] = [[] for _ in masked_sentences]
+        if not masked_sentences:
+            return results
+        starts, position = [], 0
+        for masked in masked_sentences:
+            starts.append(position)
+            position += len(masked) + len(SENTENCE_SEPARATOR)
+        joined = SENTENCE_SEPARATOR.join(masked_sentences)
+
+        present = {}
+        for predicate, regex, types, gates in self.patterns:
+            if not all(any(present.setdefault(gate, gate in joined) for gate in slot_gates)
+                       for slot_gates in gates):
+                continue
+            for match in regex.finditer(joined):
+                results[bisect.bisect_right(starts, match.start()) - 1].extend(
+                    _relations(match.group('s'), match.group('o'), predicate, types))
+        return results
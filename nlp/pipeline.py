@@ -0,0 +1,320 @@
+# Sharded, resumable NER + relation extraction producing the ingest inputs
+import argparse
+import csv
+import json
+import logging
+import os
+import shutil
+import sys
+import time
+import zlib
+from collections import Counter
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from monitoring.tracing import get_tracer
+from nlp.ner_model import MedicalNERModel, split_sentences
+from nlp.re_model import RelationExtractionModel
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Free-text fields of FDA label records and abstracts, in reading order
+TEXT_FIELDS = ['title', 'abstract', 'text', 'description', 'indications_and_usage',
+               'dosage_and_administration', 'contraindications', 'warnings',
+               'warnings_and_cautions', 'boxed_warning', 'adverse_reactions',
+               'drug_interactions']
+FDA_FIELDS = {'indications_and_usage', 'adverse_reactions', 'drug_interactions', 'product_name'}
+# One row per (triple, source) and shard; ``mentions`` is the number of
+# extractions behind the row, which graph/aggregate.py sums across shards
+TRIPLE_COLUMNS = ['subject', 'predicate', 'object', 'frequency', 'source', 'mentions']
+RECORDS_PER_SHARD = 5000
+# Records whose sentences share one relation-matcher pass
+RECORDS_PER_BATCH = 64
+MANIFEST_VERSION = 2
+
+_worker_pipeline: Optional['ExtractionPipeline'] = None
+
+
+def record_source(record: Dict[str, Any]) -> str:
+    """Provenance recorded on extracted triples"""
+    if record.get('source'):
+        return str(record['source'])
+    return 'fda_label' if FDA_FIELDS & record.keys() else 'pubmed'
+
+
+def record_texts(record: Dict[str, Any]) -> Iterable[str]:
+    """Free-text passages of a record"""
+    for field in TEXT_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            value = [value]
+        for passage in value or []:
+            if isinstance(passage, str) and passage.strip():
+                yield passage
+
+
+def shard_offsets(path: Path, records_per_shard: int) -> List[Tuple[int, int]]:
+    """
+    Byte ranges of consecutive ``records_per_shard``-line shards
+
+    Workers seek to their own range, so record text never passes through the
+    parent process.
+    """
+    offsets, start, lines, position = [], 0, 0, 0
+    with open(path, 'rb') as f:
+        for line in f:
+            position += len(line)
+            lines += 1
+            if lines == records_per_shard:
+                offsets.append((start, position))
+                start, lines = position, 0
+    if lines:
+        offsets.append((start, position))
+    return offsets
+
+
+class ExtractionPipeline:
+    """
+    Streams raw FDA label / abstract JSONL through NER and relation extraction
+
+    The input is split into byte-range shards that a process pool extracts
+    independently. Each finished shard is committed to a work directory, so an
+    interrupted run resumes from the shards it has not finished. The shards
+    are concatenated in input order into ``<stem>_entities.jsonl`` and
+    ``<stem>_triples.csv``, the files graph/ingest.py loads.
+    """
+
+    def __init__(self, ner: Optional[MedicalNERModel] = None,
+                 re_model: Optional[RelationExtractionModel] = None,
+                 records_per_shard: int = RECORDS_PER_SHARD, workers: Optional[int] = None):
+        """
+        Args:
+            ner: Entity recognizer (defaults to a rules-only MedicalNERModel)
+            re_model: Relation extractor (defaults to RelationExtractionModel)
+            records_per_shard: Input lines per shard
+            workers: Extraction processes (defaults to the CPU count)
+        """
+        self.ner = ner or MedicalNERModel()
+        self.re_model = re_model or RelationExtractionModel()
+        self.records_per_shard = records_per_shard
+        self.workers = workers or os.cpu_count() or 1
+        self.tracer = get_tracer()
+
+    def process_record(self, record: Dict[str, Any]) -> Tuple[Dict[str, Any], Counter]:
+        """
+        Extract one record
+
+        Returns:
+            Entities record (``{'id', 'source', 'entities'}``) and a counter of
+            (subject, predicate, object, source) triples
+        """
+        return self.process_records([record])[0]
+
+    def process_records(self, records: List[Dict[str, Any]]) -> List[Tuple[Dict[str, Any], Counter]]:
+        """
+        Extract a batch of records
+
+        Relation patterns run once over all sentences of the batch.
+
+        Returns:
+            ``process_record`` results, in order
+        """
+        sentences, owners = [], []
+        for position, record in enumerate(records):
+            for passage in record_texts(record):
+                for sentence in split_sentences(passage):
+                    sentences.append(sentence)
+                    owners.append(position)
+        found = [self.ner.extract(sentence) for sentence in sentences]
+
+        results = []
+        for record in records:
+            record_id = record.get('id') or record.get('pmid') or record.get('set_id', '')
+            results.append(({'id': record_id, 'source': record_source(record), 'entities': []},
+                             Counter()))
+        for position, entities, relations in zip(owners, found,
+                                                 self.re_model.extract_batch(sentences, found)):
+            entity_record, triples = results[position]
+            entity_record['entities'].extend({'text': e.text, 'label': e.label} for e in entities)
+            for subject, predicate, obj in relations:
+                triples[(subject, predicate, obj, entity_record['source'])] += 1
+        return results
+
+    def process_shard(self, input_file: str, shard: int, start: int, end: int,
+                      work_dir: str) -> Dict[str, int]:
+        """
+        Extract one byte range and commit its outputs
+
+        Outputs are written under temporary names and renamed, and the
+        ``.done`` marker is written last, so a shard is either complete or
+        redone on resume.
+        """
+        base = Path(work_dir) / f"shard-{shard:06d}"
+        entities_tmp = base.with_suffix('.entities.jsonl.tmp')
+        triples = Counter()
+        records = mentions = 0
+        with open(input_file, 'rb') as source, open(entities_tmp, 'w', encoding='utf-8') as out:
+            source.seek(start)
+            lines = [line for line in source.read(end - start).splitlines() if line.strip()]
+            for batch in range(0, len(lines), RECORDS_PER_BATCH):
+                batch_records = [json.loads(line) for line in lines[batch:batch + RECORDS_PER_BATCH]]
+                for entity_record, record_triples in self.process_records(batch_records):
+                    out.write(json.dumps(entity_record, ensure_ascii=False) + "\n")
+                    triples.update(record_triples)
+                    records += 1
+                    mentions += len(entity_record['entities'])
+
+        triples_tmp = base.with_suffix('.triples.csv.tmp')
+        with open(triples_tmp, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            for (subject, predicate, obj, source), count in triples.items():
+                writer.writerow([subject, predicate, obj, count, source, count])
+
+        os.replace(entities_tmp, base.with_suffix('.entities.jsonl'))
+        os.replace(triples_tmp, base.with_suffix('.triples.csv'))
+        stats = {'shard': shard, 'records': records, 'entities': mentions,
+                 'triples': sum(triples.values())}
+        base.with_suffix('.done').write_text(json.dumps(stats), encoding='utf-8')
+        return stats
+
+    def _manifest(self, input_file: Path) -> Dict[str, Any]:
+        """Identity of a run; finished shards are reused only when it matches"""
+        stat = input_file.stat()
+        config = json.dumps([sorted(self.ner.gazetteer.items()),
+                             [(p, r.pattern) for p, r, _, _ in self.re_model.matcher.patterns],
+                             self.re_model.cooccurrence_window])
+        return {'version': MANIFEST_VERSION, 'input': str(input_file.resolve()),
+                'size': stat.st_size, 'mtime': stat.st_mtime,
+                'records_per_shard': self.records_per_shard,
+                'config': zlib.crc32(config.encode('utf-8'))}
+
+    def run(self, input_file: str, output_dir: str, resume: bool = True,
+            keep_shards: bool = False) -> Dict[str, Path]:
+        """
+        Extract a JSONL file
+
+        Args:
+            input_file: Raw FDA label or abstract JSONL
+            output_dir: Where ``<stem>_entities.jsonl`` and ``<stem>_triples.csv`` go
+            resume: Reuse shards finished by an earlier run on the same input
+            keep_shards: Keep the work directory after merging
+
+        Returns:
+            Mapping of output kind ('entities', 'triples') to path
+        """
+        input_path = Path(input_file)
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        work_dir = out / f".{input_path.stem}_extract"
+        manifest = self._manifest(input_path)
+
+        manifest_file = work_dir / "manifest.json"
+        if work_dir.exists() and (not resume or not manifest_file.exists() or
+                                  json.loads(manifest_file.read_text(encoding='utf-8')) != manifest):
+            logger.info(f"Discarding stale extraction state in {work_dir}")
+            shutil.rmtree(work_dir)
+        work_dir.mkdir(parents=True, exist_ok=True)
+        manifest_file.write_text(json.dumps(manifest), encoding='utf-8')
+
+        offsets = shard_offsets(input_path, self.records_per_shard)
+        pending = [(str(input_path), shard, start, end, str(work_dir))
+                   for shard, (start, end) in enumerate(offsets)
+                   if not (work_dir / f"shard-{shard:06d}.done").exists()]
+        logger.info(f"{input_path.name}: {len(offsets)} shards, {len(offsets) - len(pending)} "
+                    f"already done, {len(pending)} to extract with {self.workers} workers")
+
+        with self.tracer.span("extract.run", shards=len(offsets), pending=len(pending)) as span:
+            started = time.perf_counter()
+            done = 0
+            records = 0
+            pool = (Pool(self.workers, initializer=_init_worker, initargs=(self,))
+                    if self.workers > 1 and len(pending) > 1 else None)
+            try:
+                results = (pool.imap_unordered(_process_shard, pending) if pool
+                           else (self.process_shard(*job) for job in pending))
+                for stats in results:
+                    done += 1
+                    records += stats['records']
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"Shard {stats['shard']} done ({done}/{len(pending)}, "
+                                f"{records / elapsed:.0f} records/s)")
+            finally:
+                if pool is not None:
+                    pool.close()
+                    pool.join()
+
+            paths = self._merge(input_path.stem, offsets, work_dir, out)
+            span.set('records', records)
+
+        if not keep_shards:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        return paths
+
+    @staticmethod
+    def _merge(stem: str, offsets: List[Tuple[int, int]], work_dir: Path,
+               out: Path) -> Dict[str, Path]:
+        paths = {'entities': out / f"{stem}_entities.jsonl", 'triples': out / f"{stem}_triples.csv"}
+        for kind, suffix in (('entities', '.entities.jsonl'), ('triples', '.triples.csv')):
+            tmp = paths[kind].with_name(paths[kind].name + '.tmp')
+            with open(tmp, 'wb') as merged:
+                if kind == 'triples':
+                    merged.write((','.join(TRIPLE_COLUMNS) + "\n").encode('utf-8'))
+                for shard in range(len(offsets)):
+                    with open(work_dir / f"shard-{shard:06d}{suffix}", 'rb') as part:
+                        shutil.copyfileobj(part, merged)
+            os.replace(tmp, paths[kind])
+            logger.info(f"Wrote {paths[kind]}")
+        return paths
+
+
+def _init_worker(pipeline: ExtractionPipeline):
+    global _worker_pipeline
+    _worker_pipeline = pipeline
+
+
+def _process_shard(job: Tuple[str, int, int, int, str]) -> Dict[str, int]:
+    return _worker_pipeline.process_shard(*job)
+
+
+def _has_drug_names(path: str) -> bool:
+    with open(path, 'r', encoding='utf-8') as f:
+        first = f.readline()
+    return bool(first.strip()) and bool({'product_name', 'generic_name'} & json.loads(first).keys())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract entities and triples for graph ingest")
+    parser.add_argument('input', help="Raw FDA label or abstract JSONL")
+    parser.add_argument('--output-dir', default="data/processed")
+    parser.add_argument('--gazetteer', action='append', default=None,
+                        help="FDA JSONL whose drug/ingredient names seed NER (repeatable; "
+                             "defaults to the input when it has product names)")
+    parser.add_argument('--workers', type=int, default=None, help="Defaults to the CPU count")
+    parser.add_argument('--records-per-shard', type=int, default=RECORDS_PER_SHARD)
+    parser.add_argument('--window', type=int, default=50,
+                        help="Co-occurrence window in characters (0 disables)")
+    parser.add_argument('--restart', action='store_true', help="Ignore finished shards")
+    parser.add_argument('--keep-shards', action='store_true')
+    args = parser.parse_args()
+
+    gazetteer = args.gazetteer or ([args.input] if _has_drug_names(args.input) else [])
+    pipeline = ExtractionPipeline(
+        ner=MedicalNERModel.from_fda_files(gazetteer),
+        re_model=RelationExtractionModel(cooccurrence_window=args.window),
+        records_per_shard=args.records_per_shard,
+        workers=args.workers
+    )
+    try:
+        pipeline.run(args.input, args.output_dir, resume=not args.restart,
+                     keep_shards=args.keep_shards)
+    finally:
+        pipeline.tracer.flush()
+
+
+if __name__ == "__main__":
+    main()
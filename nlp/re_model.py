@@ -0,0 +1,134 @@
+# Rule-based and co-occurrence relation extraction over NER output
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+from .ner_model import Entity
+from .patterns import CompiledPatternMatcher, Relation
+
+logger = logging.getLogger(__name__)
+
+# Patterns run over a sentence whose entities are masked as ``⟨TYPE:index⟩``.
+# ``{S:TYPES}`` and ``{O:TYPES}`` mark the subject and object slots; each slot
+# accepts a coordinated list ("A, B and C") and a parenthesised alias
+# ("Brand (generic)"). A space matches any run of whitespace.
+RELATION_PATTERNS: Dict[str, List[str]] = {
+    'treats': [
+        r"{S:DRUG|CHEMICAL} treats {O:DISEASE}",
+        r"{S:DRUG|CHEMICAL} (?:is |are )?(?:indicated|approved|prescribed|used) (?:for|in)"
+        r"(?: the)?(?: (?:treatment|management|prevention) of)? {O:DISEASE}",
+        r"{S:DRUG|CHEMICAL} (?:is |are )?used to treat {O:DISEASE}",
+        r"{S:DRUG|CHEMICAL} therapy for {O:DISEASE}",
+        r"{O:DISEASE} (?:was |were |is |are )?treated with {S:DRUG|CHEMICAL}",
+    ],
+    'causes': [
+        r"{S:DRUG|CHEMICAL} (?:causes|caused|may cause|can cause|induces|induced) {O:SYMPTOM}",
+        r"adverse (?:reactions?|events?|effects?) (?:to|of|with) {S:DRUG|CHEMICAL}"
+        r" (?:include|includes|included|are|were)(?: \w+)?:? {O:SYMPTOM}",
+        r"side effects? of {S:DRUG|CHEMICAL} (?:include|includes|are)(?: \w+)?:? {O:SYMPTOM}",
+        r"{O:SYMPTOM} (?:was |were |has been |have been )reported (?:with|after|following) {S:DRUG|CHEMICAL}",
+        r"{S:DRUG|CHEMICAL}[- ]induced {O:SYMPTOM}",
+    ],
+    'has_symptom': [
+        r"{S:DISEASE} (?:presents|presenting|characterized|characterised|manifests|manifesting)"
+        r" (?:with|by|as) {O:SYMPTOM}",
+        r"symptoms? of {S:DISEASE} (?:include|includes|are)(?: \w+)?:? {O:SYMPTOM}",
+        r"{O:SYMPTOM} (?:is|are) (?:a |an )?(?:common |typical |early )?(?:symptom|sign)s? of {S:DISEASE}",
+    ],
+    'interacts_with': [
+        r"{S:DRUG} (?:interacts|interaction|interactions) with {O:DRUG}",
+        r"{S:DRUG} (?:should|must) not be (?:used|taken|coadministered|co-administered|combined)"
+        r" with {O:DRUG}",
+        r"{S:DRUG} (?:is )?contraindicated (?:with|in patients (?:taking|receiving)) {O:DRUG}",
+        r"(?:coadministration|co-administration|concomitant use) of {S:DRUG} (?:and|with) {O:DRUG}",
+    ],
+}
+
+# Entity type pairs related by co-occurrence, as (subject type, object type)
+COOCCURRENCE_TYPES = {('DRUG', 'DISEASE'), ('DRUG', 'SYMPTOM'), ('DISEASE', 'SYMPTOM'),
+                      ('CHEMICAL', 'DISEASE'), ('CHEMICAL', 'SYMPTOM')}
+COOCCURRENCE_PREDICATE = 'associated_with'
+
+
+def mask_entities(sentence: str, entities: Sequence[Entity]) -> str:
+    """Replace each entity span with ``⟨TYPE:index⟩``"""
+    parts, position = [], 0
+    for index, entity in enumerate(entities):
+        parts.append(sentence[position:entity.start])
+        parts.append(f"⟨{entity.label}:{index}⟩")
+        position = entity.end
+    parts.append(sentence[position:])
+    return ''.join(parts)
+
+
+class RelationExtractionModel:
+    """
+    Relation extraction from lexical patterns and co-occurrence
+
+    Pattern matches yield the predicates the ingestor maps onto typed
+    relationships (treats, causes, has_symptom, interacts_with); all patterns
+    run as one compiled matcher (see nlp/patterns.py). Entity pairs
+    of compatible types within ``cooccurrence_window`` characters that no
+    pattern relates yield ``associated_with``.
+    """
+
+    def __init__(self, patterns: Dict[str, List[str]] = None, cooccurrence_window: int = 50):
+        """
+        Args:
+            patterns: Predicate -> pattern templates (defaults to RELATION_PATTERNS)
+            cooccurrence_window: Maximum characters between co-occurring
+                entities; 0 disables co-occurrence
+        """
+        self.cooccurrence_window = cooccurrence_window
+        self.matcher = CompiledPatternMatcher(patterns or RELATION_PATTERNS)
+
+    def extract(self, sentence: str, entities: Sequence[Entity]) -> List[Tuple[str, str, str]]:
+        """
+        Extract relations from one sentence
+
+        Args:
+            sentence: Sentence text
+            entities: Entities found in the sentence, in order
+
+        Returns:
+            (subject text, predicate, object text) triples
+        """
+        return self.extract_batch([sentence], [entities])[0]
+
+    def extract_batch(self, sentences: Sequence[str],
+                      entities: Sequence[Sequence[Entity]]) -> List[List[Tuple[str, str, str]]]:
+        """
+        Extract relations from many sentences with one matcher scan
+
+        Args:
+            sentences: Sentence texts
+            entities: Entities per sentence, in order
+
+        Returns:
+            (subject text, predicate, object text) triples per sentence
+        """
+        results = [[] for _ in sentences]
+        candidates = [i for i, found in enumerate(entities) if len(found) >= 2]
+        matched = self.matcher.match_batch(
+            [mask_entities(sentences[i], entities[i]) for i in candidates])
+        for i, relations in zip(candidates, matched):
+            results[i] = self._with_cooccurrence(entities[i], relations)
+        return results
+
+    def _with_cooccurrence(self, entities: Sequence[Entity],
+                           relations: List[Relation]) -> List[Tuple[str, str, str]]:
+        related = {frozenset((s, o)) for s, _, o in relations}
+
+        if self.cooccurrence_window:
+            for i, first in enumerate(entities):
+                for j in range(i + 1, len(entities)):
+                    second = entities[j]
+                    if second.start - first.end > self.cooccurrence_window:
+                        break
+                    if frozenset((i, j)) in related:
+                        continue
+                    if (first.label, second.label) in COOCCURRENCE_TYPES:
+                        relations.append((i, COOCCURRENCE_PREDICATE, j))
+                    elif (second.label, first.label) in COOCCURRENCE_TYPES:
+                        relations.append((j, COOCCURRENCE_PREDICATE, i))
+
+        return [(entities[s].text, predicate, entities[o].text) for s, predicate, o in relations]
@@ -1,6 +1,12 @@
 # RAG (Retrieval-Augmented Generation) module for Medical Knowledge Graph QA System
 __version__ = "1.0.0"
 
-from .qa_chain import MedicalQASystem
+__all__ = ['MedicalQASystem']
 
-__all__ = ['MedicalQASystem'] 
\ No newline at end of file
+
+def __getattr__(name):
+    # Imported on first access so `import rag.client` does not load LangChain
+    if name == 'MedicalQASystem':
+        from .qa_chain import MedicalQASystem
+        return MedicalQASystem
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,436 @@
+# Precomputed answers for common (entity x intent) questions, keyed by graph version
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from graph.normalize import fold
+from rag.prefetch import normalize_question
+
+if TYPE_CHECKING:
+    from rag.qa_chain import MedicalQASystem
+
+logger = logging.getLogger(__name__)
+
+
+class Intent(NamedTuple):
+    name: str
+    label: str
+    template: str  # question generated offline
+    patterns: Tuple[str, ...]  # questions served, over normalize_question() text
+
+
+INTENTS = (
+    Intent('uses', 'Drug', "What is {name} used for?",
+           (r"what (?:is|are) (?P<entity>.+?) (?:used|prescribed|taken) for",
+            r"what does (?P<entity>.+?) treat")),
+    Intent('side_effects', 'Drug', "What are the side effects of {name}?",
+           (r"what are (?:the )?(?:common )?side effects of (?P<entity>.+)",
+            r"(?:does|can) (?P<entity>.+?) (?:have|cause) (?:any )?side effects")),
+    Intent('symptoms', 'Disease', "What are the symptoms of {name}?",
+           (r"what are (?:the )?(?:common )?symptoms of (?P<entity>.+)",
+            r"what are (?P<entity>.+?) symptoms")),
+    Intent('treatments', 'Disease', "How is {name} treated?",
+           (r"how (?:is|are) (?P<entity>.+?) treated",
+            r"what (?:medications|medicines|drugs) treat (?P<entity>.+)",
+            r"what is the treatment for (?P<entity>.+)")),
+)
+_PATTERNS = [(intent, re.compile(pattern)) for intent in INTENTS for pattern in intent.patterns]
+_ARTICLE = re.compile(r"^(?:the|a|an) ")
+
+# Entities ordered by degree so the most connected (most asked about) come first
+DRUG_NEIGHBOURHOOD_QUERY = """
+MATCH (d:Drug)
+OPTIONAL MATCH (d)-[t:TREATS]->(disease:Disease)
+WITH d, collect(DISTINCT disease.name) AS treats, collect(t.confidence) AS treat_confidences
+OPTIONAL MATCH (d)-[c:CAUSES]->(symptom:Symptom)
+WITH d, treats, treat_confidences, collect(DISTINCT symptom.name) AS side_effects,
+     collect(c.confidence) AS effect_confidences
+RETURN d.id AS id, d.name AS name,
+       coalesce(d.brand_names, []) + coalesce(d.generic_names, []) AS aliases,
+       d.description AS description,
+       {treats: treats, side_effects: side_effects} AS facts,
+       treat_confidences + effect_confidences AS confidences,
+       size(treats) + size(side_effects) AS degree
+ORDER BY degree DESC, name
+LIMIT $limit
+"""
+DISEASE_NEIGHBOURHOOD_QUERY = """
+MATCH (disease:Disease)
+OPTIONAL MATCH (d:Drug)-[t:TREATS]->(disease)
+WITH disease, collect(DISTINCT d.name) AS treatments, collect(t.confidence) AS treat_confidences
+OPTIONAL MATCH (disease)-[h:HAS_SYMPTOM]->(symptom:Symptom)
+WITH disease, treatments, treat_confidences, collect(DISTINCT symptom.name) AS symptoms,
+     collect(h.confidence) AS symptom_confidences
+RETURN disease.id AS id, disease.name AS name, coalesce(disease.aliases, []) AS aliases,
+       disease.description AS description,
+       {treatments: treatments, symptoms: symptoms} AS facts,
+       treat_confidences + symptom_confidences AS confidences,
+       size(treatments) + size(symptoms) AS degree
+ORDER BY degree DESC, name
+LIMIT $limit
+"""
+NEIGHBOURHOOD_QUERIES = {'Drug': DRUG_NEIGHBOURHOOD_QUERY, 'Disease': DISEASE_NEIGHBOURHOOD_QUERY}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    intent TEXT NOT NULL,
+    question TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    graph_version TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT NOT NULL,
+    label TEXT NOT NULL,
+    node_id TEXT NOT NULL,
+    PRIMARY KEY (alias, label)
+);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+def match_question(question: str) -> Optional[Tuple[Intent, str]]:
+    """The intent a question asks and the folded entity text it names, if it fits a pattern"""
+    text = normalize_question(question)
+    for intent, pattern in _PATTERNS:
+        match = pattern.fullmatch(text)
+        if match:
+            entity = _ARTICLE.sub('', fold(match.group('entity')))
+            if entity:
+                return intent, entity
+    return None
+
+
+def _key(intent: str, node_id: str) -> str:
+    return f"{intent}:{node_id}"
+
+
+def _node_id(row: Dict[str, Any]) -> str:
+    return str(row.get('id') or row['name'])
+
+
+def pipeline_signature(qa_system: "MedicalQASystem") -> str:
+    """Hash of the settings an answer depends on besides the graph (retrieval, prompt, model)"""
+    llm = qa_system.llm
+    settings = {'retrieval': qa_system.retrieval_config.to_dict(),
+                'prompt': qa_system.prompt_template.template,
+                'model': getattr(llm, 'model_name', None) or type(llm).__name__}
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def neighbourhood_fingerprint(row: Dict[str, Any], intent: str, signature: str) -> str:
+    """Hash of an entity's one-hop neighbourhood as the answer for ``intent`` saw it"""
+    facts = {name: sorted(str(value) for value in values if value)
+             for name, values in (row.get('facts') or {}).items()}
+    confidences = sorted(-1.0 if value is None else float(value) for value in row.get('confidences') or [])
+    text = json.dumps({'intent': intent, 'name': row['name'], 'description': row.get('description'),
+                       'facts': facts, 'confidences': confidences, 'pipeline': signature},
+                      sort_keys=True, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class AnswerStore:
+    """
+    SQLite file of precomputed answers
+
+    Each answer is stored under ``intent:node_id`` with the graph version
+    and neighbourhood fingerprint it was generated from, as zlib-compressed
+    JSON of the answer and its sources. ``get`` maps a question onto a key
+    through the intent patterns and a table of folded entity names and
+    aliases, and returns the answer only if it was generated (or confirmed
+    unchanged) for the live graph version. ``build_answers`` fills it.
+    """
+
+    def __init__(self, path: str, readonly: bool = False):
+        """
+        Args:
+            path: Database file
+            readonly: Open for serving only; the file must exist
+        """
+        self.path = str(path)
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            # WAL lets a running service keep reading while the warm-up job writes
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'unmatched': 0, 'unknown_entity': 0, 'missing': 0, 'stale': 0}
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def get(self, question: str, graph_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Precomputed answer for a question, or None
+
+        Args:
+            question: Question as asked
+            graph_version: Live graph version ('' when the graph has none)
+
+        Returns:
+            Dictionary with answer, source_documents, the key and the
+            question the answer was generated for
+        """
+        matched = match_question(question)
+        if matched is None:
+            self._count('unmatched')
+            return None
+        intent, entity = matched
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT a.key, a.question, a.graph_version, a.payload FROM aliases n "
+                "LEFT JOIN answers a ON a.key = ? || ':' || n.node_id "
+                "WHERE n.alias = ? AND n.label = ?",
+                (intent.name, entity, intent.label)).fetchone()
+        if row is None:
+            self._count('unknown_entity')
+            return None
+        key, generated_for, version, payload = row
+        if key is None:
+            self._count('missing')
+            return None
+        if version != graph_version:
+            self._count('stale')
+            return None
+        self._count('hits')
+        entry = json.loads(zlib.decompress(payload))
+        return dict(entry, key=key, generated_for=generated_for)
+
+    # -- writing (build_answers) --------------------------------------------
+
+    def fingerprints(self) -> Dict[str, str]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, fingerprint FROM answers"))
+
+    def put(self, key: str, label: str, node_id: str, intent: str, question: str,
+            fingerprint: str, graph_version: str, answer: str, source_documents: List[Dict[str, Any]]):
+        payload = zlib.compress(json.dumps({'answer': answer, 'source_documents': source_documents},
+                                           separators=(',', ':'), default=str).encode('utf-8'), 6)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, label, node_id, intent, question, fingerprint, graph_version, time.time(), payload))
+
+    def confirm(self, keys: List[str], graph_version: str):
+        """Mark unchanged answers as valid for ``graph_version``"""
+        with self._lock:
+            self._conn.executemany("UPDATE answers SET graph_version = ? WHERE key = ?",
+                                   [(graph_version, key) for key in keys])
+
+    def retain(self, keys: set) -> int:
+        """Delete answers whose key is not in ``keys``; returns how many"""
+        with self._lock:
+            stored = [key for (key,) in self._conn.execute("SELECT key FROM answers")]
+            removed = [(key,) for key in stored if key not in keys]
+            self._conn.executemany("DELETE FROM answers WHERE key = ?", removed)
+        return len(removed)
+
+    def replace_aliases(self, aliases: List[Tuple[str, str, str]]):
+        """Swap in a new (alias, label, node_id) table; the first entry wins on a clash"""
+        with self._lock:
+            self._conn.execute("DELETE FROM aliases")
+            self._conn.executemany("INSERT OR IGNORE INTO aliases VALUES (?, ?, ?)", aliases)
+
+    def set_meta(self, **values):
+        with self._lock:
+            self._conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                                   [(key, json.dumps(value)) for key, value in values.items()])
+
+    def meta(self) -> Dict[str, Any]:
+        with self._lock:
+            return {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+
+    def commit(self):
+        with self._lock:
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = self._conn.execute("SELECT count(*) FROM answers").fetchone()[0]
+        asked = sum(self.counters.values())
+        stats['hit_rate'] = round(stats['hits'] / asked, 4) if asked else None
+        return stats
+
+
+def enumerate_entities(driver, drugs: int, diseases: int) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """(label, neighbourhood row) for the ``drugs`` / ``diseases`` most connected entities"""
+    for label, limit in (('Drug', drugs), ('Disease', diseases)):
+        if limit <= 0:
+            continue
+        with driver.session() as session:
+            for record in session.run(NEIGHBOURHOOD_QUERIES[label], limit=limit):
+                yield label, dict(record)
+
+
+def build_answers(qa_system: "MedicalQASystem", store: AnswerStore, drugs: int = 2000,
+                  diseases: int = 1000, workers: int = 4, force: bool = False,
+                  commit_every: int = 100) -> Dict[str, Any]:
+    """
+    Generate (or refresh) the answer for every intent of the top entities
+
+    Answers go through ``qa_system.ask`` (retrieval, prompt and LLM gateway
+    as for a live question). An answer is regenerated only when the
+    fingerprint of its entity's neighbourhood or of the pipeline settings
+    changed; otherwise it is just re-stamped with the current graph version.
+    Answers for entities no longer enumerated are dropped.
+
+    Args:
+        qa_system: Initialized MedicalQASystem
+        store: Store opened for writing
+        drugs, diseases: How many of the most connected entities to cover
+        workers: Questions generated concurrently
+        force: Regenerate every answer (e.g. after rebuilding the index)
+        commit_every: Answers written per transaction
+
+    Returns:
+        Counts of generated, unchanged, removed and failed answers
+    """
+    graph_version = qa_system.graph_cache.version(force=True) or ''
+    signature = pipeline_signature(qa_system)
+    stored = {} if force else store.fingerprints()
+
+    jobs, unchanged, aliases, seen = [], [], [], set()
+    for label, row in enumerate_entities(qa_system.driver, drugs, diseases):
+        node_id = _node_id(row)
+        for name in [row['name']] + list(row.get('aliases') or []):
+            if name:
+                aliases.append((_ARTICLE.sub('', fold(name)), label, node_id))
+        for intent in INTENTS:
+            if intent.label != label:
+                continue
+            key = _key(intent.name, node_id)
+            seen.add(key)
+            fingerprint = neighbourhood_fingerprint(row, intent.name, signature)
+            if stored.get(key) == fingerprint:
+                unchanged.append(key)
+            else:
+                jobs.append((key, label, node_id, intent.name,
+                             intent.template.format(name=row['name']), fingerprint))
+    logger.info(f"{len(seen)} answers for graph version {graph_version or '(none)'}: "
+                f"{len(jobs)} to generate, {len(unchanged)} unchanged")
+
+    summary = {'graph_version': graph_version, 'generated': 0, 'unchanged': len(unchanged),
+               'removed': 0, 'failed': 0}
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending, remaining = {}, iter(jobs)
+        while True:
+            # Keep at most two questions per worker in flight
+            for job in remaining:
+                pending[pool.submit(qa_system.ask, job[4], use_precomputed=False)] = job
+                if len(pending) >= workers * 2:
+                    break
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    summary['failed'] += 1
+                    logger.warning(f"Could not generate {job[0]} ({job[4]!r}): {e}")
+                    continue
+                store.put(*job[:6], graph_version=graph_version, answer=result['answer'],
+                          source_documents=result['source_documents'])
+                summary['generated'] += 1
+                if summary['generated'] % commit_every == 0:
+                    store.commit()
+                    rate = summary['generated'] / (time.monotonic() - start)
+                    logger.info(f"Generated {summary['generated']}/{len(jobs)} answers "
+                                f"({rate:.1f}/s, ETA {(len(jobs) - summary['generated']) / rate:.0f}s)")
+
+    store.confirm(unchanged, graph_version)
+    summary['removed'] = store.retain(seen)
+    store.replace_aliases(aliases)
+    store.set_meta(graph_version=graph_version, pipeline=signature, built_at=time.time())
+    store.commit()
+
+    if (qa_system.graph_cache.version(force=True) or '') != graph_version:
+        logger.warning("Graph version changed while answers were generated; "
+                       "they will not be served until this job is run again")
+    summary['seconds'] = round(time.monotonic() - start, 2)
+    return summary
+
+
+def load_answer_store(path: Optional[str], signature: Optional[str] = None) -> Optional[AnswerStore]:
+    """
+    Read-only store at ``path`` (e.g. ANSWER_STORE_PATH), or None if unset or missing
+
+    Args:
+        path: Database file
+        signature: ``pipeline_signature`` of the serving system; a store built
+            for other settings is not loaded
+
+    Returns:
+        AnswerStore instance or None
+    """
+    if not path:
+        return None
+    if not Path(path).exists():
+        logger.warning(f"Answer store {path} not found; answering every question live")
+        return None
+    store = AnswerStore(path, readonly=True)
+    built_for = store.meta().get('pipeline')
+    if signature is not None and built_for != signature:
+        logger.warning(f"Answer store {path} was built for pipeline {built_for}, not {signature} "
+                       f"(retrieval, prompt or model changed); answering every question live "
+                       f"until rag/answer_store.py is run again")
+        store.close()
+        return None
+    logger.info(f"Serving precomputed answers from {path} ({store.stats()['entries']} entries)")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute answers for common entity questions")
+    parser.add_argument('--store', default=os.getenv("ANSWER_STORE_PATH", "data/answers.sqlite"))
+    parser.add_argument('--drugs', type=int, default=2000, help="Most connected drugs to cover")
+    parser.add_argument('--diseases', type=int, default=1000, help="Most connected diseases to cover")
+    parser.add_argument('--workers', type=int, default=4, help="Questions generated concurrently")
+    parser.add_argument('--index-dir', default=os.getenv("MEDIGRAPH_INDEX_DIR", "data/index"))
+    parser.add_argument('--force', action='store_true', help="Regenerate unchanged answers too")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    from rag.qa_chain import MedicalQASystem
+    qa_system = MedicalQASystem()
+    qa_system.initialize(index_dir=args.index_dir)
+    store = AnswerStore(args.store)
+    try:
+        summary = build_answers(qa_system, store, drugs=args.drugs, diseases=args.diseases,
+                                workers=args.workers, force=args.force)
+        print(json.dumps(summary, indent=2))
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# HTTP client for the QA service (see rag/service.py)
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import requests
+
+# Startup steps as reported by /ready (service state, then MedicalQASystem.progress)
+STARTUP_STEPS = [
+    ('starting', "Starting service"),
+    ('loading', "Loading QA system"),
+    ('extracting', "Extracting documents from the graph"),
+    ('splitting', "Splitting documents"),
+    ('embedding', "Embedding chunks"),
+    ('indexing', "Building vector index"),
+    ('saving', "Saving index"),
+    ('warming', "Warming up"),
+    ('ready', "Ready"),
+]
+
+
+def startup_progress(readiness: Dict[str, Any]) -> Tuple[float, str]:
+    """
+    Summarize a ``/ready`` report for a progress bar
+
+    Returns:
+        (fraction complete in [0, 1], label)
+    """
+    stage = readiness.get('status', 'starting')
+    progress = readiness.get('progress') or {}
+    if stage == 'loading' and progress.get('stage') not in (None, 'idle', 'ready'):
+        stage = progress['stage']
+    steps = [name for name, _ in STARTUP_STEPS]
+    if stage not in steps:
+        return 0.0, readiness.get('error') or stage.capitalize()
+    position = steps.index(stage)
+    label = dict(STARTUP_STEPS)[stage]
+    if progress.get('stage') == stage and progress.get('total'):
+        position += progress['done'] / progress['total']
+        label += f" ({progress['done']}/{progress['total']})"
+        if progress.get('eta_seconds') is not None:
+            label += f", about {progress['eta_seconds']:.0f}s left"
+    return min(position / (len(steps) - 1), 1.0), label
+
+
+class ServiceError(RuntimeError):
+    """Error response from the QA service"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+
+
+class QAServiceClient:
+    """
+    Client exposing the same ask/stats/interaction methods as MedicalQASystem,
+    served by a remote QA service
+    """
+
+    def __init__(self, base_url: Optional[str] = None, timeout: float = 120.0):
+        """
+        Args:
+            base_url: Service URL (defaults to MEDIGRAPH_API_URL)
+            timeout: Seconds to wait for a response
+        """
+        self.base_url = (base_url or os.getenv("MEDIGRAPH_API_URL", "http://localhost:8000")).rstrip('/')
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def _request(self, method: str, path: str, **kwargs) -> requests.Response:
+        try:
+            response = self.session.request(method, self.base_url + path,
+                                            timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            raise ServiceError(0, f"QA service unreachable at {self.base_url}: {e}")
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error') or response.json().get('status')
+            except ValueError:
+                message = response.text
+            raise ServiceError(response.status_code, message)
+        return response
+
+    def readiness(self) -> Dict[str, Any]:
+        """
+        Readiness report; ``status`` is 'ready' once the service is warm,
+        otherwise the startup stage with build ``progress``
+        """
+        try:
+            response = self.session.get(self.base_url + '/ready', timeout=self.timeout)
+            return response.json()
+        except requests.RequestException as e:
+            return {'status': 'unavailable', 'error': f"QA service unreachable at {self.base_url}: {e}"}
+        except ValueError:
+            return {'status': 'error', 'error': f"{response.status_code}: {response.text}"}
+
+    def wait_until_ready(self, timeout: float = 300.0, interval: float = 1.0) -> bool:
+        """Poll ``/ready`` until the service is warm or ``timeout`` passes"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.readiness().get('status') == 'ready':
+                return True
+            time.sleep(interval)
+        return False
+
+    def ask(self, question: str, session_id: Optional[str] = None, **filters) -> Dict[str, Any]:
+        """
+        Ask a question; ``filters`` are types, sources and min_confidence
+
+        Sources prefetched under ``session_id`` are reused when the question matches.
+        """
+        return self._request('POST', '/ask', json=dict(filters, question=question,
+                                                       session_id=session_id)).json()
+
+    def prefetch(self, question: str, session_id: str, **filters) -> Dict[str, Any]:
+        """Retrieve sources for a question still being typed (no answer is generated)"""
+        return self._request('POST', '/prefetch', json=dict(filters, question=question,
+                                                            session_id=session_id)).json()
+
+    def ask_batch(self, questions: List[str], **filters) -> List[Dict[str, Any]]:
+        return self._request('POST', '/ask/batch',
+                             json=dict(filters, questions=questions)).json()['results']
+
+    def ask_stream(self, question: str, session_id: Optional[str] = None,
+                   **filters) -> Iterator[Dict[str, Any]]:
+        """Yield the service's streamed events (sources, then answer)"""
+        response = self._request('POST', '/ask/stream', stream=True,
+                                 json=dict(filters, question=question, session_id=session_id))
+        for line in response.iter_lines():
+            if line:
+                event = json.loads(line)
+                if event.get('event') == 'error':
+                    raise ServiceError(event.get('status', 500), event.get('error', ''))
+                yield event
+
+    def check_interactions(self, drugs: List[str]) -> Dict[str, Any]:
+        return self._request('POST', '/interactions', json={'drugs': drugs}).json()
+
+    def resolve_entity(self, text: str, labels: Optional[List[str]] = None,
+                       limit: int = 10) -> List[Dict[str, Any]]:
+        return self._request('POST', '/resolve',
+                             json={'text': text, 'labels': labels, 'limit': limit}).json()['candidates']
+
+    def get_system_stats(self, refresh: bool = False) -> Dict[str, Any]:
+        return self._request('GET', '/stats', params={'refresh': int(refresh)}).json()
+
+
+class PrefetchDebouncer:
+    """
+    Prefetch sources for a question once its text stops changing
+
+    Each ``update`` restarts a ``delay`` timer; when it fires without a newer
+    update, the text is sent to ``/prefetch`` on a background thread under
+    this debouncer's session id. ``ask`` submits under the same session, so
+    the service reuses the prefetched sources and only generation is left on
+    the critical path. A failed or shed prefetch is ignored; the submit then
+    just retrieves as usual.
+    """
+
+    def __init__(self, client: QAServiceClient, session_id: Optional[str] = None,
+                 delay: float = 0.4, min_chars: int = 8, wait: float = 2.0):
+        """
+        Args:
+            client: Service client
+            session_id: Session key (random by default)
+            delay: Seconds the text must stay unchanged before prefetching
+            min_chars: Shorter texts are not prefetched
+            wait: Seconds ``ask`` waits for a prefetch already in flight
+        """
+        self.client = client
+        self.session_id = session_id or uuid.uuid4().hex
+        self.delay = delay
+        self.min_chars = min_chars
+        self.wait = wait
+        self.last: Optional[Dict[str, Any]] = None
+        self._timer: Optional[threading.Timer] = None
+        self._sent: Optional[Tuple[str, str]] = None
+        self._idle = threading.Event()
+        self._idle.set()
+        self._lock = threading.Lock()
+
+    def update(self, question: str, **filters):
+        """Report the current text of the question field"""
+        question = question.strip()
+        key = (question, json.dumps(filters, sort_keys=True))
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if len(question) < self.min_chars or key == self._sent:
+                return
+            self._timer = threading.Timer(self.delay, self._prefetch, args=(question, filters, key))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _prefetch(self, question: str, filters: Dict[str, Any], key: Tuple[str, str]):
+        with self._lock:
+            self._timer = None
+            self._sent = key
+            self._idle.clear()
+        try:
+            self.last = self.client.prefetch(question, self.session_id, **filters)
+        except ServiceError:
+            with self._lock:
+                self._sent = None
+        finally:
+            self._idle.set()
+
+    def cancel(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def ask(self, question: str, **filters) -> Dict[str, Any]:
+        """Submit the question, reusing this session's prefetch when it matches"""
+        self.cancel()
+        self._idle.wait(self.wait)
+        return self.client.ask(question, session_id=self.session_id, **filters)
@@ -0,0 +1,238 @@
+# Compact columnar docstore for the FAISS vector store
+import json
+import logging
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, Union
+
+import numpy as np
+from langchain.schema import Document
+from langchain_community.docstore.base import Docstore
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+# Metadata column kinds; anything else is stored as interned JSON text
+SCALAR_KINDS = {str: 'str', bool: 'bool', int: 'int', float: 'float'}
+
+
+def _kind(values: List[Any]) -> str:
+    kinds = set()
+    for value in values:
+        if isinstance(value, (list, tuple)) and all(isinstance(v, str) for v in value):
+            kinds.add('list')
+        else:
+            kinds.add(SCALAR_KINDS.get(type(value), 'json'))
+    if kinds <= {'int', 'float'}:
+        return kinds.pop() if len(kinds) == 1 else 'float'
+    return kinds.pop() if len(kinds) == 1 else 'json'
+
+
+class RowIds(Mapping):
+    """``index_to_docstore_id`` for a ColumnarDocstore: FAISS id i is row i"""
+
+    def __init__(self, rows: int):
+        self.rows = rows
+
+    def __getitem__(self, i) -> str:
+        if not 0 <= int(i) < self.rows:
+            raise KeyError(i)
+        return str(int(i))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.rows))
+
+    def __len__(self) -> int:
+        return self.rows
+
+
+class ColumnarDocstore(Docstore):
+    """
+    Read-only docstore holding chunk text and metadata in flat arrays
+
+    Chunk text is one UTF-8 blob with int64 offsets. Every string in the
+    metadata is interned once in a string table; string fields are stored as
+    int32 string ids, string lists (treats, symptoms, ...) as CSR ranges of
+    string ids, and numbers as float64 columns, each with a presence mask so
+    documents come back with exactly the keys they were built with. The
+    arrays can be memory-mapped, and a ``Document`` is only created for the
+    rows ``search`` is asked for.
+    """
+
+    def __init__(self, text: np.ndarray, text_offsets: np.ndarray, strings: np.ndarray,
+                 string_offsets: np.ndarray, columns: Dict[str, Dict[str, np.ndarray]],
+                 kinds: Dict[str, str]):
+        self._text = text
+        self._text_offsets = text_offsets
+        self._strings = strings
+        self._string_offsets = string_offsets
+        self.columns = columns
+        self.kinds = kinds
+
+    @classmethod
+    def from_documents(cls, documents: Sequence[Document]) -> 'ColumnarDocstore':
+        """
+        Pack documents, in FAISS id order
+
+        Args:
+            documents: Chunks; row i is the vector with FAISS id i
+        """
+        encoded = [doc.page_content.encode('utf-8') for doc in documents]
+        text_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=text_offsets[1:])
+        text = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+        interned: Dict[str, int] = {}
+
+        def intern(value: str) -> int:
+            return interned.setdefault(value, len(interned))
+
+        fields: Dict[str, None] = {}
+        for doc in documents:
+            fields.update(dict.fromkeys(doc.metadata))
+        columns, kinds = {}, {}
+        for field in fields:
+            present = np.array([field in doc.metadata for doc in documents], dtype=bool)
+            values = [doc.metadata[field] for doc in documents if field in doc.metadata]
+            kind = kinds[field] = _kind(values)
+            column = {'present': present}
+            if kind == 'list':
+                lengths = [len(doc.metadata.get(field) or ()) for doc in documents]
+                column['indptr'] = np.zeros(len(documents) + 1, dtype=np.int64)
+                np.cumsum(lengths, out=column['indptr'][1:])
+                column['ids'] = np.array([intern(v) for value in values for v in value],
+                                         dtype=np.int32)
+            elif kind in ('str', 'json'):
+                ids = np.zeros(len(documents), dtype=np.int32)
+                ids[present] = [intern(v if kind == 'str' else json.dumps(v)) for v in values]
+                column['ids'] = ids
+            else:
+                numbers = np.zeros(len(documents), dtype=np.float64)
+                numbers[present] = values
+                column['values'] = numbers
+            columns[field] = column
+
+        encoded = [s.encode('utf-8') for s in interned]
+        string_offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=string_offsets[1:])
+        strings = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(text, text_offsets, strings, string_offsets, columns, kinds)
+
+    # -- persistence -------------------------------------------------------
+
+    def save(self, directory: str):
+        """Write the store as ``.npy`` arrays plus ``meta.json``"""
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "text.npy", self._text)
+        np.save(path / "text_offsets.npy", self._text_offsets)
+        np.save(path / "strings.npy", self._strings)
+        np.save(path / "string_offsets.npy", self._string_offsets)
+        for field, column in self.columns.items():
+            for part, array in column.items():
+                np.save(path / f"{field}.{part}.npy", array)
+        meta = {'format': FORMAT_VERSION, 'rows': len(self), 'kinds': self.kinds}
+        (path / "meta.json").write_text(json.dumps(meta), encoding='utf-8')
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> 'ColumnarDocstore':
+        """
+        Open a saved store
+
+        Args:
+            directory: Directory written by ``save``
+            mmap: Memory-map the arrays instead of reading them into memory
+        """
+        path = Path(directory)
+        meta = json.loads((path / "meta.json").read_text(encoding='utf-8'))
+        if meta.get('format') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported docstore format {meta.get('format')} in {directory}")
+        mode = 'r' if mmap else None
+
+        def array(name):
+            return np.load(path / name, mmap_mode=mode)
+
+        parts = {'list': ('present', 'indptr', 'ids'), 'str': ('present', 'ids'),
+                 'json': ('present', 'ids')}
+        columns = {field: {part: array(f"{field}.{part}.npy")
+                           for part in parts.get(kind, ('present', 'values'))}
+                   for field, kind in meta['kinds'].items()}
+        return cls(array("text.npy"), array("text_offsets.npy"), array("strings.npy"),
+                   array("string_offsets.npy"), columns, meta['kinds'])
+
+    # -- access ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self._text_offsets) - 1
+
+    @property
+    def index_to_docstore_id(self) -> RowIds:
+        return RowIds(len(self))
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the arrays (on disk, or resident once paged in)"""
+        arrays = [self._text, self._text_offsets, self._strings, self._string_offsets]
+        arrays += [a for column in self.columns.values() for a in column.values()]
+        return int(sum(a.nbytes for a in arrays))
+
+    def string(self, string_id: int) -> str:
+        start, end = self._string_offsets[string_id], self._string_offsets[string_id + 1]
+        return bytes(self._strings[start:end]).decode('utf-8')
+
+    def text(self, row: int) -> str:
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        return bytes(self._text[start:end]).decode('utf-8')
+
+    def metadata(self, row: int) -> Dict[str, Any]:
+        metadata = {}
+        for field, column in self.columns.items():
+            if not column['present'][row]:
+                continue
+            kind = self.kinds[field]
+            if kind == 'list':
+                start, end = column['indptr'][row], column['indptr'][row + 1]
+                metadata[field] = [self.string(i) for i in column['ids'][start:end]]
+            elif kind == 'str':
+                metadata[field] = self.string(column['ids'][row])
+            elif kind == 'json':
+                metadata[field] = json.loads(self.string(column['ids'][row]))
+            elif kind == 'bool':
+                metadata[field] = bool(column['values'][row])
+            elif kind == 'int':
+                metadata[field] = int(column['values'][row])
+            else:
+                metadata[field] = float(column['values'][row])
+        return metadata
+
+    def search(self, search: Union[str, int]) -> Union[str, Document]:
+        """Document for a row id (as given by ``index_to_docstore_id``)"""
+        row = int(search)
+        if not 0 <= row < len(self):
+            return f"ID {search} not found."
+        return Document(page_content=self.text(row), metadata=self.metadata(row))
+
+    def codes(self, field: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Distinct values of a string field and each row's index into them
+
+        Rows without the field get the value ''.
+        """
+        column = self.columns.get(field)
+        if column is None or self.kinds[field] != 'str':
+            return np.array([''], dtype=object), np.zeros(len(self), dtype=np.int64)
+        ids = np.where(column['present'], column['ids'], -1)
+        distinct, inverse = np.unique(ids, return_inverse=True)
+        values = np.array([self.string(i) if i >= 0 else '' for i in distinct], dtype=object)
+        # Order by value, matching np.unique over the decoded strings
+        order = np.argsort(values.astype(str), kind='stable')
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        return values[order].astype(str), rank[inverse]
+
+    def floats(self, field: str, default: float = 1.0) -> np.ndarray:
+        """A numeric field as float64, ``default`` where absent"""
+        column = self.columns.get(field)
+        if column is None or 'values' not in column:
+            return np.full(len(self), default, dtype=np.float64)
+        return np.where(column['present'], column['values'], default)
@@ -0,0 +1,159 @@
+# Metadata-filtered search over the FAISS vector store
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+from langchain.schema import Document
+
+from rag.docstore import ColumnarDocstore
+from rag.retrieval import exhaustive_search_parameters, search_parameters
+
+logger = logging.getLogger(__name__)
+
+MAX_CACHED_FILTERS = 64
+
+
+class FilteredIndex:
+    """
+    Pre-filtered k-NN search by document type, source and confidence
+
+    Chunk metadata is held in arrays aligned with the FAISS ids. A filter
+    becomes a bitmap ``IDSelector`` passed to ``index.search``, so rejected
+    vectors are skipped inside the scan instead of being fetched and dropped
+    afterwards: a filtered query never costs more than an unfiltered one.
+
+    HNSW and IVF indexes only visit ``efSearch`` candidates or ``nprobe``
+    lists, so a selective filter can leave fewer than k survivors. Such a
+    search is repeated exhaustively (every IVF list, or an exact scan of the
+    matching rows for HNSW), so k results come back whenever at least k
+    chunks pass the filter. ``fallbacks`` counts the repeats.
+    """
+
+    def __init__(self, vector_store):
+        """
+        Args:
+            vector_store: LangChain FAISS vector store
+        """
+        self.vector_store = vector_store
+        docstore = vector_store.docstore
+        if isinstance(docstore, ColumnarDocstore):
+            # Read the metadata columns directly instead of materializing every chunk
+            self.types, self._type_codes = docstore.codes('type')
+            self.sources, self._source_codes = docstore.codes('source')
+            self._confidence = docstore.floats('confidence').astype(np.float32)
+        else:
+            metadata = [docstore.search(vector_store.index_to_docstore_id[i]).metadata
+                        for i in range(vector_store.index.ntotal)]
+            self.types, self._type_codes = np.unique(
+                [str(m.get('type', '')) for m in metadata], return_inverse=True)
+            self.sources, self._source_codes = np.unique(
+                [str(m.get('source', '')) for m in metadata], return_inverse=True)
+            self._confidence = np.array([m.get('confidence', 1.0) for m in metadata],
+                                        dtype=np.float32)
+        self._selectors: "OrderedDict[Tuple, Tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fallbacks = 0
+
+    def _codes(self, values: Optional[Sequence[str]], vocabulary: np.ndarray) -> Optional[np.ndarray]:
+        if values is None:
+            return None
+        return np.flatnonzero(np.isin(vocabulary, list(values)))
+
+    def selector(self, types: Optional[Sequence[str]] = None,
+                 sources: Optional[Sequence[str]] = None,
+                 min_confidence: Optional[float] = None):
+        """
+        FAISS ID selector for a filter
+
+        Returns:
+            (selector or None when nothing is filtered, number of matching chunks)
+        """
+        selector, _, matches = self._filter(types, sources, min_confidence)
+        return selector, matches
+
+    def _filter(self, types, sources, min_confidence) -> Tuple:
+        """(selector, packed bitmap, matches) for a filter, cached"""
+        if types is None and sources is None and min_confidence is None:
+            return None, None, len(self._confidence)
+        key = (tuple(sorted(types)) if types is not None else None,
+               tuple(sorted(sources)) if sources is not None else None, min_confidence)
+        with self._lock:
+            cached = self._selectors.get(key)
+            if cached is not None:
+                self._selectors.move_to_end(key)
+                return cached
+
+        mask = np.ones(len(self._confidence), dtype=bool)
+        type_codes = self._codes(types, self.types)
+        if type_codes is not None:
+            mask &= np.isin(self._type_codes, type_codes)
+        source_codes = self._codes(sources, self.sources)
+        if source_codes is not None:
+            mask &= np.isin(self._source_codes, source_codes)
+        if min_confidence is not None:
+            mask &= self._confidence >= min_confidence
+        # The selector reads the bitmap in place, so it is cached alongside it
+        bitmap = np.packbits(mask, bitorder='little')
+        selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+        matches = int(mask.sum())
+        with self._lock:
+            self._selectors[key] = (selector, bitmap, matches)
+            if len(self._selectors) > MAX_CACHED_FILTERS:
+                self._selectors.popitem(last=False)
+        return selector, bitmap, matches
+
+    def search(self, vector: List[float], k: int = 5, types: Optional[Sequence[str]] = None,
+               sources: Optional[Sequence[str]] = None,
+               min_confidence: Optional[float] = None) -> List[Document]:
+        """
+        Nearest chunks passing the filter
+
+        Args:
+            vector: Query embedding
+            k: Number of chunks to return
+            types: Allowed ``metadata['type']`` values (drug, disease, ...)
+            sources: Allowed ``metadata['source']`` values (fda, extracted)
+            min_confidence: Minimum ``metadata['confidence']``
+
+        Returns:
+            Up to k documents, nearest first
+        """
+        selector, bitmap, matches = self._filter(types, sources, min_confidence)
+        if selector is None:
+            return self.vector_store.similarity_search_by_vector(vector, k=k)
+        if matches == 0:
+            return []
+
+        index = self.vector_store.index
+        k = min(k, matches)
+        query = np.array([vector], dtype=np.float32)
+        if self.vector_store._normalize_L2:
+            faiss.normalize_L2(query)
+        _, indices = index.search(query, k, params=search_parameters(index, selector))
+        rows = [i for i in indices[0] if i != -1]
+        if len(rows) < k:
+            with self._lock:
+                self.fallbacks += 1
+            params = exhaustive_search_parameters(index, selector)
+            if params is not None:
+                _, indices = index.search(query, k, params=params)
+                rows = [i for i in indices[0] if i != -1]
+            else:
+                rows = self._exact_search(index, query[0], bitmap, k)
+        return [self.vector_store.docstore.search(self.vector_store.index_to_docstore_id[i])
+                for i in rows]
+
+    def _exact_search(self, index, query: np.ndarray, bitmap: np.ndarray, k: int) -> List[int]:
+        """Nearest k of the rows set in ``bitmap``, by brute force over their stored vectors"""
+        candidates = np.flatnonzero(np.unpackbits(bitmap, count=len(self._confidence),
+                                                  bitorder='little'))
+        vectors = index.reconstruct_batch(candidates)
+        if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+            distances = -(vectors @ query)
+        else:
+            distances = ((vectors - query) ** 2).sum(axis=1)
+        nearest = np.argsort(distances, kind='stable')[:k]
+        return candidates[nearest].tolist()
@@ -0,0 +1,257 @@
+# LLM call gateway: single-flight coalescing, rate budgets, retries and hedging
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses and exception names (OpenAI SDK and stand-ins) worth retrying
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+RETRYABLE_NAME = re.compile(r"RateLimit|Timeout|Connection|ServiceUnavailable|InternalServer")
+CHARS_PER_TOKEN = 4
+WINDOW_SECONDS = 60.0
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed LLM call is transient"""
+    status = getattr(exc, 'status_code', None) or getattr(exc, 'status', None)
+    return status in RETRYABLE_STATUS or bool(RETRYABLE_NAME.search(type(exc).__name__))
+
+
+class RateBudget:
+    """
+    Requests-per-minute and tokens-per-minute budget over a sliding window
+
+    Callers queue in arrival order; each waits until its request and token
+    estimate fit in the last minute's usage. A request larger than the whole
+    token budget is let through once the window is empty.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._window = deque()  # [timestamp, tokens] per admitted request
+        self._tokens = 0
+        self._condition = threading.Condition()
+        self._next_ticket = 0
+        self._serving = 0
+        self.waited_seconds = 0.0
+
+    def _expire(self, now: float):
+        while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+            self._tokens -= self._window.popleft()[1]
+
+    def _delay(self, tokens: int, now: float) -> float:
+        """Seconds until ``tokens`` fit, 0 if they fit now"""
+        self._expire(now)
+        if not self._window:
+            return 0.0
+        if self.requests_per_minute and len(self._window) >= self.requests_per_minute:
+            return self._window[0][0] + WINDOW_SECONDS - now
+        if self.tokens_per_minute and self._tokens + tokens > self.tokens_per_minute:
+            freed, needed = 0, self._tokens + tokens - self.tokens_per_minute
+            for timestamp, used in self._window:
+                freed += used
+                if freed >= needed:
+                    return timestamp + WINDOW_SECONDS - now
+            return self._window[-1][0] + WINDOW_SECONDS - now
+        return 0.0
+
+    def acquire(self, tokens: int) -> list:
+        """
+        Block until the request fits in the budget, then record it
+
+        Returns:
+            Window entry; pass it to ``settle`` with the actual token count
+        """
+        if not self.requests_per_minute and not self.tokens_per_minute:
+            return [time.monotonic(), tokens]
+        start = time.monotonic()
+        with self._condition:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while True:
+                now = time.monotonic()
+                delay = self._delay(tokens, now) if ticket == self._serving else None
+                if delay == 0.0:
+                    break
+                self._condition.wait(timeout=delay)
+            entry = [now, tokens]
+            self._window.append(entry)
+            self._tokens += tokens
+            self._serving += 1
+            self.waited_seconds += now - start
+            self._condition.notify_all()
+        return entry
+
+    def settle(self, entry: list, tokens: int):
+        """Replace a request's token estimate with what it actually used"""
+        with self._condition:
+            if any(admitted is entry for admitted in self._window):
+                self._tokens += tokens - entry[1]
+            entry[1] = tokens
+            self._condition.notify_all()
+
+
+class LLMGateway:
+    """
+    Front door for every chat-model call
+
+    * Identical prompts in flight at the same time share one generation
+      (single-flight); later callers wait for the first caller's result.
+    * Calls are admitted against requests-per-minute and tokens-per-minute
+      budgets and queue in arrival order when a budget is spent.
+    * Transient failures are retried with full-jitter exponential backoff.
+    * With hedging on, a call still running after the recent p95 latency is
+      duplicated and whichever finishes first is returned.
+    """
+
+    def __init__(self, llm, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0, hedge: bool = False,
+                 hedge_min_samples: int = 20, max_concurrency: int = 16,
+                 expected_output_tokens: int = 256):
+        """
+        Args:
+            llm: LangChain chat model
+            requests_per_minute: Request budget (None for unlimited)
+            tokens_per_minute: Prompt + completion token budget (None for unlimited)
+            max_retries: Retries after the first attempt for transient errors
+            backoff_base: First backoff ceiling in seconds, doubled per retry
+            backoff_max: Upper bound on a single backoff
+            hedge: Send a second request when the first exceeds p95 latency
+            hedge_min_samples: Latencies observed before hedging starts
+            max_concurrency: Calls to the model running at once
+            expected_output_tokens: Completion size reserved from the token
+                budget before the actual usage is known
+        """
+        self.llm = llm
+        self.budget = RateBudget(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.expected_output_tokens = expected_output_tokens
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency,
+                                        thread_name_prefix="llm-gateway")
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=500)
+        self.counters = {'requests': 0, 'coalesced': 0, 'calls': 0, 'retries': 0,
+                         'failures': 0, 'hedges': 0, 'hedge_wins': 0}
+
+    def _count(self, key: str, n: int = 1):
+        with self._lock:
+            self.counters[key] += n
+
+    def p95_latency(self) -> Optional[float]:
+        """p95 of recent model-call latencies in seconds"""
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < self.hedge_min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+
+    def invoke(self, prompt: str):
+        """
+        Generate a completion for a prompt
+
+        Args:
+            prompt: Prompt text
+
+        Returns:
+            The model's message
+        """
+        key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        with self._lock:
+            self.counters['requests'] += 1
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+            else:
+                self.counters['coalesced'] += 1
+        if not leader:
+            return future.result()
+
+        try:
+            future.set_result(self._with_retries(prompt))
+        except BaseException as exc:
+            future.set_exception(exc)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+        return future.result()
+
+    def _with_retries(self, prompt: str):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._hedged(prompt)
+            except Exception as exc:
+                if attempt == self.max_retries or not is_retryable(exc):
+                    self._count('failures')
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                logger.warning(f"LLM call failed ({type(exc).__name__}), retry {attempt + 1} "
+                               f"in {delay:.2f}s")
+                self._count('retries')
+                time.sleep(delay)
+
+    def _hedged(self, prompt: str):
+        primary = self._pool.submit(self._call, prompt)
+        hedge_after = self.p95_latency() if self.hedge else None
+        if hedge_after is None:
+            return primary.result()
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self._count('hedges')
+        backup = self._pool.submit(self._call, prompt)
+        done, _ = wait([primary, backup], return_when=FIRST_COMPLETED)
+        # Prefer whichever succeeded; fall back to the other if the first failed
+        for winner in sorted(done, key=lambda f: f.exception() is not None):
+            if winner.exception() is None:
+                if winner is backup:
+                    self._count('hedge_wins')
+                return winner.result()
+        other = backup if primary in done else primary
+        return other.result()
+
+    def _call(self, prompt: str):
+        estimate = len(prompt) // CHARS_PER_TOKEN + self.expected_output_tokens
+        entry = self.budget.acquire(estimate)
+        self._count('calls')
+        start = time.perf_counter()
+        message = self.llm.invoke(prompt)
+        elapsed = time.perf_counter() - start
+        usage = getattr(message, 'usage_metadata', None) or {}
+        if usage.get('total_tokens'):
+            self.budget.settle(entry, usage['total_tokens'])
+        with self._lock:
+            self._latencies.append(elapsed)
+        return message
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters, budget wait time and recent latency"""
+        with self._lock:
+            stats = dict(self.counters)
+            latencies = sorted(self._latencies)
+        stats['budget_wait_seconds'] = round(self.budget.waited_seconds, 3)
+        if latencies:
+            stats['p50_ms'] = round(latencies[len(latencies) // 2] * 1000, 2)
+            stats['p95_ms'] = round(latencies[min(len(latencies) - 1,
+                                                  int(len(latencies) * 0.95))] * 1000, 2)
+        return stats
+
+    def close(self):
+        self._pool.shutdown(wait=False)
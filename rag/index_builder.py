@@ -0,0 +1,150 @@
+# Concurrent, batched embedding for vector index builds
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import faiss
+import numpy as np
+
+from rag.gateway import CHARS_PER_TOKEN, RateBudget, is_retryable
+
+logger = logging.getLogger(__name__)
+
+# on_progress(done, total, eta_seconds)
+ProgressCallback = Callable[[int, int, Optional[float]], None]
+
+
+def length_batches(texts: Sequence[str], max_texts: int, max_chars: int) -> List[List[int]]:
+    """
+    Text indices sorted by length and cut into batches
+
+    A batch holds at most ``max_texts`` texts and ``max_chars`` characters
+    (a single longer text gets a batch of its own). Similar lengths share a
+    batch, so no request is dominated by one long outlier.
+    """
+    batches, batch, chars = [], [], 0
+    for i in sorted(range(len(texts)), key=lambda i: len(texts[i])):
+        size = len(texts[i])
+        if batch and (len(batch) >= max_texts or chars + size > max_chars):
+            batches.append(batch)
+            batch, chars = [], 0
+        batch.append(i)
+        chars += size
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class IndexBuilder:
+    """
+    Embed chunks with several requests in flight and fill a FAISS index
+
+    Chunks are grouped by length into size-bounded batches. Up to ``workers``
+    batches are embedded at once, each admitted against optional
+    requests/tokens-per-minute budgets and retried with jittered backoff on
+    transient errors. Vectors are added to the index as each batch
+    completes, so rows follow completion order; ``build`` returns that order
+    so the docstore can be laid out to match.
+    """
+
+    def __init__(self, embeddings, workers: int = 4, max_batch_texts: int = 256,
+                 max_batch_chars: int = 100_000, requests_per_minute: Optional[int] = None,
+                 tokens_per_minute: Optional[int] = None, max_retries: int = 3,
+                 backoff_base: float = 0.5, backoff_max: float = 8.0):
+        """
+        Args:
+            embeddings: LangChain embeddings
+            workers: Embedding requests in flight at once
+            max_batch_texts: Texts per request
+            max_batch_chars: Characters per request
+            requests_per_minute: Embedding request budget (None for unlimited)
+            tokens_per_minute: Embedding token budget (None for unlimited)
+            max_retries: Retries after the first attempt for transient errors
+            backoff_base: First backoff ceiling in seconds, doubled per retry
+            backoff_max: Upper bound on a single backoff
+        """
+        self.embeddings = embeddings
+        self.workers = max(1, workers)
+        self.max_batch_texts = max_batch_texts
+        self.max_batch_chars = max_batch_chars
+        self.budget = RateBudget(requests_per_minute, tokens_per_minute)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self.stats: Dict[str, Any] = {}
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        tokens = sum(len(t) for t in texts) // CHARS_PER_TOKEN + 1
+        for attempt in range(self.max_retries + 1):
+            self.budget.acquire(tokens)
+            try:
+                return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+            except Exception as exc:
+                if attempt == self.max_retries or not is_retryable(exc):
+                    raise
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                logger.warning(f"Embedding batch failed ({type(exc).__name__}), retry "
+                               f"{attempt + 1} in {delay:.2f}s")
+                with self._lock:
+                    self.stats['retries'] += 1
+                time.sleep(delay)
+
+    def build(self, texts: Sequence[str],
+              on_progress: Optional[ProgressCallback] = None) -> Tuple[Any, List[int]]:
+        """
+        Embed texts into a new flat L2 index
+
+        Args:
+            texts: Chunk texts
+            on_progress: Called after each batch with (done, total, eta_seconds)
+
+        Returns:
+            (FAISS index, text index stored in each index row)
+        """
+        batches = length_batches(texts, self.max_batch_texts, self.max_batch_chars)
+        self.stats = {'texts': len(texts), 'batches': len(batches), 'workers': self.workers,
+                      'retries': 0}
+        index, order = None, []
+        start = time.perf_counter()
+        if on_progress:
+            on_progress(0, len(texts), None)
+        with ThreadPoolExecutor(max_workers=self.workers,
+                                thread_name_prefix="embed-batch") as pool:
+            # Keep a bounded number of batches queued so finished vectors do not pile up
+            pending, queued = {}, iter(batches)
+            for batch in queued:
+                pending[pool.submit(self._embed, [texts[i] for i in batch])] = batch
+                if len(pending) >= self.workers * 2:
+                    break
+            try:
+                while pending:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        batch = pending.pop(future)
+                        vectors = future.result()
+                        if index is None:
+                            index = faiss.IndexFlatL2(vectors.shape[1])
+                        index.add(vectors)
+                        order.extend(batch)
+                        next_batch = next(queued, None)
+                        if next_batch is not None:
+                            pending[pool.submit(self._embed, [texts[i] for i in next_batch])] = next_batch
+                    if on_progress:
+                        elapsed = time.perf_counter() - start
+                        eta = elapsed / len(order) * (len(texts) - len(order))
+                        on_progress(len(order), len(texts), round(eta, 1))
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+        elapsed = time.perf_counter() - start
+        self.stats.update(seconds=round(elapsed, 3),
+                          texts_per_second=round(len(texts) / elapsed, 1) if elapsed else None,
+                          budget_wait_seconds=round(self.budget.waited_seconds, 3))
+        logger.info(f"Embedded {len(texts)} chunks in {len(batches)} batches with "
+                    f"{self.workers} workers in {elapsed:.2f}s")
+        return index, order
@@ -0,0 +1,107 @@
+# Per-session cache of speculatively retrieved sources
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from rag.retrieval import content_terms
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_question(question: str) -> str:
+    """Lower-case, collapse whitespace and drop trailing punctuation"""
+    return WHITESPACE.sub(' ', question.lower()).strip().rstrip('?.! ')
+
+
+def similarity(a: str, b: str) -> float:
+    """1.0 for the same normalized text, else the Jaccard overlap of content words"""
+    if normalize_question(a) == normalize_question(b):
+        return 1.0
+    terms_a, terms_b = content_terms(a), content_terms(b)
+    if not terms_a or not terms_b:
+        return 0.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+class PrefetchCache:
+    """
+    Sources retrieved while a question is still being typed, per UI session
+
+    Each session keeps its last few prefetches. ``take`` returns the
+    sources of the most similar one if it was retrieved with the same
+    filters, is younger than ``ttl`` seconds and its question is at least
+    ``min_similarity`` close to the submitted one (see ``similarity``); the
+    caller then only has to generate. Entries are also dropped when the
+    graph or index they came from changes (``clear``).
+    """
+
+    def __init__(self, max_sessions: int = 1024, per_session: int = 4, ttl: float = 120.0,
+                 min_similarity: float = 0.8):
+        """
+        Args:
+            max_sessions: Sessions kept before evicting the least recently used
+            per_session: Prefetches kept per session
+            ttl: Seconds a prefetch stays usable
+            min_similarity: Question similarity needed to reuse a prefetch
+        """
+        self.max_sessions = max_sessions
+        self.per_session = per_session
+        self.ttl = ttl
+        self.min_similarity = min_similarity
+        self._sessions: "OrderedDict[str, Deque[Tuple[float, str, Tuple, List[Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'prefetches': 0, 'hits': 0, 'near_hits': 0, 'misses': 0, 'expired': 0}
+
+    @staticmethod
+    def _filter_key(filters: Dict[str, Any]) -> Tuple:
+        return tuple(sorted((name, tuple(sorted(value)) if isinstance(value, list) else value)
+                            for name, value in filters.items()))
+
+    def put(self, session_id: str, question: str, filters: Dict[str, Any], docs: List[Any]):
+        with self._lock:
+            entries = self._sessions.get(session_id)
+            if entries is None:
+                entries = self._sessions[session_id] = deque(maxlen=self.per_session)
+            self._sessions.move_to_end(session_id)
+            entries.append((time.monotonic(), question, self._filter_key(filters), docs))
+            self.counters['prefetches'] += 1
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def take(self, session_id: str, question: str, filters: Dict[str, Any]) -> Optional[List[Any]]:
+        """Prefetched sources close enough to ``question``, or None"""
+        key = self._filter_key(filters)
+        now = time.monotonic()
+        with self._lock:
+            entries = list(self._sessions.get(session_id, ()))
+        best, best_score = None, 0.0
+        for created, prefetched, filter_key, docs in reversed(entries):
+            if filter_key != key:
+                continue
+            if now - created > self.ttl:
+                with self._lock:
+                    self.counters['expired'] += 1
+                continue
+            score = similarity(question, prefetched)
+            if score > best_score:
+                best, best_score = docs, score
+        with self._lock:
+            if best is None or best_score < self.min_similarity:
+                self.counters['misses'] += 1
+                return None
+            self.counters['hits' if best_score == 1.0 else 'near_hits'] += 1
+        return best
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.counters, sessions=len(self._sessions))
+        submitted = stats['hits'] + stats['near_hits'] + stats['misses']
+        stats['reuse_rate'] = (round((stats['hits'] + stats['near_hits']) / submitted, 4)
+                               if submitted else None)
+        return stats
@@ -1,50 +1,154 @@
 # TODO: LangChain RetrievalQA + Neo4j knowledge graph query
 import os
-from typing import List, Dict, Any, Optional
+import sys
+import time
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional
 import logging
 from pathlib import Path
 
-from langchain.chains import RetrievalQA
-from langchain_openai import OpenAI, ChatOpenAI, OpenAIEmbeddings
-from langchain.prompts import PromptTemplate
-from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-from neo4j import GraphDatabase
 import json
+import pickle
+import threading
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from graph.interactions import InteractionChecker
+from graph.query_cache import CachedDriver, GraphQueryCache
+from graph.resolver import EntityResolver
+from graph.snapshot import SnapshotStore
+from graph.stats import CachedGraphStats, GraphStatsCollector
+from rag.answer_store import load_answer_store, pipeline_signature
+from rag.gateway import LLMGateway
+from rag.prefetch import PrefetchCache
+from rag.retrieval import RetrievalConfig, lexical_rerank, load_index_config
+from monitoring.profiling import profile_entry
+from monitoring.tracing import get_tracer
+
+# LangChain, FAISS and the Neo4j driver take seconds to import; they are
+# imported where first used so importing this module (and the rag package)
+# stays cheap for the service, clients and UIs.
+if TYPE_CHECKING:
+    from langchain.schema import Document
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Stages reported in MedicalQASystem.progress, in the order they run
+STAGES = ('idle', 'loading', 'extracting', 'splitting', 'embedding', 'indexing', 'saving', 'ready')
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _min_confidence(confidences: Optional[List[float]]) -> float:
+    """Weakest relationship confidence behind a document; 1.0 if it states none"""
+    values = [c for c in confidences or [] if c is not None]
+    return float(min(values)) if values else 1.0
+
+
+def _filters(types, sources, min_confidence) -> Dict[str, Any]:
+    filters = {'types': types, 'sources': sources, 'min_confidence': min_confidence}
+    return {key: value for key, value in filters.items() if value is not None}
+
+
 class MedicalQASystem:
     """
     Medical Question Answering System using RAG
     """
     
-    def __init__(self, openai_api_key: str = None):
+    def __init__(self, openai_api_key: str = None, embeddings=None, llm=None, driver=None,
+                 retrieval_config: Optional[RetrievalConfig] = None):
+        """
+        Args:
+            openai_api_key: OpenAI API key (defaults to OPENAI_API_KEY)
+            embeddings: LangChain embeddings to use instead of OpenAIEmbeddings
+            llm: LangChain chat model to use instead of ChatOpenAI
+            driver: Neo4j driver (or compatible stand-in) to use instead of
+                connecting to NEO4J_URI
+            retrieval_config: Chunking, k, index and reranking settings
+                (defaults to the file at RETRIEVAL_CONFIG, see rag/retrieval.py)
+        """
+        self.tracer = get_tracer()
+        self.retrieval_config = retrieval_config or RetrievalConfig.from_env()
         self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        if not self.openai_api_key:
+        if not self.openai_api_key and (embeddings is None or llm is None):
             raise ValueError("OpenAI API key required. Set OPENAI_API_KEY environment variable.")
         
         # Neo4j connection
-        self.neo4j_uri = "bolt://localhost:7687"
+        self.neo4j_uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
         self.neo4j_user = os.getenv("NEO4J_USER", "neo4j")
         self.neo4j_password = os.getenv("NEO4J_PASSWORD", "password")
-        self.driver = GraphDatabase.driver(self.neo4j_uri, auth=(self.neo4j_user, self.neo4j_password))
+        if driver is None:
+            from neo4j import GraphDatabase
+            driver = GraphDatabase.driver(self.neo4j_uri, auth=(self.neo4j_user, self.neo4j_password))
+        self.driver = driver
+        
+        # QA-side reads go through a cache that is invalidated when an ingest
+        # run bumps the graph version
+        self.graph_cache = GraphQueryCache(
+            self.driver,
+            max_entries=int(os.getenv("GRAPH_QUERY_CACHE_SIZE", "1024")),
+            path=os.getenv("GRAPH_QUERY_CACHE_PATH"),
+            version_ttl=float(os.getenv("GRAPH_VERSION_TTL", "5"))
+        )
+        self.graph_reader = CachedDriver(self.driver, self.graph_cache)
+        
+        # Graph statistics are served from a cached snapshot refreshed in the background
+        self.graph_stats = CachedGraphStats(
+            GraphStatsCollector(self.graph_reader),
+            ttl=float(os.getenv("GRAPH_STATS_TTL", "60"))
+        )
+        
+        # Entity linking; the trigram index is built on first use
+        self.entity_resolver = EntityResolver(self.graph_reader)
+        self._resolver_lock = threading.Lock()
+        
+        # Interaction checks read the CSR snapshot when one has been exported
+        snapshot_dir = os.getenv("GRAPH_SNAPSHOT_DIR")
+        self.interaction_checker = InteractionChecker(
+            self.graph_reader, SnapshotStore(snapshot_dir) if snapshot_dir else None,
+            resolver=self.entity_resolver)
         
         # LangChain components
-        self.embeddings = OpenAIEmbeddings(openai_api_key=self.openai_api_key)
-        self.llm = ChatOpenAI(
+        if embeddings is None or llm is None:
+            from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+        self.embeddings = embeddings or OpenAIEmbeddings(openai_api_key=self.openai_api_key)
+        self.llm = llm or ChatOpenAI(
             model="gpt-4o-mini",
             temperature=0.1,
             openai_api_key=self.openai_api_key
         )
         
+        # All generations from ask() go through the gateway
+        self.llm_gateway = LLMGateway(
+            self.llm,
+            requests_per_minute=_env_int("LLM_REQUESTS_PER_MINUTE"),
+            tokens_per_minute=_env_int("LLM_TOKENS_PER_MINUTE"),
+            max_retries=int(os.getenv("LLM_MAX_RETRIES", "3")),
+            hedge=os.getenv("LLM_HEDGE", "0") == "1",
+            max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+        )
+        
+        # Sources retrieved speculatively while a UI user is still typing
+        self.prefetch_cache = PrefetchCache(
+            ttl=float(os.getenv("PREFETCH_TTL_SECONDS", "120")),
+            min_similarity=float(os.getenv("PREFETCH_MIN_SIMILARITY", "0.8"))
+        )
+        
+        # Facts per list (treats, side effects, ...) written into a document
+        self.max_facts = int(os.getenv("DOC_MAX_FACTS", "20"))
+        
         self.vector_store = None
+        self.filtered_index = None
         self.qa_chain = None
+        self._started = time.monotonic()
+        self.progress = {'stage': 'idle', 'done': 0, 'total': 0, 'elapsed_seconds': 0.0}
         
         # Custom prompt for medical QA
+        from langchain.prompts import PromptTemplate
         self.prompt_template = PromptTemplate(
             input_variables=["context", "question"],
             template="""You are a helpful medical information assistant. Use the following medical knowledge to answer the question. 
@@ -62,26 +166,52 @@ Question: {question}
 Answer: Provide a clear, accurate answer based on the medical knowledge provided. If the information is incomplete or you're unsure, state that clearly and recommend consulting a healthcare professional.
 """
         )
+        
+        # Answers precomputed offline by rag/answer_store.py for common entity
+        # questions; loaded last so they can be checked against these settings
+        self.answer_store = load_answer_store(os.getenv("ANSWER_STORE_PATH"), pipeline_signature(self))
     
-    def _extract_documents_from_neo4j(self) -> List[Document]:
+    def _report(self, stage: str, done: int = 0, total: int = 0, eta_seconds: float = None):
+        """Publish initialization progress; the dict is replaced whole so readers never see it half-updated"""
+        if stage in ('loading', 'extracting'):
+            self._started = time.monotonic()
+        self.progress = {'stage': stage, 'done': done, 'total': total,
+                         'elapsed_seconds': round(time.monotonic() - self._started, 2),
+                         'eta_seconds': eta_seconds}
+    
+    def _extract_documents_from_neo4j(self) -> List["Document"]:
         """
         Extract documents from Neo4j knowledge graph
         """
+        from langchain.schema import Document
+        
         documents = []
         
-        with self.driver.session() as session:
-            # Extract drug information
+        with self.graph_reader.session() as session:
+            # Extract drug information; facts are ordered by the score
+            # graph/centrality.py writes, edges it has not scored yet after
+            # the scored ones by confidence, and capped at DOC_MAX_FACTS per
+            # list. Each fact keeps the confidence of its own best edge.
             drug_query = """
             MATCH (d:Drug)
-            OPTIONAL MATCH (d)-[:TREATS]->(disease:Disease)
-            OPTIONAL MATCH (d)-[:CAUSES]->(symptom:Symptom)
-            RETURN d.name as drug_name, d.description as description,
-                   collect(DISTINCT disease.name) as treats,
-                   collect(DISTINCT symptom.name) as side_effects
+            OPTIONAL MATCH (d)-[t:TREATS]->(disease:Disease)
+            WITH d, disease.name AS name, max(t.score) AS score, max(t.confidence) AS confidence
+            ORDER BY score IS NULL, score DESC, confidence DESC
+            WITH d, collect(CASE WHEN name IS NOT NULL
+                                 THEN {name: name, confidence: confidence} END)[..$max_facts] as treat_facts
+            OPTIONAL MATCH (d)-[c:CAUSES]->(symptom:Symptom)
+            WITH d, treat_facts, symptom.name AS name, max(c.score) AS score, max(c.confidence) AS confidence
+            ORDER BY score IS NULL, score DESC, confidence DESC
+            WITH d, treat_facts, collect(CASE WHEN name IS NOT NULL
+                                              THEN {name: name, confidence: confidence} END)[..$max_facts] as effect_facts
+            RETURN d.id as drug_id, d.name as drug_name, d.description as description,
+                   d.fda_approved as fda_approved,
+                   [f IN treat_facts | f.name] as treats, [f IN effect_facts | f.name] as side_effects,
+                   [f IN treat_facts + effect_facts | f.confidence] as confidences
             LIMIT 1000
             """
             
-            result = session.run(drug_query)
+            result = session.run(drug_query, max_facts=self.max_facts)
             for record in result:
                 drug_name = record['drug_name']
                 description = record['description'] or ""
@@ -100,6 +230,9 @@ Answer: Provide a clear, accurate answer based on the medical knowledge provided
                     page_content=text,
                     metadata={
                         'type': 'drug',
+                        'source': 'fda' if record.get('fda_approved') else 'extracted',
+                        'confidence': _min_confidence(record.get('confidences')),
+                        'id': record.get('drug_id') or drug_name,
                         'name': drug_name,
                         'treats': treats,
                         'side_effects': side_effects
@@ -110,15 +243,25 @@ Answer: Provide a clear, accurate answer based on the medical knowledge provided
             # Extract disease information
             disease_query = """
             MATCH (disease:Disease)
-            OPTIONAL MATCH (drug:Drug)-[:TREATS]->(disease)
-            OPTIONAL MATCH (disease)-[:HAS_SYMPTOM]->(symptom:Symptom)
-            RETURN disease.name as disease_name, disease.description as description,
-                   collect(DISTINCT drug.name) as treatments,
-                   collect(DISTINCT symptom.name) as symptoms
+            OPTIONAL MATCH (drug:Drug)-[t:TREATS]->(disease)
+            WITH disease, drug.name AS name, max(t.score) AS score, max(t.confidence) AS confidence
+            ORDER BY score IS NULL, score DESC, confidence DESC
+            WITH disease, collect(CASE WHEN name IS NOT NULL
+                                       THEN {name: name, confidence: confidence} END)[..$max_facts] as treat_facts
+            OPTIONAL MATCH (disease)-[h:HAS_SYMPTOM]->(symptom:Symptom)
+            WITH disease, treat_facts, symptom.name AS name, max(h.score) AS score,
+                 max(h.confidence) AS confidence
+            ORDER BY score IS NULL, score DESC, confidence DESC
+            WITH disease, treat_facts, collect(CASE WHEN name IS NOT NULL
+                                                    THEN {name: name, confidence: confidence} END)[..$max_facts] as symptom_facts
+            RETURN disease.id as disease_id, disease.name as disease_name,
+                   disease.description as description,
+                   [f IN treat_facts | f.name] as treatments, [f IN symptom_facts | f.name] as symptoms,
+                   [f IN treat_facts + symptom_facts | f.confidence] as confidences
             LIMIT 1000
             """
             
-            result = session.run(disease_query)
+            result = session.run(disease_query, max_facts=self.max_facts)
             for record in result:
                 disease_name = record['disease_name']
                 description = record['description'] or ""
@@ -137,6 +280,9 @@ Answer: Provide a clear, accurate answer based on the medical knowledge provided
                     page_content=text,
                     metadata={
                         'type': 'disease',
+                        'source': 'extracted',
+                        'confidence': _min_confidence(record.get('confidences')),
+                        'id': record.get('disease_id') or disease_name,
                         'name': disease_name,
                         'treatments': treatments,
                         'symptoms': symptoms
@@ -147,48 +293,272 @@ Answer: Provide a clear, accurate answer based on the medical knowledge provided
         logger.info(f"Extracted {len(documents)} documents from Neo4j")
         return documents
     
-    def initialize(self, documents_file: str = None):
-        """
-        Initialize the QA system
-        """
-        logger.info("Initializing Medical QA System...")
+    def save_index(self, index_dir: str):
+        """Write the FAISS index and the columnar docstore to a directory"""
+        import faiss
+        from rag.docstore import ColumnarDocstore
         
-        # Extract documents from Neo4j
-        documents = self._extract_documents_from_neo4j()
+        Path(index_dir).mkdir(parents=True, exist_ok=True)
+        docstore = self.vector_store.docstore
+        if not isinstance(docstore, ColumnarDocstore):
+            docstore = ColumnarDocstore.from_documents(
+                [docstore.search(self.vector_store.index_to_docstore_id[i])
+                 for i in range(self.vector_store.index.ntotal)])
+        faiss.write_index(self.vector_store.index, str(Path(index_dir) / "index.faiss"))
+        docstore.save(Path(index_dir) / "docstore")
+        self.retrieval_config.save(Path(index_dir) / "retrieval.json")
+        logger.info(f"Saved vector index to {index_dir}")
+    
+    def load_index(self, index_dir: str, mmap: bool = True):
+        """
+        Load an index written by ``save_index``
         
-        if not documents:
-            raise ValueError("No documents found in Neo4j database")
+        Directories from older versions, with a pickled docstore in
+        ``index.pkl``, are still read.
         
-        # Split documents
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50
-        )
-        split_docs = text_splitter.split_documents(documents)
+        Args:
+            index_dir: Index directory
+            mmap: Memory-map the vectors and docstore read-only, so processes
+                loading the same index share one copy through the page cache
+        """
+        import faiss
+        from langchain_community.vectorstores import FAISS
+        from rag.docstore import ColumnarDocstore
+        from rag.filtered_index import FilteredIndex
         
-        # Create vector store
-        self.vector_store = FAISS.from_documents(split_docs, self.embeddings)
-        logger.info(f"Built vector store with {len(split_docs)} document chunks")
+        self._report('loading')
+        flags = 0
+        if mmap:
+            flags = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        index = faiss.read_index(str(Path(index_dir) / "index.faiss"), flags)
+        built_with = load_index_config(index_dir)
+        if built_with and built_with.build_signature() != self.retrieval_config.build_signature():
+            logger.warning(f"Index in {index_dir} was built with {built_with.describe()}; "
+                           f"rebuild it to apply {self.retrieval_config.describe()}")
+        self.retrieval_config.apply_search_params(index)
+        if (Path(index_dir) / "docstore").exists():
+            docstore = ColumnarDocstore.load(Path(index_dir) / "docstore", mmap=mmap)
+            index_to_docstore_id = docstore.index_to_docstore_id
+        else:
+            with open(Path(index_dir) / "index.pkl", 'rb') as f:
+                docstore, index_to_docstore_id = pickle.load(f)
+        self.vector_store = FAISS(self.embeddings, index, docstore, index_to_docstore_id)
+        self.filtered_index = FilteredIndex(self.vector_store)
+        self.prefetch_cache.clear()
+        self._build_chain()
+        self._report('ready', index.ntotal, index.ntotal)
+        logger.info(f"Loaded vector index with {index.ntotal} vectors from {index_dir}")
+    
+    def _build_chain(self):
+        from langchain.chains import RetrievalQA
         
-        # Create QA chain
         self.qa_chain = RetrievalQA.from_chain_type(
             llm=self.llm,
             chain_type="stuff",
-            retriever=self.vector_store.as_retriever(search_kwargs={"k": 5}),
+            retriever=self.vector_store.as_retriever(search_kwargs={"k": self.retrieval_config.k}),
             chain_type_kwargs={
                 "prompt": self.prompt_template
             },
             return_source_documents=True
         )
+    
+    @profile_entry("initialize")
+    def initialize(self, documents_file: str = None, index_dir: str = None):
+        """
+        Initialize the QA system
+        
+        Set MEDIGRAPH_PROFILE=1 to capture a flame graph and allocation report.
+        Progress is published in ``self.progress`` (see STAGES) so a caller
+        running this on a background thread can poll it.
+        
+        Args:
+            documents_file: Unused; documents are extracted from Neo4j
+            index_dir: Load the index from here if it exists, otherwise
+                build it and save it here
+        """
+        if index_dir and (Path(index_dir) / "index.faiss").exists():
+            self.graph_stats.refresh_async()
+            self.load_index(index_dir)
+            return
+        
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        from langchain_community.vectorstores import FAISS
+        from rag.docstore import ColumnarDocstore
+        from rag.filtered_index import FilteredIndex
+        from rag.index_builder import IndexBuilder
+        
+        logger.info("Initializing Medical QA System...")
+        self._report('extracting')
+        
+        # Warm the stats snapshot while documents are being extracted
+        self.graph_stats.refresh_async()
         
+        with self.tracer.span("qa.initialize") as init_span:
+            # Extract documents from Neo4j
+            with self.tracer.span("qa.extract_documents") as span:
+                documents = self._extract_documents_from_neo4j()
+                span.set('documents', len(documents))
+            
+            if not documents:
+                raise ValueError("No documents found in Neo4j database")
+            
+            # Split documents
+            self._report('splitting', 0, len(documents))
+            with self.tracer.span("qa.split_documents") as span:
+                text_splitter = RecursiveCharacterTextSplitter(
+                    chunk_size=self.retrieval_config.chunk_size,
+                    chunk_overlap=self.retrieval_config.chunk_overlap
+                )
+                split_docs = text_splitter.split_documents(documents)
+                span.set('chunks', len(split_docs))
+            
+            # Embed length-sorted batches concurrently, adding vectors as batches finish
+            builder = IndexBuilder(
+                self.embeddings,
+                workers=int(os.getenv("EMBED_WORKERS", "4")),
+                max_batch_texts=int(os.getenv("EMBED_BATCH_SIZE", "256")),
+                max_batch_chars=int(os.getenv("EMBED_BATCH_CHARS", "100000")),
+                requests_per_minute=_env_int("EMBED_REQUESTS_PER_MINUTE"),
+                tokens_per_minute=_env_int("EMBED_TOKENS_PER_MINUTE")
+            )
+            with self.tracer.span("qa.embed_documents", chunks=len(split_docs)) as span:
+                index, order = builder.build(
+                    [doc.page_content for doc in split_docs],
+                    on_progress=lambda done, total, eta: self._report('embedding', done, total, eta))
+                span.set('batches', builder.stats['batches'])
+            self._report('indexing', len(split_docs), len(split_docs))
+            with self.tracer.span("qa.build_index", chunks=len(split_docs)) as span:
+                # Chunks are packed into flat arrays, in index row order; Documents
+                # are rebuilt per search hit
+                docstore = ColumnarDocstore.from_documents([split_docs[i] for i in order])
+                span.set('docstore_bytes', docstore.nbytes)
+                index = self.retrieval_config.build_index(index)
+                span.set('index_type', self.retrieval_config.index)
+                self.vector_store = FAISS(self.embeddings, index, docstore,
+                                          docstore.index_to_docstore_id)
+                self.filtered_index = FilteredIndex(self.vector_store)
+                self.prefetch_cache.clear()
+            logger.info(f"Built vector store with {len(split_docs)} document chunks")
+            init_span.set('chunks', len(split_docs))
+        
+        # Create QA chain
+        self._build_chain()
+        if index_dir:
+            self._report('saving', len(split_docs), len(split_docs))
+            self.save_index(index_dir)
+        
+        self._report('ready', len(split_docs), len(split_docs))
         logger.info("Medical QA System initialized successfully")
     
-    def ask(self, question: str) -> Dict[str, Any]:
+    def _search(self, question: str, filters: Dict[str, Any]) -> List["Document"]:
+        """Embed the question and search (and optionally rerank) the index"""
+        config = self.retrieval_config
+        with self.tracer.span("qa.embed_query"):
+            query_vector = self.embeddings.embed_query(question)
+        
+        fetch = max(config.k, config.rerank_candidates) if config.rerank else config.k
+        with self.tracer.span("qa.vector_search", filtered=bool(filters)) as span:
+            docs = self.filtered_index.search(query_vector, k=fetch, **filters)
+            span.set('chunks', len(docs))
+        
+        if config.rerank:
+            with self.tracer.span("qa.rerank", candidates=len(docs)):
+                docs = lexical_rerank(question, docs, config.k, config.rerank_weight)
+        return docs
+    
+    def _retrieve(self, question: str, filters: Dict[str, Any], session_id: Optional[str] = None):
+        """
+        Find sources and build the prompt
+        
+        With a ``session_id``, sources prefetched for a close enough question
+        in that session are reused instead of searching again.
+        
+        Returns:
+            (documents, prompt, whether the documents were prefetched)
+        """
+        docs = None
+        if session_id:
+            docs = self.prefetch_cache.take(session_id, question, filters)
+        prefetched = docs is not None
+        if not prefetched:
+            docs = self._search(question, filters)
+        
+        with self.tracer.span("qa.build_prompt", prefetched=prefetched) as span:
+            context = "\n\n".join(doc.page_content for doc in docs)
+            prompt = self.prompt_template.format(context=context, question=question)
+            span.set('prompt_chars', len(prompt))
+        return docs, prompt, prefetched
+    
+    def prefetch(self, question: str, session_id: str, types: Optional[List[str]] = None,
+                 sources: Optional[List[str]] = None,
+                 min_confidence: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Retrieve sources for a question that is still being typed
+        
+        Retrieval only, no LLM call. The sources are kept for ``session_id``
+        so that ``ask`` with the same session and a matching question skips
+        straight to generation.
+        
+        Args:
+            question: Question text so far
+            session_id: UI session key
+            types, sources, min_confidence: Retrieval filters, as for ``ask``
+            
+        Returns:
+            Dictionary with the question and the sources found
+        """
+        if not self.qa_chain:
+            raise ValueError("QA system not initialized. Call initialize() first.")
+        
+        filters = _filters(types, sources, min_confidence)
+        with self.tracer.span("qa.prefetch") as span:
+            docs = self._search(question, filters)
+            span.set('sources', len(docs))
+        self.prefetch_cache.put(session_id, question, filters, docs)
+        return {'question': question, 'session_id': session_id,
+                'source_documents': self._source_documents(docs)}
+    
+    def _generate(self, prompt: str):
+        with self.tracer.span("qa.llm") as span:
+            message = self.llm_gateway.invoke(prompt)
+            usage = getattr(message, 'usage_metadata', None) or {}
+            span.set('prompt_tokens', usage.get('input_tokens', len(prompt) // 4))
+            span.set('completion_tokens', usage.get('output_tokens', 0))
+        return message
+    
+    def _precomputed(self, question: str, filters: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Stored answer for an unfiltered question, if one is valid for the live graph version"""
+        if self.answer_store is None or filters:
+            return None
+        with self.tracer.span("qa.precomputed") as span:
+            entry = self.answer_store.get(question, self.graph_cache.version() or '')
+            span.set('hit', entry is not None)
+        return entry
+    
+    @staticmethod
+    def _source_documents(docs: List["Document"]) -> List[Dict[str, Any]]:
+        return [{'content': doc.page_content, 'metadata': doc.metadata} for doc in docs]
+    
+    def ask(self, question: str, types: Optional[List[str]] = None,
+            sources: Optional[List[str]] = None,
+            min_confidence: Optional[float] = None,
+            session_id: Optional[str] = None,
+            use_precomputed: bool = True) -> Dict[str, Any]:
         """
         Ask a medical question
         
+        Runs the same retrieve-then-stuff flow as the RetrievalQA chain, but
+        stage by stage so each one can be traced.
+        
         Args:
             question: Medical question
+            types: Only retrieve chunks of these types (drug, disease)
+            sources: Only retrieve chunks from these sources (fda, extracted)
+            min_confidence: Only retrieve chunks whose facts all have at
+                least this confidence
+            session_id: UI session whose ``prefetch`` results may be reused
+            use_precomputed: Serve a matching answer from the answer store
+                (unfiltered questions only)
             
         Returns:
             Dictionary with answer and source documents
@@ -198,49 +568,138 @@ Answer: Provide a clear, accurate answer based on the medical knowledge provided
         
         logger.info(f"Processing question: {question}")
         
-        # Get response from QA chain
-        response = self.qa_chain({"query": question})
+        filters = _filters(types, sources, min_confidence)
+        entry = self._precomputed(question, filters) if use_precomputed else None
+        if entry is not None:
+            logger.info(f"Served precomputed answer {entry['key']}")
+            return {'answer': entry['answer'], 'source_documents': entry['source_documents'],
+                    'question': question, 'prefetched': False, 'precomputed': True}
         
-        # Format source documents
-        source_documents = []
-        for doc in response.get('source_documents', []):
-            source_documents.append({
-                'content': doc.page_content,
-                'metadata': doc.metadata
-            })
+        with self.tracer.span("qa.ask") as ask_span:
+            docs, prompt, prefetched = self._retrieve(question, filters, session_id)
+            message = self._generate(prompt)
+            ask_span.set('sources', len(docs))
+            ask_span.set('prefetched', prefetched)
         
         result = {
-            'answer': response['result'],
-            'source_documents': source_documents,
-            'question': question
+            'answer': message.content,
+            'source_documents': self._source_documents(docs),
+            'question': question,
+            'prefetched': prefetched,
+            'precomputed': False
         }
         
-        logger.info(f"Generated answer with {len(source_documents)} sources")
+        logger.info(f"Generated answer with {len(docs)} sources")
         return result
     
-    def get_system_stats(self) -> Dict[str, Any]:
+    def ask_stream(self, question: str, types: Optional[List[str]] = None,
+                   sources: Optional[List[str]] = None,
+                   min_confidence: Optional[float] = None,
+                   session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Ask a medical question, yielding results as they become available
+        
+        Sources are yielded as soon as retrieval finishes, before the LLM call;
+        a precomputed answer is yielded right after its sources.
+        
+        Args:
+            question: Medical question
+            types, sources, min_confidence: Retrieval filters, as for ``ask``
+            session_id: UI session whose ``prefetch`` results may be reused
+            
+        Yields:
+            ``{'event': 'sources', ...}`` then ``{'event': 'answer', ...}``
+        """
+        if not self.qa_chain:
+            raise ValueError("QA system not initialized. Call initialize() first.")
+        
+        filters = _filters(types, sources, min_confidence)
+        entry = self._precomputed(question, filters)
+        if entry is not None:
+            yield {'event': 'sources', 'question': question, 'prefetched': False, 'precomputed': True,
+                   'source_documents': entry['source_documents']}
+            yield {'event': 'answer', 'answer': entry['answer']}
+            return
+        
+        with self.tracer.span("qa.ask", stream=True) as ask_span:
+            docs, prompt, prefetched = self._retrieve(question, filters, session_id)
+            ask_span.set('sources', len(docs))
+            yield {'event': 'sources', 'question': question, 'prefetched': prefetched,
+                   'precomputed': False, 'source_documents': self._source_documents(docs)}
+            message = self._generate(prompt)
+        yield {'event': 'answer', 'answer': message.content}
+    
+    def resolve_entity(self, text: str, labels: Optional[List[str]] = None,
+                       limit: int = 10) -> List[Dict[str, Any]]:
+        """
+        Link a typed (possibly misspelled or brand) name to graph nodes
+        
+        Args:
+            text: Name as typed
+            labels: Restrict to these node labels
+            limit: Maximum candidates
+            
+        Returns:
+            Candidate nodes with similarity scores, best first
+        """
+        with self._resolver_lock:
+            if not self.entity_resolver.ready:
+                with self.tracer.span("qa.entity_index"):
+                    self.entity_resolver.refresh()
+        with self.tracer.span("qa.resolve_entity") as span:
+            candidates = self.entity_resolver.resolve(text, labels=labels, limit=limit)
+            span.set('candidates', len(candidates))
+        return candidates
+    
+    def check_interactions(self, drugs: List[str]) -> Dict[str, Any]:
+        """
+        Check a list of drugs for pairwise and ingredient-level interactions
+        
+        Answered from INTERACTS_WITH edges without the vector store or LLM.
+        
+        Args:
+            drugs: Drug names (brand or generic)
+            
+        Returns:
+            Dictionary with resolved drugs and ranked interactions
+        """
+        with self.tracer.span("qa.check_interactions", drugs=len(drugs)) as span:
+            result = self.interaction_checker.check(drugs)
+            span.set('interactions', len(result['interactions']))
+        
+        logger.info(f"Checked {result['pairs_checked']} drug pairs, "
+                    f"found {len(result['interactions'])} interactions")
+        return result
+    
+    def get_system_stats(self, refresh: bool = False) -> Dict[str, Any]:
         """
         Get system statistics
+        
+        Graph counts come from a cached snapshot and never wait on Neo4j;
+        a stale snapshot is refreshed in the background.
+        
+        Args:
+            refresh: Trigger a background refresh even if the snapshot is fresh
         """
+        with self.tracer.span("qa.system_stats") as span:
+            if refresh:
+                self.graph_stats.refresh_async()
+            span.set('cache_hit', not self.graph_stats.is_stale())
+            graph_stats = self.graph_stats.get()
+        
         stats = {
-            'neo4j_connected': False,
+            'neo4j_connected': graph_stats['connected'],
             'vector_store_ready': self.vector_store is not None,
             'qa_chain_ready': self.qa_chain is not None,
-            'total_nodes': 0,
-            'total_documents': 0
+            'total_nodes': graph_stats.get('total_nodes', 0),
+            'total_documents': 0,
+            'stats_age_seconds': graph_stats['age_seconds'],
+            'llm_gateway': self.llm_gateway.stats(),
+            'graph_query_cache': self.graph_cache.stats(),
+            'prefetch': self.prefetch_cache.stats(),
+            'answer_store': self.answer_store.stats() if self.answer_store else None
         }
         
-        # Check Neo4j connection
-        try:
-            with self.driver.session() as session:
-                result = session.run("MATCH (n) RETURN count(n) as count")
-                record = result.single()
-                if record:
-                    stats['total_nodes'] = record['count']
-                    stats['neo4j_connected'] = True
-        except Exception as e:
-            logger.warning(f"Failed to get Neo4j stats: {e}")
-        
         # Get vector store info
         if self.vector_store:
             stats['total_documents'] = self.vector_store.index.ntotal
@@ -251,8 +710,6 @@ def main():
     """
     Test the Medical QA System
     """
-    import time
-    
     qa_system = MedicalQASystem()
     
     print("Initializing system...")
@@ -278,6 +735,10 @@ def main():
         print(f"Sources: {len(response['source_documents'])}")
         print(f"Response time: {response_time:.2f} seconds")
         print("-" * 50)
+    
+    # Per-stage latency percentiles (enable with MEDIGRAPH_TRACE=1)
+    if qa_system.tracer.enabled:
+        qa_system.tracer.flush()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,206 @@
+# Retrieval settings (chunking, k, vector index type, reranking) and their FAISS plumbing
+import json
+import logging
+import math
+import os
+import re
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    from langchain.schema import Document
+
+logger = logging.getLogger(__name__)
+
+INDEX_TYPES = ('flat', 'hnsw', 'ivf')
+# Fields that shape the stored chunks and index; the rest only affect search
+BUILD_FIELDS = ('chunk_size', 'chunk_overlap', 'index', 'hnsw_m', 'ef_construction', 'nlist')
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset("""
+a an and are can could do does for from how i in is it me my of on or the to what which who why
+with when where should would be been take taking used use
+""".split())
+
+
+@dataclass
+class RetrievalConfig:
+    """
+    How chunks are cut, indexed and retrieved
+
+    The defaults reproduce the original fixed settings (500/50 character
+    chunks, exact flat L2 index, top 5, no reranking).
+    scripts/autotune_retrieval.py writes tuned values as JSON that ``load``
+    reads; set RETRIEVAL_CONFIG to that file to use it.
+    """
+    chunk_size: int = 500
+    chunk_overlap: int = 50
+    k: int = 5
+    index: str = 'flat'  # 'flat', 'hnsw' or 'ivf'
+    hnsw_m: int = 32
+    ef_construction: int = 40
+    ef_search: int = 64
+    nlist: int = 0  # IVF cells; 0 picks one from the corpus size
+    nprobe: int = 8
+    rerank: bool = False
+    rerank_candidates: int = 20
+    rerank_weight: float = 0.5
+
+    def __post_init__(self):
+        if self.index not in INDEX_TYPES:
+            raise ValueError(f"Unknown index type {self.index!r}; choose from {', '.join(INDEX_TYPES)}")
+        if not 0 <= self.chunk_overlap < self.chunk_size:
+            raise ValueError("chunk_overlap must be smaller than chunk_size")
+        if self.k < 1:
+            raise ValueError("k must be at least 1")
+
+    # -- persistence -------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def save(self, path: str, **extra):
+        """Write the config as JSON; ``extra`` keys (e.g. tuning metrics) are stored alongside"""
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        Path(path).write_text(json.dumps(dict(self.to_dict(), **extra), indent=2), encoding='utf-8')
+
+    @classmethod
+    def load(cls, path: str) -> 'RetrievalConfig':
+        """Read a config written by ``save``; keys that are not settings are ignored"""
+        data = json.loads(Path(path).read_text(encoding='utf-8'))
+        known = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in known})
+
+    @classmethod
+    def from_env(cls) -> 'RetrievalConfig':
+        """The config at RETRIEVAL_CONFIG, or the defaults"""
+        path = os.getenv("RETRIEVAL_CONFIG")
+        if not path:
+            return cls()
+        if not Path(path).exists():
+            logger.warning(f"RETRIEVAL_CONFIG {path} not found; using default retrieval settings")
+            return cls()
+        config = cls.load(path)
+        logger.info(f"Loaded retrieval config from {path}: {config.describe()}")
+        return config
+
+    def build_signature(self) -> Dict[str, Any]:
+        """Settings baked into a built index; changing them needs a rebuild"""
+        return {name: getattr(self, name) for name in BUILD_FIELDS}
+
+    def describe(self) -> str:
+        index = {'flat': 'flat',
+                 'hnsw': f"hnsw(M={self.hnsw_m}, ef={self.ef_search})",
+                 'ivf': f"ivf(nlist={self.nlist or 'auto'}, nprobe={self.nprobe})"}[self.index]
+        return (f"chunks {self.chunk_size}/{self.chunk_overlap}, k={self.k}, {index}, "
+                f"rerank {'on' if self.rerank else 'off'}")
+
+    # -- FAISS -------------------------------------------------------------
+
+    def build_index(self, flat):
+        """
+        Index of the configured type holding the vectors of a flat index
+
+        Args:
+            flat: ``IndexFlatL2`` as built by IndexBuilder
+
+        Returns:
+            ``flat`` itself for 'flat', else a new HNSW or IVF index with the
+            same vectors in the same row order
+        """
+        import faiss
+
+        if self.index == 'flat' or flat.ntotal == 0:
+            return flat
+        vectors = flat.reconstruct_n(0, flat.ntotal)
+        if self.index == 'hnsw':
+            index = faiss.IndexHNSWFlat(flat.d, self.hnsw_m)
+            index.hnsw.efConstruction = self.ef_construction
+        else:
+            # FAISS wants ~39 training points per cell
+            nlist = self.nlist or int(4 * math.sqrt(flat.ntotal))
+            nlist = max(1, min(nlist, flat.ntotal // 39 or 1))
+            index = faiss.index_factory(flat.d, f"IVF{nlist},Flat")
+            index.train(vectors)
+        index.add(vectors)
+        self.apply_search_params(index)
+        return index
+
+    def apply_search_params(self, index):
+        """Set efSearch / nprobe on an HNSW / IVF index"""
+        import faiss
+
+        if isinstance(index, faiss.IndexHNSW):
+            index.hnsw.efSearch = max(self.ef_search, self.k)
+        elif isinstance(index, faiss.IndexIVF):
+            index.nprobe = min(self.nprobe, index.nlist)
+
+
+def search_parameters(index, selector):
+    """FAISS search parameters carrying ``selector``, of the type the index expects"""
+    import faiss
+
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nprobe)
+    if isinstance(index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def exhaustive_search_parameters(index, selector):
+    """
+    Search parameters visiting every vector ``selector`` admits, or None
+
+    IVF search is exact once it probes every list. HNSW has no such setting:
+    a filtered walk can still run out of admitted neighbours, so callers
+    search the selected rows exactly instead (None).
+    """
+    import faiss
+
+    if isinstance(index, faiss.IndexIVF):
+        return faiss.SearchParametersIVF(sel=selector, nprobe=index.nlist)
+    if isinstance(index, faiss.IndexHNSW):
+        return None
+    return faiss.SearchParameters(sel=selector)
+
+
+def content_terms(text: str) -> set:
+    """Lower-cased words of a text without question stopwords"""
+    return set(TOKEN_PATTERN.findall(text.lower())) - STOPWORDS
+
+
+def lexical_rerank(question: str, docs: List["Document"], k: int,
+                   weight: float = 0.5) -> List["Document"]:
+    """
+    Reorder vector-search candidates by how many question terms they contain
+
+    The score blends the share of the question's content words found in a
+    chunk's text or its node name with the chunk's vector-search rank, so a
+    chunk naming the asked-about entity moves ahead of near-miss neighbours.
+
+    Args:
+        question: User question
+        docs: Candidates, nearest first
+        k: Chunks to keep
+        weight: Share of the score given to term overlap (0 keeps vector order)
+
+    Returns:
+        Top k candidates, best first
+    """
+    terms = content_terms(question)
+    if not terms or not docs:
+        return docs[:k]
+    scored = []
+    for rank, doc in enumerate(docs):
+        overlap = len(terms & content_terms(f"{doc.page_content} {doc.metadata.get('name', '')}")) / len(terms)
+        prior = 1.0 - rank / len(docs)
+        scored.append((weight * overlap + (1.0 - weight) * prior, -rank, doc))
+    scored.sort(key=lambda item: item[:2], reverse=True)
+    return [doc for _, _, doc in scored[:k]]
+
+
+def load_index_config(index_dir: str) -> Optional[RetrievalConfig]:
+    """Config an index directory was built with, if recorded"""
+    path = Path(index_dir) / "retrieval.json"
+    return RetrievalConfig.load(path) if path.exists() else None
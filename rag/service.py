@@ -0,0 +1,436 @@
+# ASGI HTTP service exposing MedicalQASystem to many clients
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import parse_qs
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+MAX_BATCH = 32
+WARMUP_QUESTION = "What is metformin used for?"
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def _default_factory():
+    from rag.qa_chain import MedicalQASystem
+    return MedicalQASystem()
+
+
+class QAService:
+    """
+    ASGI application serving ask, batch ask, streaming ask, interaction
+    checks, stats and health endpoints.
+
+    Blocking QA calls run on a bounded thread pool. When more than
+    ``max_pending`` calls are queued or running, new requests get 503 with
+    Retry-After instead of queueing without bound, and every call is
+    answered with 504 once it exceeds ``timeout``. The QA system is built in
+    the background at startup; ``/ready`` reports ready only once the index
+    is loaded and a warm-up query has run, so a load balancer does not route
+    to a cold worker.
+
+    Endpoints:
+        GET  /health           liveness
+        GET  /ready            200 once warm, 503 before; includes build progress
+        GET  /stats            system and service statistics (``?refresh=1``)
+        POST /ask              {"question": ...}
+        POST /ask/batch        {"questions": [...]}
+        POST /ask/stream       {"question": ...}; NDJSON sources then answer
+        POST /prefetch         {"question": ..., "session_id": ...}; retrieval only
+        POST /interactions     {"drugs": [...]}
+        POST /resolve          {"text": ..., "labels": [...], "limit": 10}
+
+    The ask endpoints accept optional retrieval filters ``types``,
+    ``sources`` and ``min_confidence`` (see MedicalQASystem.ask). /ask and
+    /ask/stream also take the ``session_id`` used for /prefetch, and reuse
+    its sources when the submitted question matches. Prefetch results live
+    in the worker that served them, so with several workers a submit on
+    another worker just retrieves again. Prefetches are speculative and are
+    turned away with 503 once half of ``max_pending`` is in use, so they
+    never crowd out real questions.
+    """
+
+    def __init__(self, factory: Callable[[], Any] = None, index_dir: Optional[str] = None,
+                 threads: int = 8, max_pending: Optional[int] = None, timeout: float = 60.0):
+        """
+        Args:
+            factory: Returns an uninitialized MedicalQASystem
+            index_dir: Shared index directory passed to ``initialize``
+            threads: QA calls running at once
+            max_pending: Queued plus running calls before shedding load
+                (defaults to four per thread)
+            timeout: Seconds before a request is answered with 504
+        """
+        self.factory = factory or _default_factory
+        self.index_dir = index_dir
+        self.threads = threads
+        self.max_pending = max_pending or threads * 4
+        self.timeout = timeout
+        self.qa_system = None
+        self.state = 'starting'
+        self.error = None
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="qa-service")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._warm_thread = None
+        self.counters = {'requests': 0, 'rejected': 0, 'timeouts': 0, 'errors': 0,
+                         'prefetch_shed': 0}
+        self.routes = {
+            ('GET', '/health'): self.health,
+            ('GET', '/ready'): self.ready,
+            ('GET', '/stats'): self.stats,
+            ('POST', '/ask'): self.ask,
+            ('POST', '/ask/batch'): self.ask_batch,
+            ('POST', '/ask/stream'): self.ask_stream,
+            ('POST', '/prefetch'): self.prefetch,
+            ('POST', '/interactions'): self.interactions,
+            ('POST', '/resolve'): self.resolve,
+        }
+
+    # -- lifecycle ---------------------------------------------------------
+
+    def start(self):
+        """Build and warm the QA system in a background thread"""
+        with self._lock:
+            if self._warm_thread is not None:
+                return
+            self._warm_thread = threading.Thread(target=self._warm, name="qa-warmup", daemon=True)
+        self._warm_thread.start()
+
+    def _warm(self):
+        start = time.perf_counter()
+        try:
+            self.state = 'loading'
+            qa_system = self.factory()
+            self.qa_system = qa_system
+            qa_system.initialize(index_dir=self.index_dir)
+            self.state = 'warming'
+            qa_system.vector_store.similarity_search_by_vector(
+                qa_system.embeddings.embed_query(WARMUP_QUESTION), k=5)
+            self.state = 'ready'
+            logger.info(f"QA service ready in {time.perf_counter() - start:.2f}s")
+        except Exception as e:
+            self.state, self.error = 'failed', str(e)
+            logger.exception(f"QA service failed to start: {e}")
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                self.start()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # -- ASGI plumbing -----------------------------------------------------
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            return
+        # Servers without lifespan support start warming on the first request
+        self.start()
+
+        self.counters['requests'] += 1
+        method, path = scope['method'], scope['path'].rstrip('/') or '/'
+        try:
+            handler = self.routes.get((method, path))
+            if handler is None:
+                known = any(route_path == path for _, route_path in self.routes)
+                raise HTTPError(405 if known else 404,
+                                "Method not allowed" if known else f"No route for {path}")
+            body = await self._read_json(receive) if method == 'POST' else {}
+            query = {k: v[-1] for k, v in parse_qs(scope.get('query_string', b'').decode()).items()}
+            await handler(dict(query, **body), send)
+        except HTTPError as e:
+            await self._send_json(send, e.status, {'error': e.message}, e.headers)
+        except Exception as e:
+            self.counters['errors'] += 1
+            logger.exception(f"Unhandled error on {method} {path}: {e}")
+            await self._send_json(send, 500, {'error': str(e)})
+
+    @staticmethod
+    async def _read_json(receive) -> Dict[str, Any]:
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > MAX_BODY_BYTES:
+                raise HTTPError(413, "Request body too large")
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                break
+        try:
+            body = json.loads(b''.join(chunks) or b'{}')
+        except ValueError:
+            raise HTTPError(400, "Request body must be JSON")
+        if not isinstance(body, dict):
+            raise HTTPError(400, "Request body must be a JSON object")
+        return body
+
+    @staticmethod
+    async def _send_json(send, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload, default=str).encode('utf-8')
+        raw_headers = [(b'content-type', b'application/json'),
+                       (b'content-length', str(len(body)).encode())]
+        raw_headers += [(k.lower().encode(), str(v).encode()) for k, v in (headers or {}).items()]
+        await send({'type': 'http.response.start', 'status': status, 'headers': raw_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    # -- worker pool -------------------------------------------------------
+
+    def _reserve(self, slots: int):
+        with self._lock:
+            if self._pending + slots > self.max_pending:
+                self.counters['rejected'] += 1
+                raise HTTPError(503, "Service saturated, retry later", {'Retry-After': '1'})
+            self._pending += slots
+
+    def _release(self, _future=None):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, func, *args) -> asyncio.Future:
+        # The slot is freed when the call finishes, not when the client gives
+        # up, so timed-out calls still count against back-pressure
+        future = self._executor.submit(func, *args)
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def _run(self, func, *args):
+        self._reserve(1)
+        return await self._await(self._submit(func, *args))
+
+    async def _await(self, awaitable, deadline: Optional[float] = None):
+        deadline = deadline or time.monotonic() + self.timeout
+        try:
+            return await asyncio.wait_for(awaitable, max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise HTTPError(504, f"Request timed out after {self.timeout:.0f}s")
+
+    def _require(self, ready: bool = True):
+        if self.state == 'failed':
+            raise HTTPError(503, f"QA system failed to start: {self.error}")
+        if self.qa_system is None or (ready and self.state != 'ready'):
+            raise HTTPError(503, f"QA system is {self.state}", {'Retry-After': '5'})
+        return self.qa_system
+
+    @staticmethod
+    def _field(body: Dict[str, Any], name: str, kind: type):
+        value = body.get(name)
+        if not isinstance(value, kind) or not value:
+            raise HTTPError(400, f"'{name}' must be a non-empty {kind.__name__}")
+        return value
+
+    @staticmethod
+    def _filters(body: Dict[str, Any]) -> Dict[str, Any]:
+        """Optional retrieval filters (types, sources, min_confidence)"""
+        filters = {}
+        for name in ('types', 'sources'):
+            if body.get(name) is not None:
+                if not isinstance(body[name], list):
+                    raise HTTPError(400, f"'{name}' must be a list")
+                filters[name] = [str(value) for value in body[name]]
+        if body.get('min_confidence') is not None:
+            try:
+                filters['min_confidence'] = float(body['min_confidence'])
+            except (TypeError, ValueError):
+                raise HTTPError(400, "'min_confidence' must be a number")
+        return filters
+
+    @staticmethod
+    def _session(body: Dict[str, Any]) -> Optional[str]:
+        session_id = body.get('session_id')
+        if session_id is not None and not isinstance(session_id, str):
+            raise HTTPError(400, "'session_id' must be a string")
+        return session_id or None
+
+    # -- endpoints ---------------------------------------------------------
+
+    async def health(self, body, send):
+        await self._send_json(send, 200, {'status': 'ok', 'state': self.state})
+
+    async def ready(self, body, send):
+        ready = self.state == 'ready'
+        progress = getattr(self.qa_system, 'progress', None)
+        await self._send_json(send, 200 if ready else 503,
+                              {'status': 'ready' if ready else self.state, 'error': self.error,
+                               'progress': progress})
+
+    async def stats(self, body, send):
+        with self._lock:
+            service = dict(self.counters, pending=self._pending, max_pending=self.max_pending,
+                           threads=self.threads, state=self.state, pid=os.getpid())
+        stats = {'service': service}
+        if self.qa_system is not None:
+            refresh = str(body.get('refresh', '')).lower() in ('1', 'true')
+            stats.update(await self._run(self.qa_system.get_system_stats, refresh))
+        await self._send_json(send, 200, stats)
+
+    async def ask(self, body, send):
+        qa_system = self._require()
+        question = self._field(body, 'question', str)
+        filters = self._filters(body)
+        session_id = self._session(body)
+        await self._send_json(send, 200, await self._run(
+            lambda: qa_system.ask(question, session_id=session_id, **filters)))
+
+    async def ask_batch(self, body, send):
+        qa_system = self._require()
+        questions = self._field(body, 'questions', list)
+        if len(questions) > MAX_BATCH:
+            raise HTTPError(400, f"At most {MAX_BATCH} questions per batch")
+        filters = self._filters(body)
+        self._reserve(len(questions))
+        futures = [self._submit(lambda q=str(question): qa_system.ask(q, **filters))
+                   for question in questions]
+        outcomes = await self._await(asyncio.gather(*futures, return_exceptions=True))
+        results = [{'error': str(outcome), 'question': str(question)}
+                   if isinstance(outcome, Exception) else outcome
+                   for question, outcome in zip(questions, outcomes)]
+        await self._send_json(send, 200, {'results': results})
+
+    async def ask_stream(self, body, send):
+        qa_system = self._require()
+        question = self._field(body, 'question', str)
+        filters = self._filters(body)
+        session_id = self._session(body)
+        deadline = time.monotonic() + self.timeout
+        loop = asyncio.get_running_loop()
+        events: asyncio.Queue = asyncio.Queue()
+
+        # The generator runs start to finish on one pool thread so its trace
+        # spans stay on that thread; events are handed to the event loop
+        def produce():
+            try:
+                for event in qa_system.ask_stream(question, session_id=session_id, **filters):
+                    loop.call_soon_threadsafe(events.put_nowait, event)
+            except Exception as e:
+                loop.call_soon_threadsafe(events.put_nowait,
+                                          {'event': 'error', 'status': 500, 'error': str(e)})
+            finally:
+                loop.call_soon_threadsafe(events.put_nowait, None)
+
+        self._reserve(1)
+        self._submit(produce)
+        # Wait for the first event before committing to a 200, so a timeout
+        # can still be reported as a status code
+        event = await self._await(events.get(), deadline)
+        await send({'type': 'http.response.start', 'status': 200,
+                    'headers': [(b'content-type', b'application/x-ndjson')]})
+        while event is not None:
+            await send({'type': 'http.response.body', 'more_body': True,
+                        'body': json.dumps(event, default=str).encode('utf-8') + b'\n'})
+            if event.get('event') == 'error':
+                break
+            try:
+                event = await self._await(events.get(), deadline)
+            except HTTPError as e:
+                event = {'event': 'error', 'status': e.status, 'error': e.message}
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def prefetch(self, body, send):
+        qa_system = self._require()
+        question = self._field(body, 'question', str)
+        session_id = self._field(body, 'session_id', str)
+        filters = self._filters(body)
+        with self._lock:
+            busy = self._pending >= self.max_pending // 2
+            if busy:
+                self.counters['prefetch_shed'] += 1
+        if busy:
+            raise HTTPError(503, "Busy; prefetch skipped", {'Retry-After': '1'})
+        await self._send_json(send, 200, await self._run(
+            lambda: qa_system.prefetch(question, session_id, **filters)))
+
+    async def interactions(self, body, send):
+        qa_system = self._require(ready=False)
+        drugs = self._field(body, 'drugs', list)
+        await self._send_json(send, 200,
+                              await self._run(qa_system.check_interactions, [str(d) for d in drugs]))
+
+    async def resolve(self, body, send):
+        qa_system = self._require(ready=False)
+        text = self._field(body, 'text', str)
+        labels = body.get('labels')
+        if labels is not None and not isinstance(labels, list):
+            raise HTTPError(400, "'labels' must be a list")
+        try:
+            limit = int(body.get('limit', 10))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'limit' must be an integer")
+        if limit < 1:
+            raise HTTPError(400, "'limit' must be at least 1")
+        candidates = await self._run(lambda: qa_system.resolve_entity(text, labels, limit))
+        await self._send_json(send, 200, {'text': text, 'candidates': candidates})
+
+
+def _service_from_env() -> QAService:
+    return QAService(
+        index_dir=os.getenv("MEDIGRAPH_INDEX_DIR", "data/index"),
+        threads=int(os.getenv("MEDIGRAPH_SERVICE_THREADS", "8")),
+        max_pending=int(os.getenv("MEDIGRAPH_SERVICE_MAX_PENDING", "0")) or None,
+        timeout=float(os.getenv("MEDIGRAPH_SERVICE_TIMEOUT", "60"))
+    )
+
+
+# Module-level app for ``uvicorn rag.service:app``; nothing is built until startup
+app = _service_from_env()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve MedicalQASystem over HTTP")
+    parser.add_argument('--host', default="0.0.0.0")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes")
+    parser.add_argument('--threads', type=int, default=8, help="QA threads per worker")
+    parser.add_argument('--max-pending', type=int, default=0,
+                        help="Queued + running calls per worker before 503 (default 4 per thread)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Request timeout in seconds")
+    parser.add_argument('--index-dir', default=os.getenv("MEDIGRAPH_INDEX_DIR", "data/index"))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Build the index once here; every worker then memory-maps the same files
+    if not (Path(args.index_dir) / "index.faiss").exists():
+        logger.info(f"Building shared index in {args.index_dir}")
+        _default_factory().initialize(index_dir=args.index_dir)
+
+    os.environ.update({
+        'MEDIGRAPH_INDEX_DIR': args.index_dir,
+        'MEDIGRAPH_SERVICE_THREADS': str(args.threads),
+        'MEDIGRAPH_SERVICE_MAX_PENDING': str(args.max_pending),
+        'MEDIGRAPH_SERVICE_TIMEOUT': str(args.timeout),
+    })
+
+    import uvicorn
+    uvicorn.run("rag.service:app", host=args.host, port=args.port, workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,6 @@
 import streamlit as st
 import os
 import sys
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 from pathlib import Path
 import json
 import time
@@ -12,7 +9,10 @@ from typing import Dict, List, Any
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from rag.qa_chain import MedicalQASystem
+from rag.client import PrefetchDebouncer, QAServiceClient, startup_progress
+
+READINESS_POLL_SECONDS = float(os.getenv("MEDIGRAPH_READINESS_POLL_SECONDS", "1"))
+PREFETCH_DEBOUNCE_SECONDS = float(os.getenv("MEDIGRAPH_PREFETCH_DEBOUNCE_SECONDS", "0.4"))
 
 # Page configuration
 st.set_page_config(
@@ -63,17 +63,21 @@ def init_session_state():
         st.session_state.chat_history = []
     if 'system_stats' not in st.session_state:
         st.session_state.system_stats = {}
+    if 'system_ready' not in st.session_state:
+        st.session_state.system_ready = False
+
+def get_prefetcher():
+    """This session's debounced retrieval prefetcher for the current service client"""
+    prefetcher = st.session_state.get('prefetcher')
+    if prefetcher is None or prefetcher.client is not st.session_state.qa_system:
+        prefetcher = PrefetchDebouncer(st.session_state.qa_system, delay=PREFETCH_DEBOUNCE_SECONDS)
+        st.session_state.prefetcher = prefetcher
+    return prefetcher
 
 @st.cache_resource
 def load_qa_system():
-    """Load QA system"""
-    try:
-        qa_system = MedicalQASystem()
-        qa_system.initialize()
-        return qa_system
-    except Exception as e:
-        st.error(f"Failed to initialize QA system: {e}")
-        return None
+    """Client for the QA service (rag/service.py); does not wait for it to be warm"""
+    return QAServiceClient()
 
 def display_system_stats(stats: Dict[str, Any]):
     """Display system statistics"""
@@ -134,29 +138,32 @@ def main():
     st.markdown('<h1 class="main-header">🏥 Medical Knowledge Graph RAG System</h1>', 
                 unsafe_allow_html=True)
     
-    # Check API key
-    if not os.getenv("OPENAI_API_KEY"):
-        st.error("⚠️ OpenAI API key not found. Please set OPENAI_API_KEY environment variable.")
-        st.stop()
-    
     # Sidebar
     with st.sidebar:
         st.markdown("## 🔧 System Configuration")
         
         # System initialization
         if st.button("🚀 Initialize System", type="primary"):
-            with st.spinner("Initializing Medical QA System..."):
-                st.session_state.qa_system = load_qa_system()
-                if st.session_state.qa_system:
-                    st.session_state.system_stats = st.session_state.qa_system.get_system_stats()
-                    st.success("✅ System initialized successfully!")
-                else:
-                    st.error("❌ Failed to initialize system")
+            st.session_state.qa_system = load_qa_system()
+            st.session_state.system_ready = False
+        
+        # Readiness is polled, never waited on, so the page renders immediately
+        if st.session_state.qa_system and not st.session_state.system_ready:
+            readiness = st.session_state.qa_system.readiness()
+            if readiness.get('status') == 'ready':
+                st.session_state.system_ready = True
+                st.session_state.system_stats = st.session_state.qa_system.get_system_stats()
+                st.success("✅ System initialized successfully!")
+            else:
+                fraction, label = startup_progress(readiness)
+                st.progress(fraction, text=label)
+                if readiness.get('status') in ('failed', 'error', 'unavailable'):
+                    st.error(f"❌ QA service not available: {readiness.get('error') or readiness.get('status')}")
         
         # Display system status
-        if st.session_state.qa_system:
+        if st.session_state.system_ready:
             if st.button("📊 Refresh Stats"):
-                st.session_state.system_stats = st.session_state.qa_system.get_system_stats()
+                st.session_state.system_stats = st.session_state.qa_system.get_system_stats(refresh=True)
             
             st.markdown("### 📈 System Statistics")
             stats = st.session_state.system_stats
@@ -173,8 +180,11 @@ def main():
         display_chat_history()
     
     # Main content area
-    if st.session_state.qa_system is None:
-        st.info("👈 Please initialize the system first using the sidebar.")
+    if not st.session_state.system_ready:
+        if st.session_state.qa_system is None:
+            st.info("👈 Please initialize the system first using the sidebar.")
+        else:
+            st.info("⏳ The QA service is starting; progress is shown in the sidebar.")
         st.markdown("""
         ## 📋 System Features
         
@@ -190,6 +200,10 @@ def main():
         3. Ask your medical questions below
         4. Review answers and source documents
         """)
+        # Poll again once the page has been drawn
+        if st.session_state.qa_system is not None:
+            time.sleep(READINESS_POLL_SECONDS)
+            st.rerun()
         return
     
     # Display system statistics
@@ -223,6 +237,9 @@ def main():
         key="question_input"
     )
     
+    # Start retrieval once the text settles, so Ask only waits on generation
+    get_prefetcher().update(question)
+    
     # Advanced options
     with st.expander("⚙️ Advanced Options"):
         col1, col2 = st.columns(2)
@@ -242,7 +259,7 @@ def main():
             start_time = time.time()
             
             try:
-                response = st.session_state.qa_system.ask(question)
+                response = get_prefetcher().ask(question)
                 end_time = time.time()
                 response_time = end_time - start_time
                 
@@ -8,7 +8,10 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)
 sys.path.append(parent_dir)
 
-from rag.qa_chain import MedicalQASystem
+from rag.client import PrefetchDebouncer, QAServiceClient, startup_progress
+
+READINESS_POLL_SECONDS = float(os.getenv("MEDIGRAPH_READINESS_POLL_SECONDS", "1"))
+PREFETCH_DEBOUNCE_SECONDS = float(os.getenv("MEDIGRAPH_PREFETCH_DEBOUNCE_SECONDS", "0.4"))
 
 # Nordic minimalist CSS styling
 st.markdown("""
@@ -225,8 +228,14 @@ def init_session_state():
         st.session_state.qa_system = None
     if 'system_ready' not in st.session_state:
         st.session_state.system_ready = False
-    if 'initialization_attempted' not in st.session_state:
-        st.session_state.initialization_attempted = False
+
+def get_prefetcher():
+    """This session's debounced retrieval prefetcher for the current service client"""
+    prefetcher = st.session_state.get('prefetcher')
+    if prefetcher is None or prefetcher.client is not st.session_state.qa_system:
+        prefetcher = PrefetchDebouncer(st.session_state.qa_system, delay=PREFETCH_DEBOUNCE_SECONDS)
+        st.session_state.prefetcher = prefetcher
+    return prefetcher
 
 def display_system_status():
     """Display system connection status"""
@@ -254,18 +263,31 @@ def display_system_status():
 
 @st.cache_resource
 def initialize_qa_system():
-    """Initialize QA system with caching"""
-    try:
-        qa_system = MedicalQASystem()
-        qa_system.initialize()  # Call initialize method
-        return qa_system
-    except Exception as e:
-        st.error(f"System initialization failed: {str(e)}")
-        return None
+    """Client for the QA service (rag/service.py); does not wait for it to be warm"""
+    return QAServiceClient()
+
+def display_startup_progress(readiness):
+    """Show the service's startup stage while the index is built or loaded"""
+    fraction, label = startup_progress(readiness)
+    st.progress(fraction, text=label)
+    if readiness.get('status') in ('failed', 'error', 'unavailable'):
+        st.markdown(f"""
+        <div class="result-container">
+            <div class="answer-text">
+                The QA service is not available: {readiness.get('error') or readiness.get('status')}
+                <br><br>
+                Please check:
+                <br>• The QA service is running (python rag/service.py)
+                <br>• Neo4j database is running properly
+                <br>• OpenAI API key is configured for the service
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
 
 def main():
     # Initialize session state
     init_session_state()
+    st.session_state.qa_system = initialize_qa_system()
     
     # Main layout
     st.markdown('<div class="main-container">', unsafe_allow_html=True)
@@ -274,19 +296,15 @@ def main():
     st.markdown('<h1 class="main-title">MediGraph</h1>', unsafe_allow_html=True)
     st.markdown('<p class="subtitle">Medical Knowledge Graph Q&A System</p>', unsafe_allow_html=True)
     
+    # Readiness is polled, never waited on, so the page renders immediately
+    readiness = None
+    if not st.session_state.system_ready:
+        readiness = st.session_state.qa_system.readiness()
+        st.session_state.system_ready = readiness.get('status') == 'ready'
+    
     # System status
     display_system_status()
     
-    # Initialize system if not already done
-    if not st.session_state.initialization_attempted:
-        with st.spinner("Initializing system..."):
-            st.session_state.qa_system = initialize_qa_system()
-            st.session_state.system_ready = st.session_state.qa_system is not None
-            st.session_state.initialization_attempted = True
-        
-        if st.session_state.system_ready:
-            st.rerun()
-    
     # Main interface
     if st.session_state.system_ready:
         # Question input
@@ -297,6 +315,9 @@ def main():
             key="question_input"
         )
         
+        # Start retrieval once the text settles, so Get Answer only waits on generation
+        get_prefetcher().update(question)
+        
         # Submit button
         if st.button("Get Answer", key="submit_btn"):
             if question.strip():
@@ -329,23 +350,14 @@ def main():
                 process_question("Common drug side effects")
     
     else:
-        st.markdown("""
-        <div class="result-container">
-            <div class="answer-text">
-                System is initializing, please wait...
-                <br><br>
-                If there's no response for a long time, please check:
-                <br>• Neo4j database is running properly
-                <br>• OpenAI API key is correctly configured
-            </div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        if st.button("Reinitialize", key="retry_init"):
-            st.session_state.initialization_attempted = False
-            st.rerun()
+        display_startup_progress(readiness)
     
     st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Poll again once the page has been drawn
+    if not st.session_state.system_ready:
+        time.sleep(READINESS_POLL_SECONDS)
+        st.rerun()
 
 def process_question(question):
     """Process the user's question and display results"""
@@ -353,8 +365,8 @@ def process_question(question):
         start_time = time.time()
         
         try:
-            # Call ask method instead of answer_question
-            result = st.session_state.qa_system.ask(question)
+            # Reuses the sources prefetched while the question was typed
+            result = get_prefetcher().ask(question)
             processing_time = time.time() - start_time
             
             # Convert data format to match display_results expected format
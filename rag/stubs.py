@@ -0,0 +1,129 @@
+# Deterministic local stand-ins for the OpenAI embedding and chat models
+import hashlib
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from typing import Any, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from pydantic import PrivateAttr
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic bag-of-words embedder for offline runs.
+
+    Each token is hashed into one of ``size`` signed buckets and the vector is
+    L2-normalised, so texts sharing words land close together and results are
+    identical across runs and machines. An artificial per-call latency can be
+    configured to model a remote embedding API.
+    """
+
+    def __init__(self, size: int = 256, latency: float = 0.0, per_text_latency: float = 0.0):
+        """
+        Args:
+            size: Embedding dimension
+            latency: Seconds slept per embedding call
+            per_text_latency: Additional seconds slept per embedded text
+        """
+        self.size = size
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        vector = [0.0] * self.size
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode('utf-8'), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], 'little') % self.size
+            vector[bucket] += 1.0 if digest[4] & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def _sleep(self, n_texts: int):
+        with self._lock:
+            self.calls += 1
+        delay = self.latency + self.per_text_latency * n_texts
+        if delay > 0:
+            time.sleep(delay)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._sleep(len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._sleep(1)
+        return self._embed(text)
+
+
+class StubRateLimitError(RuntimeError):
+    """Transient failure raised by StubChatModel, shaped like a 429"""
+    status_code = 429
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Chat model that answers locally after a configurable delay.
+
+    The answer quotes the first line of the supplied context, and token usage
+    is estimated at four characters per token so prompt-size effects remain
+    visible in benchmarks. ``failure_rate`` makes a share of calls raise
+    StubRateLimitError to exercise retry handling; which calls fail is drawn
+    from a generator seeded with ``seed``, so runs are reproducible.
+    """
+
+    latency: float = 0.0
+    jitter: float = 0.0
+    seconds_per_output_token: float = 0.0
+    max_tokens: int = 64
+    seed: int = 0
+    failure_rate: float = 0.0
+    calls: int = 0
+    _failures: random.Random = PrivateAttr()
+
+    def model_post_init(self, __context: Any) -> None:
+        super().model_post_init(__context)
+        self._failures = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "stub-chat"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        prompt = "\n".join(str(message.content) for message in messages)
+        context_lines = [line for line in prompt.splitlines()
+                         if line.startswith(("Drug:", "Disease:"))]
+        answer = ("Based on the medical knowledge provided: " + context_lines[0]
+                  if context_lines else "The provided context does not answer this question.")
+        answer = " ".join(answer.split()[:self.max_tokens])
+
+        input_tokens = max(1, len(prompt) // 4)
+        output_tokens = max(1, len(answer) // 4)
+        rng = random.Random(self.seed ^ zlib.crc32(prompt.encode('utf-8')))
+        delay = (self.latency + rng.uniform(0, self.jitter)
+                 + self.seconds_per_output_token * output_tokens)
+        if delay > 0:
+            time.sleep(delay)
+        self.calls += 1
+        if self.failure_rate and self._failures.random() < self.failure_rate:
+            raise StubRateLimitError("stub rate limit exceeded")
+
+        message = AIMessage(
+            content=answer,
+            usage_metadata={
+                'input_tokens': input_tokens,
+                'output_tokens': output_tokens,
+                'total_tokens': input_tokens + output_tokens
+            }
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,316 @@
+# Sweep retrieval settings against a gold question set and pick Pareto-optimal ones
+import argparse
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain_core.embeddings import Embeddings
+
+from rag.gateway import CHARS_PER_TOKEN
+from rag.qa_chain import MedicalQASystem
+from rag.retrieval import RetrievalConfig
+from rag.stubs import HashEmbeddings, StubChatModel
+
+logger = logging.getLogger(__name__)
+
+# Short names accepted in --indexes specs, e.g. "hnsw:m=16:ef=64"
+INDEX_OPTIONS = {'m': 'hnsw_m', 'efc': 'ef_construction', 'ef': 'ef_search',
+                 'nlist': 'nlist', 'nprobe': 'nprobe'}
+# (metric, True if higher is better) compared for Pareto dominance; filtered_recall
+# is None (and skipped) when no gold question carries filters
+OBJECTIVES = (('recall', True), ('mrr', True), ('filtered_recall', True), ('latency_ms', False),
+              ('prompt_tokens', False))
+
+
+class MemoizedEmbeddings(Embeddings):
+    """Embeds each distinct text once across every configuration in the sweep"""
+
+    def __init__(self, embeddings: Embeddings):
+        self.embeddings = embeddings
+        self._documents: Dict[str, List[float]] = {}
+        self._queries: Dict[str, List[float]] = {}
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        missing = [text for text in dict.fromkeys(texts) if text not in self._documents]
+        if missing:
+            self._documents.update(zip(missing, self.embeddings.embed_documents(missing)))
+        return [self._documents[text] for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        if text not in self._queries:
+            self._queries[text] = self.embeddings.embed_query(text)
+        return self._queries[text]
+
+
+def make_embeddings(spec: str, dim: int) -> Embeddings:
+    """``hash`` for the offline hash embedder, ``hf:<model>`` for a local sentence-transformers model"""
+    if spec == 'hash':
+        return HashEmbeddings(size=dim)
+    if spec.startswith('hf:'):
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=spec[3:])
+    raise ValueError(f"Unknown embedder {spec!r}; use 'hash' or 'hf:<model>'")
+
+
+def parse_index_spec(spec: str) -> Dict[str, Any]:
+    """``hnsw:m=16:ef=64`` -> RetrievalConfig fields"""
+    kind, *options = spec.split(':')
+    settings: Dict[str, Any] = {'index': kind}
+    for option in options:
+        name, _, value = option.partition('=')
+        if name not in INDEX_OPTIONS:
+            raise ValueError(f"Unknown index option {name!r} in {spec!r}")
+        settings[INDEX_OPTIONS[name]] = int(value)
+    return settings
+
+
+def synthetic_gold(graph, questions: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Gold questions about random drugs and diseases of an InMemoryGraph
+
+    Questions whose expected nodes all have one type also carry that type as
+    a retrieval filter, so filtered search is measured as well.
+    """
+    rng = random.Random(seed)
+    drugs, diseases = graph.nodes['Drug'], graph.nodes['Disease']
+    treated_by: Dict[str, List[str]] = {}
+    for drug, disease, _ in graph.edges.get('TREATS', []):
+        treated_by.setdefault(disease, []).append(drug)
+    templates = [
+        ('drug', "What is {name} used for?"),
+        ('drug', "What are the side effects of {name}?"),
+        ('disease', "How is {name} treated?"),
+        ('disease', "Which drugs treat {name}?"),
+    ]
+    gold = []
+    for i in range(questions):
+        kind, template = templates[i % len(templates)]
+        if kind == 'drug':
+            name = rng.choice(sorted(drugs))
+            expected = [drugs[name]['id']]
+        else:
+            name = rng.choice(sorted(diseases))
+            expected = [diseases[name]['id']]
+            if template.startswith('Which'):
+                expected += [drugs[d]['id'] for d in treated_by.get(name, [])[:2]]
+        item = {'question': template.format(name=name), 'expected': expected}
+        if not template.startswith('Which'):
+            item['filters'] = {'types': [kind]}
+        gold.append(item)
+    return gold
+
+
+def load_gold(path: str) -> List[Dict[str, Any]]:
+    """JSONL lines with ``question``, ``expected`` (node ids) and optional ``filters`` (types, sources, min_confidence)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        gold = [json.loads(line) for line in f if line.strip()]
+    for item in gold:
+        if not item.get('expected'):
+            raise ValueError(f"Gold question without expected ids: {item.get('question')!r}")
+    return gold
+
+
+def evaluate(qa_system: MedicalQASystem, gold: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Recall@k, MRR, retrieval latency and prompt size over the gold set
+
+    Retrieved chunks are mapped to their node ids, keeping the first
+    occurrence, so a node split into several chunks counts once. Query
+    embeddings are memoized, so latency covers search, reranking, chunk
+    lookup and prompt building. Questions with ``filters`` are searched a
+    second time with them, giving filtered recall and latency and the share
+    of filtered searches that returned fewer than k chunks although enough
+    passed the filter.
+    """
+    recalls, reciprocal_ranks, latencies, tokens = [], [], [], []
+    filtered_recalls, filtered_latencies, short = [], [], 0
+    k = qa_system.retrieval_config.k
+    qa_system._retrieve(gold[0]['question'], {})  # warm-up
+    for item in gold:
+        expected = set(item['expected'])
+        start = time.perf_counter()
+        docs, prompt, _ = qa_system._retrieve(item['question'], {})
+        latencies.append((time.perf_counter() - start) * 1000)
+        ids = list(dict.fromkeys(doc.metadata.get('id') for doc in docs))
+        recalls.append(len(expected & set(ids)) / len(expected))
+        reciprocal_ranks.append(next((1 / rank for rank, node_id in enumerate(ids, 1)
+                                      if node_id in expected), 0.0))
+        tokens.append(len(prompt) / CHARS_PER_TOKEN)
+
+        filters = item.get('filters')
+        if filters:
+            start = time.perf_counter()
+            docs, _, _ = qa_system._retrieve(item['question'], filters)
+            filtered_latencies.append((time.perf_counter() - start) * 1000)
+            _, matches = qa_system.filtered_index.selector(**filters)
+            short += len(docs) < min(k, matches)
+            ids = {doc.metadata.get('id') for doc in docs}
+            filtered_recalls.append(len(expected & ids) / len(expected))
+    latencies.sort()
+    return {
+        'recall': round(statistics.mean(recalls), 4),
+        'mrr': round(statistics.mean(reciprocal_ranks), 4),
+        'latency_ms': round(statistics.mean(latencies), 3),
+        'p95_latency_ms': round(latencies[int(0.95 * (len(latencies) - 1))], 3),
+        'prompt_tokens': round(statistics.mean(tokens), 1),
+        'filtered_recall': round(statistics.mean(filtered_recalls), 4) if filtered_recalls else None,
+        'filtered_latency_ms': (round(statistics.mean(filtered_latencies), 3)
+                                if filtered_latencies else None),
+        'filtered_short': round(short / len(filtered_recalls), 4) if filtered_recalls else None,
+    }
+
+
+def format_metrics(m: Dict[str, Any]) -> str:
+    text = (f"recall {m['recall']:.3f}  mrr {m['mrr']:.3f}  "
+            f"{m['latency_ms']:7.3f} ms  {m['prompt_tokens']:6.0f} tokens")
+    if m.get('filtered_recall') is not None:
+        text += f"  filtered recall {m['filtered_recall']:.3f} ({m['filtered_short']:.0%} short)"
+    return text
+
+
+def dominates(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    better = False
+    for metric, higher in OBJECTIVES:
+        if a[metric] is None or b[metric] is None:
+            continue
+        x, y = (a[metric], b[metric]) if higher else (b[metric], a[metric])
+        if x < y:
+            return False
+        better = better or x > y
+    return better
+
+
+def pareto_front(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Results no other result beats on every objective"""
+    front = [r for r in results if not any(dominates(other['metrics'], r['metrics'])
+                                           for other in results)]
+    return sorted(front, key=lambda r: (-r['metrics']['recall'], -r['metrics']['mrr'],
+                                        r['metrics']['latency_ms']))
+
+
+def choose(front: List[Dict[str, Any]], max_latency_ms: Optional[float],
+           max_prompt_tokens: Optional[float]) -> Optional[Dict[str, Any]]:
+    """Best recall (then MRR, then latency) on the front within the budgets"""
+    eligible = [r for r in front
+                if (max_latency_ms is None or r['metrics']['latency_ms'] <= max_latency_ms)
+                and (max_prompt_tokens is None or r['metrics']['prompt_tokens'] <= max_prompt_tokens)]
+    return eligible[0] if eligible else None
+
+
+def sweep(args, driver, embeddings: Embeddings, gold: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    chunkings = [(size, overlap) for size in args.chunk_sizes for overlap in args.chunk_overlaps
+                 if overlap < size]
+    index_specs = [parse_index_spec(spec) for spec in args.indexes]
+    results = []
+    for (chunk_size, chunk_overlap), spec in itertools.product(chunkings, index_specs):
+        base = RetrievalConfig(chunk_size=chunk_size, chunk_overlap=chunk_overlap, **spec)
+        start = time.perf_counter()
+        qa_system = MedicalQASystem(embeddings=embeddings, llm=StubChatModel(), driver=driver,
+                                    retrieval_config=base)
+        qa_system.initialize()
+        build_seconds = time.perf_counter() - start
+        chunks = qa_system.vector_store.index.ntotal
+        for k, rerank in itertools.product(args.ks, args.rerank):
+            config = replace(base, k=k, rerank=rerank)
+            qa_system.retrieval_config = config
+            metrics = evaluate(qa_system, gold)
+            results.append({'config': config.to_dict(), 'describe': config.describe(),
+                            'chunks': chunks, 'build_seconds': round(build_seconds, 2),
+                            'metrics': metrics})
+            print(f"{config.describe():60s} {format_metrics(metrics)}")
+    return results
+
+
+def csv_list(cast):
+    return lambda text: [cast(value) for value in text.split(',') if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune retrieval settings against gold questions")
+    parser.add_argument('--gold', default=None,
+                        help="JSONL of {question, expected: [node ids]} (default: generated "
+                             "from the synthetic graph)")
+    parser.add_argument('--synthetic-drugs', type=int, default=None,
+                        help="Tune on a synthetic in-memory graph of this size instead of Neo4j")
+    parser.add_argument('--questions', type=int, default=200,
+                        help="Generated gold questions when --gold is not given")
+    parser.add_argument('--embedder', default='hash', help="'hash' or 'hf:<sentence-transformers model>'")
+    parser.add_argument('--embedding-dim', type=int, default=256, help="Hash embedder dimension")
+    parser.add_argument('--chunk-sizes', type=csv_list(int), default=[250, 500, 1000])
+    parser.add_argument('--chunk-overlaps', type=csv_list(int), default=[0, 50])
+    parser.add_argument('--ks', type=csv_list(int), default=[3, 5, 10])
+    parser.add_argument('--indexes', type=csv_list(str),
+                        default=['flat', 'hnsw:m=16:ef=32', 'hnsw:m=32:ef=128', 'ivf:nprobe=1', 'ivf:nprobe=8'],
+                        help="Index specs: flat, hnsw[:m=M][:efc=N][:ef=N], ivf[:nlist=N][:nprobe=N]")
+    parser.add_argument('--rerank', type=csv_list(lambda v: v in ('on', '1', 'true')),
+                        default=[False, True], help="Reranking modes to try: off,on")
+    parser.add_argument('--max-latency-ms', type=float, default=None,
+                        help="Only choose configurations at or below this mean retrieval latency")
+    parser.add_argument('--max-prompt-tokens', type=float, default=None,
+                        help="Only choose configurations at or below this mean prompt size")
+    parser.add_argument('--output', default="retrieval_config.json",
+                        help="Chosen config, loadable by MedicalQASystem via RETRIEVAL_CONFIG")
+    parser.add_argument('--report', default=None, help="Write every result and the Pareto front here")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    graph = None
+    if args.synthetic_drugs:
+        from graph.memory import InMemoryDriver, InMemoryGraph
+        graph = InMemoryGraph.synthetic(seed=args.seed, drugs=args.synthetic_drugs,
+                                        diseases=args.synthetic_drugs // 3,
+                                        symptoms=min(400, args.synthetic_drugs // 2),
+                                        chemicals=args.synthetic_drugs // 5)
+        driver = InMemoryDriver(graph)
+    else:
+        from neo4j import GraphDatabase
+        driver = GraphDatabase.driver(os.getenv("NEO4J_URI", "bolt://localhost:7687"), auth=(
+            os.getenv("NEO4J_USER", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")))
+
+    if args.gold:
+        gold = load_gold(args.gold)
+    elif graph is not None:
+        gold = synthetic_gold(graph, args.questions, args.seed)
+    else:
+        parser.error("--gold is required when tuning against Neo4j")
+
+    embeddings = MemoizedEmbeddings(make_embeddings(args.embedder, args.embedding_dim))
+    try:
+        results = sweep(args, driver, embeddings, gold)
+    finally:
+        driver.close()
+
+    front = pareto_front(results)
+    chosen = choose(front, args.max_latency_ms, args.max_prompt_tokens)
+    print(f"\nPareto front ({len(front)} of {len(results)} configurations):")
+    for result in front:
+        print(f"  {result['describe']:60s} {format_metrics(result['metrics'])}")
+
+    if args.report:
+        Path(args.report).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.report).write_text(json.dumps({'questions': len(gold), 'embedder': args.embedder,
+                                                 'results': results, 'pareto_front': front},
+                                                indent=2), encoding='utf-8')
+    if chosen is None:
+        print("No configuration on the front meets the latency/token budgets")
+        sys.exit(1)
+    RetrievalConfig(**chosen['config']).save(args.output, metrics=chosen['metrics'],
+                                             questions=len(gold), embedder=args.embedder)
+    print(f"\nChose {chosen['describe']}; wrote {args.output} "
+          f"(use with RETRIEVAL_CONFIG={args.output})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+# Reproducible offline benchmark for ingestion, initialization and QA latency
+import argparse
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from graph.ingest import Neo4jIngestor
+from graph.memory import InMemoryDriver, InMemoryGraph
+from monitoring.tracing import Histogram
+from rag.qa_chain import MedicalQASystem
+from rag.stubs import HashEmbeddings, StubChatModel
+
+logger = logging.getLogger(__name__)
+
+# Metrics checked by --baseline; counts and configuration echoes are skipped
+LOWER_IS_BETTER = {'seconds', 'mean', 'p50', 'p95', 'p99', 'peak_traced_mb', 'max_rss_mb',
+                   'docstore_bytes_per_chunk'}
+HIGHER_IS_BETTER = {'qps', 'records_per_second'}
+
+SCALES = {
+    'small': dict(drugs=200, diseases=60, symptoms=100, chemicals=40),
+    'medium': dict(drugs=1000, diseases=300, symptoms=500, chemicals=200),
+    'large': dict(drugs=5000, diseases=1500, symptoms=2500, chemicals=1000),
+}
+
+
+def _latency_summary(samples: List[float]) -> Dict[str, float]:
+    histogram = Histogram(window=max(len(samples), 1))
+    for sample in samples:
+        histogram.observe(sample)
+    summary = histogram.summary()
+    return {key: round(summary[key] * 1000, 3) for key in ('mean', 'p50', 'p95', 'p99')}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _questions(graph: InMemoryGraph, count: int) -> List[str]:
+    drugs = list(graph.nodes['Drug'])
+    diseases = list(graph.nodes['Disease'])
+    templates = [
+        "What is {drug} used for?",
+        "What are the side effects of {drug}?",
+        "How is {disease} treated?",
+        "What are symptoms of {disease}?",
+    ]
+    return [templates[i % len(templates)].format(drug=drugs[i % len(drugs)],
+                                                 disease=diseases[i % len(diseases)])
+            for i in range(count)]
+
+
+def bench_ingest(graph: InMemoryGraph, driver=None, input_dir: str = None) -> Dict[str, Any]:
+    """
+    Time each ingest stage
+
+    Args:
+        graph: Graph whose input files are ingested when ``input_dir`` is not given
+        driver: Neo4j driver (defaults to the in-memory stand-in)
+        input_dir: Directory with pre-generated inputs, e.g. from
+            scripts/generate_synthetic_data.py
+    """
+    driver = driver or InMemoryDriver()
+    ingestor = Neo4jIngestor(driver=driver)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        if input_dir:
+            paths = {
+                'fda': Path(input_dir) / "fda_processed.jsonl",
+                'entities': Path(input_dir) / "all_entities.jsonl",
+                'triples': Path(input_dir) / "unified_triples.csv",
+            }
+        else:
+            paths = graph.write_input_files(tmp)
+        start = time.perf_counter()
+        ingestor.migrate()
+        results['schema'] = {'seconds': round(time.perf_counter() - start, 4)}
+        stages = [
+            ('drug_nodes', ingestor.create_drug_nodes, paths['fda']),
+            ('entity_nodes', ingestor.create_entities_from_ner, paths['entities']),
+            ('relationships', ingestor.create_relationships_from_triples, paths['triples']),
+        ]
+        for stage, method, path in stages:
+            with open(path, 'rb') as f:
+                records = max(sum(1 for _ in f) - (1 if path.suffix == '.csv' else 0), 0)
+            start = time.perf_counter()
+            method(str(path))
+            elapsed = time.perf_counter() - start
+            results[stage] = {
+                'records': records,
+                'seconds': round(elapsed, 4),
+                'records_per_second': round(records / elapsed, 1) if elapsed else None
+            }
+    if isinstance(driver, InMemoryDriver):
+        results['statements'] = driver.statements
+    return results
+
+
+# Modules timed by bench_startup; each is imported in a fresh interpreter
+STARTUP_IMPORTS = ['rag', 'rag.client', 'rag.service', 'rag.qa_chain']
+# What a UI page does before drawing: import its client, ask the service once
+FIRST_PAINT_SCRIPT = """
+import time
+start = time.perf_counter()
+try:
+    import streamlit
+except ImportError:
+    pass
+from rag.client import QAServiceClient, startup_progress
+startup_progress(QAServiceClient("http://127.0.0.1:9", timeout=1).readiness())
+print(time.perf_counter() - start)
+"""
+
+
+def _run_timed(code: str) -> float:
+    root = Path(__file__).parent.parent
+    output = subprocess.check_output([sys.executable, '-c', code], cwd=root, text=True,
+                                     stderr=subprocess.DEVNULL)
+    return float(output.strip().splitlines()[-1])
+
+
+def bench_startup(graph: InMemoryGraph, args) -> Dict[str, Any]:
+    """
+    Time cold imports, a UI's first paint and the background build
+
+    First paint is measured against an unreachable service, so it covers only
+    what the page does before it can draw. The build runs through QAService
+    exactly as at service startup; the time at which each progress stage was
+    first seen is recorded.
+    """
+    from rag.service import QAService
+
+    results = {'import': {}}
+    for module in STARTUP_IMPORTS:
+        seconds = _run_timed(f"import time\nstart = time.perf_counter()\nimport {module}\n"
+                             f"print(time.perf_counter() - start)")
+        results['import'][module] = {'seconds': round(seconds, 4)}
+    results['first_paint'] = {'seconds': round(_run_timed(FIRST_PAINT_SCRIPT), 4)}
+
+    service = QAService(factory=lambda: MedicalQASystem(
+        embeddings=HashEmbeddings(size=args.embedding_dim, latency=args.embed_latency),
+        llm=StubChatModel(latency=args.llm_latency, seed=args.seed),
+        driver=InMemoryDriver(graph)
+    ))
+    stages = {}
+    start = time.perf_counter()
+    service.start()
+    while service.state not in ('ready', 'failed'):
+        progress = getattr(service.qa_system, 'progress', None)
+        for stage in (service.state, progress and progress['stage']):
+            if stage and stage not in stages:
+                stages[stage] = round(time.perf_counter() - start, 4)
+        time.sleep(0.005)
+    results['ready'] = {'seconds': round(time.perf_counter() - start, 4), 'state': service.state}
+    results['stages_first_seen'] = stages
+    service._executor.shutdown(wait=False)
+    return results
+
+
+def bench_qa(graph: InMemoryGraph, args) -> Dict[str, Any]:
+    """Time initialize(), retrieval, sequential ask() and concurrent ask()"""
+    qa_system = MedicalQASystem(
+        embeddings=HashEmbeddings(size=args.embedding_dim, latency=args.embed_latency),
+        llm=StubChatModel(latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed),
+        driver=InMemoryDriver(graph)
+    )
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    qa_system.initialize()
+    init_seconds = time.perf_counter() - start
+    _, init_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    questions = _questions(graph, args.questions)
+
+    retrieval = []
+    for question in questions:
+        start = time.perf_counter()
+        vector = qa_system.embeddings.embed_query(question)
+        qa_system.vector_store.similarity_search_by_vector(vector, k=5)
+        retrieval.append(time.perf_counter() - start)
+
+    asks = []
+    for question in questions:
+        start = time.perf_counter()
+        qa_system.ask(question)
+        asks.append(time.perf_counter() - start)
+
+    concurrent_questions = questions * max(1, args.concurrent_rounds)
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        start = time.perf_counter()
+        list(pool.map(qa_system.ask, concurrent_questions))
+        concurrent_seconds = time.perf_counter() - start
+
+    return {
+        'initialize': {
+            'seconds': round(init_seconds, 4),
+            'chunks': qa_system.vector_store.index.ntotal,
+            'peak_traced_mb': round(init_peak / 2**20, 2),
+            'docstore_bytes_per_chunk': round(qa_system.vector_store.docstore.nbytes
+                                              / max(qa_system.vector_store.index.ntotal, 1), 1)
+        },
+        'retrieval_ms': _latency_summary(retrieval),
+        'ask_ms': _latency_summary(asks),
+        'concurrent': {
+            'workers': args.concurrency,
+            'requests': len(concurrent_questions),
+            'qps': round(len(concurrent_questions) / concurrent_seconds, 2)
+        },
+        'llm_gateway': qa_system.llm_gateway.stats(),
+        'graph_query_cache': qa_system.graph_cache.stats()
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    List metrics that regressed by more than ``tolerance`` against a baseline
+
+    Latencies and durations regress upwards; throughputs regress downwards.
+    """
+    regressions = []
+
+    def walk(current, previous, path):
+        for key, value in current.items():
+            if key not in previous:
+                continue
+            if isinstance(value, dict):
+                walk(value, previous[key], f"{path}.{key}" if path else key)
+            elif key in LOWER_IS_BETTER | HIGHER_IS_BETTER and value is not None and previous[key]:
+                change = (value - previous[key]) / previous[key]
+                if (change < -tolerance) if key in HIGHER_IS_BETTER else (change > tolerance):
+                    regressions.append(f"{path}.{key}: {previous[key]} -> {value} ({change:+.1%})")
+
+    walk(results, baseline, "")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline MediGraph benchmark")
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small',
+                        help="Synthetic graph size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--questions', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--concurrent-rounds', type=int, default=2)
+    parser.add_argument('--embedding-dim', type=int, default=256)
+    parser.add_argument('--embed-latency', type=float, default=0.0,
+                        help="Seconds of artificial latency per embedding call")
+    parser.add_argument('--llm-latency', type=float, default=0.05,
+                        help="Seconds of artificial latency per LLM call")
+    parser.add_argument('--llm-jitter', type=float, default=0.0)
+    parser.add_argument('--neo4j-uri', default=None,
+                        help="Ingest into a real Neo4j instead of the in-memory stand-in")
+    parser.add_argument('--ingest-dir', default=None,
+                        help="Ingest pre-generated inputs (see generate_synthetic_data.py)")
+    parser.add_argument('--output', default=None, help="Result JSON path")
+    parser.add_argument('--baseline', default=None, help="Previous result JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="Relative change counted as a regression")
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    graph = InMemoryGraph.synthetic(seed=args.seed, **SCALES[args.scale])
+
+    ingest_driver = None
+    if args.neo4j_uri:
+        from neo4j import GraphDatabase
+        ingest_driver = GraphDatabase.driver(args.neo4j_uri, auth=(
+            os.getenv("NEO4J_USERNAME", "neo4j"), os.getenv("NEO4J_PASSWORD", "password")))
+
+    results = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'args': vars(args),
+            'graph': {label: len(nodes) for label, nodes in graph.nodes.items()},
+        },
+        'startup': bench_startup(graph, args),
+        'ingest': bench_ingest(graph, ingest_driver, args.ingest_dir),
+        'qa': bench_qa(graph, args),
+        # ru_maxrss is reported in KiB on Linux and bytes on macOS
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                            / (2**20 if sys.platform == 'darwin' else 1024), 1),
+    }
+
+    output = Path(args.output or f"benchmark_results/{results['meta']['git_revision']}-{args.scale}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+    print(json.dumps({k: v for k, v in results.items() if k != 'meta'}, indent=2))
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding='utf-8'))
+        regressions = compare(
+            {k: v for k, v in results.items() if k != 'meta'},
+            {k: v for k, v in baseline.items() if k != 'meta'},
+            args.tolerance
+        )
+        if regressions:
+            print("Regressions against baseline:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+# Index-build throughput: concurrent batched embedding against a sequential build
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from graph.memory import InMemoryDriver, InMemoryGraph
+from rag.index_builder import IndexBuilder
+from rag.qa_chain import MedicalQASystem
+from rag.stubs import HashEmbeddings, StubChatModel
+
+
+def make_chunks(args) -> List[str]:
+    """Chunk texts extracted from a synthetic graph, as initialize() builds them"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    graph = InMemoryGraph.synthetic(seed=args.seed, drugs=args.drugs, diseases=args.drugs // 3,
+                                    symptoms=min(400, args.drugs // 2), chemicals=args.drugs // 5)
+    qa_system = MedicalQASystem(embeddings=HashEmbeddings(size=8), llm=StubChatModel(),
+                                driver=InMemoryDriver(graph))
+    documents = qa_system._extract_documents_from_neo4j()
+    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
+    return [doc.page_content for doc in splitter.split_documents(documents)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent batched embedding throughput")
+    parser.add_argument('--drugs', type=int, default=1000, help="Synthetic graph size")
+    parser.add_argument('--workers', default="1,2,4,8", help="Worker counts to compare")
+    parser.add_argument('--batch-size', type=int, default=64, help="Texts per request")
+    parser.add_argument('--batch-chars', type=int, default=100_000, help="Characters per request")
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="Seconds of artificial latency per embedding request")
+    parser.add_argument('--per-text-latency', type=float, default=0.0005,
+                        help="Additional seconds per embedded text")
+    parser.add_argument('--requests-per-minute', type=int, default=None)
+    parser.add_argument('--embedding-dim', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    texts = make_chunks(args)
+    results = {'chunks': len(texts), 'latency': args.latency,
+               'per_text_latency': args.per_text_latency, 'runs': {}}
+    for workers in [int(w) for w in args.workers.split(',')]:
+        builder = IndexBuilder(
+            HashEmbeddings(size=args.embedding_dim, latency=args.latency,
+                           per_text_latency=args.per_text_latency),
+            workers=workers, max_batch_texts=args.batch_size, max_batch_chars=args.batch_chars,
+            requests_per_minute=args.requests_per_minute
+        )
+        index, order = builder.build(texts)
+        assert index.ntotal == len(texts) and sorted(order) == list(range(len(texts)))
+        results['runs'][workers] = builder.stats
+
+    runs = results['runs']
+    baseline = runs[min(runs)]['seconds']
+    results['speedup'] = {workers: round(baseline / run['seconds'], 2)
+                          for workers, run in runs.items()}
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
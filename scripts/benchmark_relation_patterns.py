@@ -0,0 +1,103 @@
+# Throughput of the compiled relation-pattern matcher against per-regex matching
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+from nlp.patterns import CompiledPatternMatcher, NaivePatternMatcher
+from nlp.re_model import RELATION_PATTERNS
+
+# Sentence shapes with masked entity slots; most real sentences match nothing
+MATCHING = [
+    "{DRUG} is indicated for the treatment of {DISEASE}, {DISEASE} and {DISEASE}.",
+    "{DRUG} ({DRUG}) is approved for {DISEASE}.",
+    "The most common adverse reactions to {DRUG} include {SYMPTOM}, {SYMPTOM} and {SYMPTOM}.",
+    "{DRUG} may cause {SYMPTOM} in elderly patients.",
+    "{DRUG} should not be taken with {DRUG}.",
+    "Concomitant use of {DRUG} and {DRUG} increases exposure.",
+    "Symptoms of {DISEASE} include {SYMPTOM} and {SYMPTOM}.",
+    "{DISEASE} was treated with {DRUG} for 12 weeks.",
+    "{SYMPTOM} has been reported following {DRUG}.",
+]
+NON_MATCHING = [
+    "{DRUG} was studied in 240 patients with {DISEASE} over 52 weeks.",
+    "Plasma concentrations of {DRUG} were measured at baseline.",
+    "Patients with {DISEASE} and {SYMPTOM} were excluded from the trial.",
+    "The half-life of {DRUG} is approximately 6 hours in healthy adults.",
+    "No dose adjustment is required in patients with mild {DISEASE}.",
+    "{SYMPTOM} resolved without intervention in most subjects.",
+]
+
+
+def make_sentences(count: int, match_rate: float, seed: int) -> List[str]:
+    """Masked sentences drawn from MATCHING/NON_MATCHING shapes"""
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(count):
+        shape = rng.choice(MATCHING if rng.random() < match_rate else NON_MATCHING)
+        index = 0
+        while '{' in shape:
+            start = shape.index('{')
+            end = shape.index('}', start)
+            shape = f"{shape[:start]}⟨{shape[start + 1:end]}:{index}⟩{shape[end + 1:]}"
+            index += 1
+        sentences.append(shape)
+    return sentences
+
+
+def _throughput(func, sentences: List[str], repeats: int) -> float:
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(sentences)
+        best = min(best, time.perf_counter() - start)
+    return round(len(sentences) / best, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Relation-pattern matcher throughput")
+    parser.add_argument('--sentences', type=int, default=200_000)
+    parser.add_argument('--match-rate', type=float, default=0.2,
+                        help="Share of sentences containing a relation pattern")
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    sentences = make_sentences(args.sentences, args.match_rate, args.seed)
+    naive = NaivePatternMatcher(RELATION_PATTERNS)
+    compiled = CompiledPatternMatcher(RELATION_PATTERNS)
+
+    def batched(sentences):
+        for start in range(0, len(sentences), args.batch_size):
+            compiled.match_batch(sentences[start:start + args.batch_size])
+
+    results = {
+        'sentences': len(sentences),
+        'patterns': len(naive.patterns),
+        'sentences_per_second': {
+            'naive': _throughput(lambda s: [naive.match(x) for x in s], sentences, args.repeats),
+            'compiled': _throughput(lambda s: [compiled.match(x) for x in s], sentences, args.repeats),
+            'compiled_batched': _throughput(batched, sentences, args.repeats),
+        },
+    }
+    rates = results['sentences_per_second']
+    results['speedup'] = {key: round(rates[key] / rates['naive'], 2)
+                          for key in ('compiled', 'compiled_batched')}
+
+    disagreements = sum(
+        sorted(a) != sorted(b)
+        for a, b in zip((naive.match(s) for s in sentences), compiled.match_batch(sentences))
+    )
+    results['disagreements'] = disagreements
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,478 @@
+# Streaming generator for synthetic ingest inputs at load-test scale
+import argparse
+import csv
+import json
+import logging
+import math
+import random
+import shutil
+from functools import lru_cache
+from multiprocessing import Pool
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MASK64 = (1 << 64) - 1
+
+# Triples are generated in fixed-size shards with their own random stream, so
+# the output is identical whatever the number of worker processes.
+SHARD_SIZE = 1_000_000
+NAME_CACHE_SIZE = 1 << 16
+
+# Consonant-vowel pairs are the "digits" used to spell entity indexes. Every
+# suffix below starts with a vowel or a space, so the CV prefix of a name can
+# always be decoded back to its index and names never collide.
+CONSONANTS = "bcdfgklmnprstvxz"
+VOWELS = "aeiou"
+CV_PAIRS = [c + v for c in CONSONANTS for v in VOWELS]
+
+DRUG_STEMS = ['olol', 'azole', 'idine', 'afil', 'oxacin', 'ipine', 'artan', 'umab',
+              'astatin', 'icillin', 'april', 'etine', 'ormin', 'amide', 'oxetine', 'azepam']
+BRAND_ENDINGS = ['ex', 'ix', 'a', 'on', 'ra', 'vo', 'za', 'lin']
+DISEASE_SUFFIXES = ['itis', 'osis', 'emia', 'opathy', 'algia', 'oma', ' syndrome', ' disease',
+                    ' disorder', 'ism']
+DISEASE_MODIFIERS = ['chronic', 'acute', 'idiopathic', 'atypical', 'early-onset', 'type 2',
+                     'severe', 'recurrent']
+SYMPTOM_SUFFIXES = ['algia', 'itus', 'emia', 'odynia', 'orrhea', 'ia', ' pain', ' swelling',
+                    ' rash', ' fatigue']
+CHEMICAL_SUFFIXES = ['ate', 'ide', 'ine', 'ol', 'one', 'ane']
+SALTS = ['', ' hydrochloride', ' sodium', ' sulfate', ' acetate', ' potassium', ' maleate']
+
+LABEL_SALTS = {'Drug': 1, 'Disease': 2, 'Symptom': 3, 'Chemical': 4}
+
+# Where extracted triples come from, with their share of rows
+SOURCES = {'pubmed': 0.6, 'fda_label': 0.3, 'clinical_trials': 0.1}
+
+# predicate -> (subject label, object label)
+PREDICATE_TYPES = {
+    'treats': ('Drug', 'Disease'),
+    'causes': ('Drug', 'Symptom'),
+    'has_symptom': ('Disease', 'Symptom'),
+    'interacts_with': ('Drug', 'Drug'),
+    'contains': ('Drug', 'Chemical'),
+    'associated_with': ('Disease', 'Disease'),
+}
+DEFAULT_PREDICATE_MIX = {
+    'treats': 0.25, 'causes': 0.35, 'has_symptom': 0.2,
+    'interacts_with': 0.1, 'contains': 0.05, 'associated_with': 0.05
+}
+
+
+def splitmix64(x: int) -> int:
+    """Stateless 64-bit hash used to derive per-entity attributes from an index"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def spell(index: int) -> str:
+    """Spell a non-negative integer with consonant-vowel pairs (at least two)"""
+    base = len(CV_PAIRS)
+    pairs = []
+    while True:
+        index, digit = divmod(index, base)
+        pairs.append(CV_PAIRS[digit])
+        if index == 0 and len(pairs) >= 2:
+            break
+    return ''.join(reversed(pairs))
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """
+    Parse a predicate mix like ``treats=0.3,causes=0.5,interacts_with=0.2``
+
+    Returns:
+        Normalised weights keyed by predicate
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        predicate, _, weight = item.partition('=')
+        if predicate not in PREDICATE_TYPES:
+            raise ValueError(f"Unknown predicate '{predicate}'. Choose from {sorted(PREDICATE_TYPES)}")
+        mix[predicate] = float(weight)
+    total = sum(mix.values())
+    if total <= 0:
+        raise ValueError("Predicate mix weights must sum to a positive value")
+    return {predicate: weight / total for predicate, weight in mix.items()}
+
+
+class ZipfSampler:
+    """
+    Draws entity indexes with a power-law (Zipf-like) popularity.
+
+    Ranks come from the inverse CDF of a continuous power law, and an affine
+    permutation spreads popular ranks across the index space, so sampling uses
+    O(1) memory regardless of the entity count.
+    """
+
+    def __init__(self, n: int, exponent: float, salt: int):
+        self.n = n
+        self.exponent = exponent
+        self.stride = self._coprime_stride(n, salt)
+        self.offset = salt % n
+
+    @staticmethod
+    def _coprime_stride(n: int, salt: int) -> int:
+        stride = (salt % n) | 1 if n > 1 else 1
+        while math.gcd(stride, n) != 1:
+            stride += 2
+        return stride % n or 1
+
+    def sample(self, rng: random.Random) -> int:
+        u = rng.random()
+        if abs(self.exponent - 1.0) < 1e-9:
+            rank = int(self.n ** u) - 1
+        else:
+            a = 1.0 - self.exponent
+            rank = int(((self.n ** a - 1.0) * u + 1.0) ** (1.0 / a)) - 1
+        rank = min(max(rank, 0), self.n - 1)
+        return (rank * self.stride + self.offset) % self.n
+
+
+class SyntheticMedicalData:
+    """
+    Deterministic synthetic medical corpus.
+
+    Every entity name is a pure function of (seed, label, index), so any number
+    of records can be streamed without holding the vocabulary in memory.
+    """
+
+    def __init__(self, triples: int, seed: int = 0, drugs: int = None, diseases: int = None,
+                 symptoms: int = None, chemicals: int = None, exponent: float = 1.1,
+                 predicate_mix: Dict[str, float] = None, alias_rate: float = 0.2,
+                 noise_rate: float = 0.1):
+        """
+        Args:
+            triples: Number of triple rows to emit
+            seed: Random seed
+            drugs, diseases, symptoms, chemicals: Vocabulary sizes (scaled from
+                ``triples`` when omitted)
+            exponent: Power-law exponent of entity popularity
+            predicate_mix: Weights per predicate (see PREDICATE_TYPES)
+            alias_rate: Share of drug mentions using a brand name instead of the generic
+            noise_rate: Share of entity mentions with surface-form noise
+                (case, hyphenation, plurals)
+        """
+        base = max(100, int(2 * triples ** 0.55))
+        self.triples = triples
+        self.seed = seed
+        self.sizes = {
+            'Drug': drugs or base,
+            'Disease': diseases or max(50, int(base * 0.6)),
+            'Symptom': symptoms or max(50, int(base * 0.8)),
+            'Chemical': chemicals or max(50, int(base * 0.5)),
+        }
+        self.predicate_mix = predicate_mix or DEFAULT_PREDICATE_MIX
+        self.alias_rate = alias_rate
+        self.noise_rate = noise_rate
+        self.samplers = {
+            label: ZipfSampler(n, exponent, splitmix64(seed * 31 + i))
+            for i, (label, n) in enumerate(self.sizes.items())
+        }
+        # Popular entities dominate a power-law stream; a bounded cache avoids
+        # re-deriving their names without growing with the vocabulary
+        self.name = lru_cache(maxsize=NAME_CACHE_SIZE)(self._name)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        del state['name']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.name = lru_cache(maxsize=NAME_CACHE_SIZE)(self._name)
+
+    def _hash(self, label: str, index: int, salt: int = 0) -> int:
+        label_salt = LABEL_SALTS[label]
+        return splitmix64((self.seed << 40) ^ (label_salt << 32) ^ splitmix64((index << 4) + salt))
+
+    # -- entity names ------------------------------------------------------
+
+    def generic_name(self, index: int) -> str:
+        h = self._hash('Drug', index)
+        return spell(index) + DRUG_STEMS[h % len(DRUG_STEMS)]
+
+    def brand_names(self, index: int) -> List[str]:
+        """
+        One to three brand names aliasing the same generic
+
+        Brand k of drug ``index`` spells ``3 * index + k``, so like generic
+        names they are unique across drugs (every ending is told apart by its
+        last letters, which a CV spelling cannot produce).
+        """
+        h = self._hash('Drug', index, 1)
+        count = 1 + (h % 100 >= 70) + (h % 100 >= 92)
+        names = []
+        for k in range(count):
+            hk = splitmix64(h + k)
+            stem = spell(3 * index + k)
+            names.append((stem + BRAND_ENDINGS[(hk >> 16) % len(BRAND_ENDINGS)]).capitalize())
+        return names
+
+    def _name(self, label: str, index: int) -> str:
+        """Canonical lower-case name of an entity (use the cached ``name``)"""
+        if label == 'Drug':
+            return self.generic_name(index)
+        h = self._hash(label, index)
+        if label == 'Disease':
+            name = spell(index) + DISEASE_SUFFIXES[h % len(DISEASE_SUFFIXES)]
+            if (h >> 8) % 3 == 0:
+                name = f"{DISEASE_MODIFIERS[(h >> 12) % len(DISEASE_MODIFIERS)]} {name}"
+            return name
+        if label == 'Symptom':
+            return spell(index) + SYMPTOM_SUFFIXES[h % len(SYMPTOM_SUFFIXES)]
+        return (spell(index) + CHEMICAL_SUFFIXES[h % len(CHEMICAL_SUFFIXES)]
+                + SALTS[(h >> 8) % len(SALTS)])
+
+    def mention(self, rng: random.Random, label: str, index: int) -> str:
+        """Surface form of an entity as it would appear in extracted text"""
+        if label == 'Drug' and rng.random() < self.alias_rate:
+            brands = self.brand_names(index)
+            text = brands[rng.randrange(len(brands))]
+        else:
+            text = self.name(label, index)
+        if rng.random() < self.noise_rate:
+            variant = rng.randrange(4)
+            if variant == 0:
+                text = text.title()
+            elif variant == 1:
+                text = text.replace(' ', '-')
+            elif variant == 2 and not text.endswith('s'):
+                text = text + 's'
+            else:
+                text = text.upper() if len(text) < 12 else text.capitalize()
+        return text
+
+    # -- record streams ----------------------------------------------------
+
+    def iter_fda_records(self) -> Iterator[Dict]:
+        """One record per brand product, shaped like fda_processed.jsonl"""
+        rng = random.Random(f"{self.seed}-fda")
+        chemicals = self.samplers['Chemical']
+        diseases = self.samplers['Disease']
+        symptoms = self.samplers['Symptom']
+        product = 0
+        for index in range(self.sizes['Drug']):
+            generic = self.generic_name(index)
+            ingredients = sorted({self.name('Chemical', chemicals.sample(rng))
+                                  for _ in range(rng.randint(1, 3))})
+            indications = [self.name('Disease', diseases.sample(rng)) for _ in range(rng.randint(1, 3))]
+            reactions = [self.name('Symptom', symptoms.sample(rng)) for _ in range(rng.randint(2, 6))]
+            for brand in self.brand_names(index):
+                yield {
+                    'id': f"fda_{product:09d}",
+                    'product_name': [brand],
+                    'generic_name': [generic],
+                    'active_ingredient': ingredients,
+                    'indications_and_usage': [
+                        f"{brand} ({generic}) is indicated for the treatment of "
+                        f"{', '.join(indications)}."
+                    ],
+                    'adverse_reactions': [
+                        f"The most common adverse reactions to {generic} include "
+                        f"{', '.join(reactions)}."
+                    ],
+                }
+                product += 1
+
+    def iter_entity_records(self, documents: int, shard: int = None) -> Iterator[Dict]:
+        """
+        Per-document NER output shaped like all_entities.jsonl
+
+        Args:
+            documents: Total number of documents
+            shard: Only generate this shard of SHARD_SIZE documents (all if None)
+        """
+        labels = ['Drug', 'Disease', 'Symptom', 'Chemical']
+        weights = [0.3, 0.3, 0.3, 0.1]
+        shards = range(_shard_count(documents)) if shard is None else [shard]
+        for shard_index in shards:
+            rng = random.Random(f"{self.seed}-entities-{shard_index}")
+            start = shard_index * SHARD_SIZE
+            for doc in range(start, min(start + SHARD_SIZE, documents)):
+                entities = []
+                for label in rng.choices(labels, weights, k=rng.randint(3, 12)):
+                    index = self.samplers[label].sample(rng)
+                    entities.append({'text': self.mention(rng, label, index), 'label': label.upper()})
+                yield {'id': f"pubmed_{doc:09d}", 'entities': entities}
+
+    def iter_triples(self, shard: int = None) -> Iterator[Tuple[str, str, str, int, str]]:
+        """
+        (subject, predicate, object, frequency, source) rows with realistic duplication
+
+        Args:
+            shard: Only generate this shard of SHARD_SIZE rows (all shards if None)
+        """
+        shards = range(_shard_count(self.triples)) if shard is None else [shard]
+        predicates = list(self.predicate_mix)
+        weights = [self.predicate_mix[p] for p in predicates]
+        sources = list(SOURCES)
+        source_weights = list(SOURCES.values())
+        for shard_index in shards:
+            rng = random.Random(f"{self.seed}-triples-{shard_index}")
+            start = shard_index * SHARD_SIZE
+            remaining = min(SHARD_SIZE, self.triples - start)
+            # Draw predicates in blocks to keep the per-row overhead low
+            while remaining > 0:
+                size = min(4096, remaining)
+                remaining -= size
+                for predicate, source in zip(rng.choices(predicates, weights, k=size),
+                                             rng.choices(sources, source_weights, k=size)):
+                    subject_label, object_label = PREDICATE_TYPES[predicate]
+                    subject = self.samplers[subject_label].sample(rng)
+                    obj = self.samplers[object_label].sample(rng)
+                    if subject_label == object_label and subject == obj:
+                        obj = (obj + 1) % self.sizes[object_label]
+                    yield (self.mention(rng, subject_label, subject), predicate,
+                           self.mention(rng, object_label, obj),
+                           1 + int(rng.expovariate(1.5)), source)
+
+    def write_shard(self, kind: str, shard: int, count: int, path: str) -> str:
+        """
+        Write one shard of a sharded file (without header)
+
+        Args:
+            kind: ``triples`` or ``entities``
+            shard: Shard index
+            count: Total records in the file
+            path: Part file to write
+        """
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            if kind == 'triples':
+                csv.writer(f).writerows(self.iter_triples(shard))
+            else:
+                for record in self.iter_entity_records(count, shard):
+                    f.write(json.dumps(record) + "\n")
+        return path
+
+    def _write_sharded(self, path: Path, kind: str, count: int, pool, workers: int):
+        # Shards run ``workers`` at a time and are appended in order, so the
+        # output does not depend on the worker count and at most ``workers``
+        # part files exist at once
+        shards = _shard_count(count)
+        with open(path, 'a', encoding='utf-8', newline='') as f:
+            for window in range(0, shards, workers):
+                jobs = [(kind, shard, count, str(path.parent / f".{path.name}.part{shard:05d}"))
+                        for shard in range(window, min(window + workers, shards))]
+                for part in pool.map(_write_shard, jobs):
+                    with open(part, 'r', encoding='utf-8', newline='') as part_file:
+                        shutil.copyfileobj(part_file, f)
+                    Path(part).unlink()
+                logger.info(f"{path.name}: {min(window + workers, shards)}/{shards} shards written")
+
+    def write(self, output_dir: str, entity_documents: int = None, workers: int = 1) -> Dict[str, Path]:
+        """
+        Stream all three input files to disk
+
+        Args:
+            output_dir: Target directory (created if missing)
+            entity_documents: Number of NER records (defaults to triples / 4)
+            workers: Processes generating entity and triple shards in parallel
+
+        Returns:
+            Mapping of input kind to written path
+        """
+        out = Path(output_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        paths = {
+            'fda': out / "fda_processed.jsonl",
+            'entities': out / "all_entities.jsonl",
+            'triples': out / "unified_triples.csv",
+        }
+        logger.info(f"Vocabulary sizes: {self.sizes}")
+
+        with open(paths['fda'], 'w', encoding='utf-8') as f:
+            count = 0
+            for record in self.iter_fda_records():
+                f.write(json.dumps(record) + "\n")
+                count += 1
+        logger.info(f"Wrote {count} FDA records to {paths['fda']}")
+
+        documents = entity_documents or max(1, self.triples // 4)
+        paths['entities'].write_text('', encoding='utf-8')
+        with open(paths['triples'], 'w', encoding='utf-8', newline='') as f:
+            csv.writer(f).writerow(['subject', 'predicate', 'object', 'frequency', 'source'])
+
+        pool = (Pool(workers, initializer=_init_worker, initargs=(self,))
+                if workers > 1 else _SerialPool(self))
+        with pool:
+            self._write_sharded(paths['entities'], 'entities', documents, pool, workers)
+            logger.info(f"Wrote {documents} entity records to {paths['entities']}")
+            self._write_sharded(paths['triples'], 'triples', self.triples, pool, workers)
+        logger.info(f"Wrote {self.triples} triples to {paths['triples']}")
+
+        return paths
+
+
+_worker_generator = None
+
+
+def _init_worker(generator: 'SyntheticMedicalData'):
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _shard_count(count: int) -> int:
+    return (count + SHARD_SIZE - 1) // SHARD_SIZE
+
+
+def _write_shard(job: Tuple[str, int, int, str]) -> str:
+    return _worker_generator.write_shard(*job)
+
+
+class _SerialPool:
+    """In-process stand-in for multiprocessing.Pool when workers == 1"""
+
+    def __init__(self, generator: 'SyntheticMedicalData'):
+        _init_worker(generator)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def map(self, func, iterable):
+        return list(map(func, iterable))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic MediGraph ingest inputs")
+    parser.add_argument('--triples', type=int, default=10_000, help="Triple rows to generate")
+    parser.add_argument('--output-dir', default="data/synthetic")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--drugs', type=int, default=None)
+    parser.add_argument('--diseases', type=int, default=None)
+    parser.add_argument('--symptoms', type=int, default=None)
+    parser.add_argument('--chemicals', type=int, default=None)
+    parser.add_argument('--entity-documents', type=int, default=None)
+    parser.add_argument('--exponent', type=float, default=1.1,
+                        help="Power-law exponent of entity popularity")
+    parser.add_argument('--predicates', default=None,
+                        help="Predicate mix, e.g. treats=0.3,causes=0.5,interacts_with=0.2")
+    parser.add_argument('--alias-rate', type=float, default=0.2,
+                        help="Share of drug mentions using a brand-name alias")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes generating shards in parallel")
+    parser.add_argument('--noise-rate', type=float, default=0.1,
+                        help="Share of mentions with case/hyphen/plural noise")
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.predicates) if args.predicates else None
+    except ValueError as e:
+        parser.error(str(e))
+
+    generator = SyntheticMedicalData(
+        args.triples, seed=args.seed, drugs=args.drugs, diseases=args.diseases,
+        symptoms=args.symptoms, chemicals=args.chemicals, exponent=args.exponent,
+        predicate_mix=mix, alias_rate=args.alias_rate, noise_rate=args.noise_rate
+    )
+    generator.write(args.output_dir, args.entity_documents, args.workers)
+
+
+if __name__ == "__main__":
+    main()